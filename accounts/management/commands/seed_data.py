@@ -7,7 +7,7 @@ Creates Amazon-like catalog data with:
 - Payment types + UserPaymentMethod (default flags)
 - Categories
 - Products + ProductItems (SKUs) + Variation/VariationOption + ProductConfiguration
-- Orders (ShopOrder) + lines (OrderLine) + Transactions + optional Invoices via signals
+- Orders (ShopOrder) + lines (OrderLine) + Transactions + optional Invoices via signals/outbox
 - Optional carts for customers
 
 This command intentionally resets relevant tables first, while preserving superusers.
@@ -1696,9 +1696,13 @@ class Command(BaseCommand):
         if created_items:
             oos_count = max(1, int(round(len(created_items) * 0.10)))
             oos_items = random.sample(created_items, k=min(oos_count, len(created_items)))
+            # Through the inventory ledger so qty_in_stock stays the sum of its movements.
+            from products.inventory import movement, record_movements
+            from products.models import InventoryMovement
+
+            record_movements(movement(it.id, -it.qty_in_stock, InventoryMovement.ADJUSTMENT) for it in oos_items)
             for it in oos_items:
                 it.qty_in_stock = 0
-            ProductItem.objects.bulk_update(oos_items, ['qty_in_stock'])
             self.stdout.write(self.style.NOTICE(f'Set {len(oos_items)} items to out-of-stock (qty_in_stock=0).'))
 
         return created_products, created_items
@@ -1735,6 +1739,7 @@ class Command(BaseCommand):
         in_stock = [it for it in items if int(getattr(it, 'qty_in_stock', 0) or 0) > 0]
         pool = in_stock if len(in_stock) >= 20 else items
 
+        created_order_ids = []
         pending = next((s for s in statuses if s.status == 'Pending'), statuses[0])
         shipped = next((s for s in statuses if s.status == 'Shipped'), statuses[0])
         delivered = next((s for s in statuses if s.status == 'Delivered'), statuses[0])
@@ -1779,10 +1784,13 @@ class Command(BaseCommand):
                 shipping_address=shipping_address,
                 order_total=total,
                 order_status=order_status,
+                # Seeded lines carry no line_status, which counts as pending.
+                line_status_counts={'pending': len(lines)},
             )
 
             for it, qty, price in lines:
                 OrderLine.objects.create(order=order, product_item=it, qty=qty, price=price)
+            created_order_ids.append(order.id)
 
             if order_status.status in {'Shipped', 'Delivered'}:
                 order.shipping_carrier = random.choice(['DHL', 'Aramex', 'FedEx', 'UPS'])
@@ -1792,12 +1800,18 @@ class Command(BaseCommand):
                     order.delivered_at = order.shipped_at + timezone.timedelta(days=random.randint(1, 6))
                 order.save(update_fields=['shipping_carrier', 'tracking_number', 'shipped_at', 'delivered_at'])
 
-            # Respect signals: ShopOrder post_save created Transaction(Pending) already.
-            tx = Transaction.objects.filter(order=order).select_related('payment_status').first()
+            # The order signal only queues the Transaction (outbox); create it here so
+            # the seeded payment status is set in this transaction.
+            tx, _ = Transaction.objects.get_or_create(
+                order=order, defaults={'amount': order.order_total, 'payment_status': pay_status_pending},
+            )
             if tx:
                 tx.amount = order.order_total
                 # Keep Success only for Delivered to align with stock + invoice signals.
                 tx.payment_status = pay_status_success if order_status.status == 'Delivered' else pay_status_pending
                 tx.save(update_fields=['payment_status', 'amount'])
 
+        from orders.sellers import rebuild_order_seller_links
+        rebuild_order_seller_links(created_order_ids)
+
         self.stdout.write(self.style.SUCCESS('Orders created.'))
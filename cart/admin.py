@@ -18,6 +18,11 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_price', 'created_at')
     search_fields = ('user__username', 'user__email')
     inlines = [ShoppingCartItemInline] # عرض المنتجات اللي جوه السلة
+    list_select_related = ('user',)
+
+    def get_queryset(self, request):
+        # total_price يمشي على الـ items؛ نجيبهم مرة واحدة للصفحة كلها
+        return super().get_queryset(request).prefetch_related('items__product_item')
 
 # تسجيل الموديل الفرعي بشكل منفصل أيضاً إذا أردت
 admin.site.register(ShoppingCartItem)
\ No newline at end of file
@@ -4,6 +4,10 @@ from django.apps import AppConfig
 
 
 class CartConfig(AppConfig):
-    """Django app config for the cart domain."""
+    """Django app config for the cart domain; registers signal handlers."""
 
     name = 'cart'
+
+    def ready(self):
+        """Import signal handlers on app ready."""
+        import cart.signals  # noqa: F401
@@ -0,0 +1,223 @@
+"""Batched cart mutations and upsert-based line merging.
+
+``POST /api/cart/batch/`` applies many operations in one transaction::
+
+    {"operations": [
+        {"op": "add", "product_item": 12, "quantity": 2},
+        {"op": "set", "product_item": 40, "quantity": 1},
+        {"op": "remove", "product_item": 7}
+    ]}
+
+Operations are folded per SKU in request order (``add`` after ``set`` adds to
+the set quantity, ``remove`` drops earlier ones), the resulting quantities
+are checked against stock for every SKU with one query, and the batch is
+all-or-nothing: any invalid operation rejects the whole request.
+
+DB carts are written with ``INSERT … ON CONFLICT (cart_id, product_item_id)
+DO UPDATE``: adds merge with ``qty = qty + excluded.qty`` (so concurrent adds
+of a new SKU do not collide on the unique line), sets overwrite, removes are
+one DELETE. Guest carts apply the same folded result to their store.
+"""
+
+from __future__ import annotations
+
+from django.db import connection, transaction
+
+from products.models import ProductItem
+
+from .models import ShoppingCartItem
+from .summary import invalidate_cart_summary, invalidate_guest_summary
+
+
+MAX_BATCH_OPERATIONS = 100
+
+ADD, SET, REMOVE = 'add', 'set', 'remove'
+
+
+class CartBatchError(ValueError):
+    """The request body itself is invalid (not a single operation)."""
+
+
+def _as_int(raw) -> int | None:
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def _field(raw, name):
+    return raw.get(name) if isinstance(raw, dict) else None
+
+
+def fold_operations(operations) -> tuple[dict[int, tuple[str, int]], dict[int, int], dict[int, str]]:
+    """Parse ``operations`` into ``{sku_id: (op, qty)}``, ``{sku_id: last op index}`` and ``{index: error}``."""
+    if not isinstance(operations, list) or not operations:
+        raise CartBatchError('operations must be a non-empty list.')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise CartBatchError(f'At most {MAX_BATCH_OPERATIONS} operations per request.')
+
+    folded: dict[int, tuple[str, int]] = {}
+    last: dict[int, int] = {}
+    errors: dict[int, str] = {}
+    for index, raw in enumerate(operations):
+        op = str(_field(raw, 'op') or '').strip().lower()
+        sku_id = _as_int(_field(raw, 'product_item'))
+        raw_qty = _field(raw, 'quantity')
+        qty = _as_int(raw_qty) if raw_qty is not None else (1 if op == ADD else None)
+        if op not in (ADD, SET, REMOVE):
+            errors[index] = 'op must be add, set or remove.'
+        elif sku_id is None or sku_id < 1:
+            errors[index] = 'product_item must be a SKU id.'
+        elif op != REMOVE and (qty is None or qty < 1):
+            errors[index] = 'Quantity must be at least 1.'
+        elif op == REMOVE:
+            folded[sku_id] = (REMOVE, 0)
+        elif op == SET:
+            folded[sku_id] = (SET, qty)
+        else:
+            prev_op, prev_qty = folded.get(sku_id, (ADD, 0))
+            # add after set/remove is a set from the known quantity.
+            folded[sku_id] = (ADD if prev_op == ADD else SET, prev_qty + qty)
+        if index not in errors:
+            last[sku_id] = index
+    return folded, last, errors
+
+
+def sku_stock(sku_ids) -> dict[int, tuple[int, bool]]:
+    """``{sku_id: (stock, published)}`` for every SKU in one query."""
+    return {
+        sku_id: (int(stock or 0), bool(published))
+        for sku_id, stock, published in ProductItem.objects.filter(id__in=list(sku_ids))
+        .values_list('id', 'qty_in_stock', 'product__is_published')
+    }
+
+
+def check_quantity(skus: dict[int, tuple[int, bool]], sku_id: int, qty: int) -> str | None:
+    """Why ``qty`` of ``sku_id`` cannot be in a cart (None if it can)."""
+    if sku_id not in skus:
+        return 'Invalid SKU.'
+    stock, published = skus[sku_id]
+    if not published:
+        return 'This product is not available.'
+    if qty > stock:
+        return f'Only {stock} item(s) available in stock.'
+    return None
+
+
+class _Rollback(Exception):
+    def __init__(self, errors: dict[int, str]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def upsert_lines(cart_id: int, rows, merge: bool) -> list[tuple[int, int, int]]:
+    """Insert ``(sku_id, qty)`` lines or, on conflict, add to (``merge``) / replace their qty.
+
+    Returns ``(line_id, sku_id, qty)`` per row. One statement for any count.
+    """
+
+    rows = list(rows)
+    if not rows:
+        return []
+    qn = connection.ops.quote_name
+    meta = ShoppingCartItem._meta
+    table = qn(meta.db_table)
+    cart_col = qn(meta.get_field('cart').column)
+    sku_col = qn(meta.get_field('product_item').column)
+    qty_col = qn(meta.get_field('qty').column)
+    new_qty = f'{table}.{qty_col} + excluded.{qty_col}' if merge else f'excluded.{qty_col}'
+    sql = (
+        f'INSERT INTO {table} ({cart_col}, {sku_col}, {qty_col}) '
+        f'VALUES {", ".join(["(%s, %s, %s)"] * len(rows))} '
+        f'ON CONFLICT ({cart_col}, {sku_col}) DO UPDATE SET {qty_col} = {new_qty} '
+        f'RETURNING {qn(meta.pk.column)}, {sku_col}, {qty_col}'
+    )
+    params = [value for sku_id, qty in rows for value in (cart_id, sku_id, qty)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def apply_to_cart(cart_id: int, folded: dict[int, tuple[str, int]]) -> dict[int, str]:
+    """Apply folded operations to a DB cart; return ``{sku_id: error}`` (nothing written on errors).
+
+    Merged quantities are only known after the upsert, so they are checked
+    against the stock read up front and the transaction is rolled back if any
+    line ends up over stock.
+    """
+
+    skus = sku_stock(sku_id for sku_id, (op, _) in folded.items() if op != REMOVE)
+    errors = {}
+    for sku_id, (op, qty) in folded.items():
+        if op != REMOVE and (error := check_quantity(skus, sku_id, qty)):
+            errors[sku_id] = error
+    if errors:
+        return errors
+
+    try:
+        with transaction.atomic():
+            removed = [sku_id for sku_id, (op, _) in folded.items() if op == REMOVE]
+            if removed:
+                ShoppingCartItem.objects.filter(cart_id=cart_id, product_item_id__in=removed).delete()
+            upsert_lines(cart_id, [(sku_id, qty) for sku_id, (op, qty) in folded.items() if op == SET], merge=False)
+            merged = upsert_lines(cart_id, [(sku_id, qty) for sku_id, (op, qty) in folded.items() if op == ADD], merge=True)
+            errors = {sku_id: error for _, sku_id, qty in merged if (error := check_quantity(skus, sku_id, qty))}
+            if errors:
+                raise _Rollback(errors)
+            # Upserts send no signals.
+            invalidate_cart_summary(cart_id)
+    except _Rollback as exc:
+        return exc.errors
+    return {}
+
+
+def apply_to_guest(store, folded: dict[int, tuple[str, int]]) -> dict[int, str]:
+    """Apply folded operations to a guest cart store; return ``{sku_id: error}``.
+
+    Like DB carts, adds are atomic increments checked afterwards (and undone
+    if any line ends up over stock); sets and removes are absolute.
+    """
+
+    skus = sku_stock(sku_id for sku_id, (op, _) in folded.items() if op != REMOVE)
+    errors = {}
+    for sku_id, (op, qty) in folded.items():
+        if op != REMOVE and (error := check_quantity(skus, sku_id, qty)):
+            errors[sku_id] = error
+    if errors:
+        return errors
+
+    added = {sku_id: qty for sku_id, (op, qty) in folded.items() if op == ADD}
+    for sku_id, qty in added.items():
+        if error := check_quantity(skus, sku_id, store.add(sku_id, qty)):
+            errors[sku_id] = error
+    if errors:
+        for sku_id, qty in added.items():
+            store.add(sku_id, -qty)
+        return errors
+    for sku_id, (op, qty) in folded.items():
+        if op == REMOVE:
+            store.remove(sku_id)
+        elif op == SET:
+            store.set(sku_id, qty)
+    invalidate_guest_summary(store.token)
+    return {}
+
+
+def apply_operations(operations, *, cart_id: int | None = None, store=None) -> list[dict]:
+    """Validate and apply a batch to a DB cart (``cart_id``) or a guest ``store``.
+
+    Returns ``[{index, product_item, error}]``; the cart is only changed
+    when that list is empty. Raises ``CartBatchError`` for a malformed body.
+    """
+
+    folded, last, errors = fold_operations(operations)
+    if errors:
+        return [
+            {'index': index, 'product_item': _as_int(_field(operations[index], 'product_item')), 'error': error}
+            for index, error in sorted(errors.items())
+        ]
+    failed = apply_to_cart(cart_id, folded) if store is None else apply_to_guest(store, folded)
+    return sorted(
+        ({'index': last[sku_id], 'product_item': sku_id, 'error': error} for sku_id, error in failed.items()),
+        key=lambda row: row['index'],
+    )
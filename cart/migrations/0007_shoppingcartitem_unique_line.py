@@ -0,0 +1,41 @@
+# Generated by Django 5.2.11 on 2026-10-19 08:09
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fold duplicate (cart, SKU) lines into the oldest one before the constraint."""
+    ShoppingCartItem = apps.get_model('cart', 'ShoppingCartItem')
+    dupes = list(
+        ShoppingCartItem.objects.values('cart_id', 'product_item_id')
+        .annotate(n=Count('id'), keep=Min('id'), total=Sum('qty'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for i in range(0, len(dupes), 1000):
+        chunk = dupes[i:i + 1000]
+        keep = ShoppingCartItem.objects.in_bulk([row['keep'] for row in chunk])
+        for row in chunk:
+            keep[row['keep']].qty = row['total']
+        ShoppingCartItem.objects.bulk_update(list(keep.values()), ['qty'])
+        for row in chunk:
+            ShoppingCartItem.objects.filter(
+                cart_id=row['cart_id'], product_item_id=row['product_item_id'],
+            ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0006_shoppingcart_cart_shoppi_session_9a323c_idx'),
+        ('products', '0009_inventorymovement'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product_item'), name='cart_shoppingcartitem_cart_product_item_uniq'),
+        ),
+    ]
@@ -32,6 +32,12 @@ class ShoppingCartItem(models.Model):
     product_item = models.ForeignKey(ProductItem, on_delete=models.CASCADE)
     qty = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # One line per SKU; adds merge into it (``cart.batch.upsert_lines``).
+            models.UniqueConstraint(fields=['cart', 'product_item'], name='cart_shoppingcartitem_cart_product_item_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.qty} x {self.product_item.product.name}"
 
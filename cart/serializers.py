@@ -168,7 +168,8 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'items', 'total_price']
 
     def get_total_price(self, obj):
+        # One pass over the (prefetched) lines; no per-line queries.
         try:
-            return sum(item.subtotal for item in obj.items.all())
+            return sum((item.product_item.price * item.qty for item in obj.items.all()), 0)
         except Exception:
             return 0
\ No newline at end of file
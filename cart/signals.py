@@ -0,0 +1,47 @@
+"""Signals for the cart app."""
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.models import Product, ProductItem
+
+from .models import ShoppingCart, ShoppingCartItem
+from .storage import promote_guest_cart
+from .summary import forget_user_cart, invalidate_cart_summary, invalidate_price_summaries
+
+
+@receiver(user_logged_in)
+def promote_guest_cart_on_login(sender, request, user, **kwargs):
+    """Move the visitor's guest cart into their account when they log in."""
+    if request is not None and getattr(user, 'user_type', None) != 'seller':
+        promote_guest_cart(request, user)
+
+
+@receiver(post_save, sender=ShoppingCartItem)
+@receiver(post_delete, sender=ShoppingCartItem)
+def drop_cart_summary(sender, instance, **kwargs):
+    """Cart line written or deleted: rebuild the cached summary on next read (no query here)."""
+    invalidate_cart_summary(instance.cart_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def drop_user_cart_id(sender, instance, **kwargs):
+    """Cart deleted: the user's next cart has a new id."""
+    if instance.user_id:
+        forget_user_cart(instance.user_id)
+
+
+@receiver(post_save, sender=ProductItem)
+@receiver(post_delete, sender=ProductItem)
+def drop_summaries_on_price_change(sender, instance, update_fields=None, **kwargs):
+    """SKU saved or deleted: cached cart totals may use its old price."""
+    if update_fields is None or 'price' in update_fields:
+        invalidate_price_summaries()
+
+
+@receiver(post_save, sender=Product)
+def drop_summaries_on_publish_change(sender, instance, update_fields=None, **kwargs):
+    """Product saved: it may have been (un)published."""
+    if update_fields is None or 'is_published' in update_fields:
+        invalidate_price_summaries()
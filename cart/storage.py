@@ -0,0 +1,252 @@
+"""Guest cart storage (``CART_GUEST_STORE``).
+
+Anonymous visitors no longer get a Django session, a ``ShoppingCart`` row or
+``ShoppingCartItem`` rows. Their cart is a ``{sku_id: qty}`` map keyed by a
+random token in the ``guest_cart`` cookie, kept in:
+
+- ``redis``: one hash per cart (``cart:guest:<token>``) that expires
+  ``CART_GUEST_TTL`` seconds after the last write, so abandoned (bot) carts
+  clean themselves up.
+- ``memory``: a process-local dict with the same interface (dev/tests).
+
+A guest cart is promoted into the customer's DB cart when they log in
+(``cart.signals``) or when an authenticated request still carries the
+cookie (JWT clients), which is before any checkout.
+"""
+
+from __future__ import annotations
+
+import re
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .summary import invalidate_cart_summary, invalidate_guest_summary
+
+
+GUEST_COOKIE = 'guest_cart'
+_TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{20,64}$')
+
+
+def _ttl() -> int:
+    return int(getattr(settings, 'CART_GUEST_TTL', 7 * 24 * 3600))
+
+
+class GuestCartStore:
+    """``{sku_id: qty}`` of one guest cart; every write refreshes the TTL."""
+
+    def __init__(self, token: str):
+        self.token = token
+
+    def items(self) -> dict[int, int]:
+        raise NotImplementedError
+
+    def get(self, sku_id: int) -> int:
+        return self.items().get(int(sku_id), 0)
+
+    def set(self, sku_id: int, qty: int) -> None:
+        raise NotImplementedError
+
+    def add(self, sku_id: int, qty: int) -> int:
+        """Atomically add ``qty`` (may be negative) to a line; return the new quantity.
+
+        A line that drops to zero or below is removed.
+        """
+        raise NotImplementedError
+
+    def remove(self, sku_id: int) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryGuestCartStore(GuestCartStore):
+    """Process-local carts (dev/tests); not shared between workers."""
+
+    _carts: dict[str, tuple[float, dict[int, int]]] = {}
+    _lock = threading.Lock()
+
+    def _live(self) -> dict[int, int]:
+        expires, items = self._carts.get(self.token, (0, {}))
+        return dict(items) if expires > time.monotonic() else {}
+
+    def items(self) -> dict[int, int]:
+        with self._lock:
+            return self._live()
+
+    def set(self, sku_id: int, qty: int) -> None:
+        with self._lock:
+            items = self._live()
+            items[int(sku_id)] = int(qty)
+            self._carts[self.token] = (time.monotonic() + _ttl(), items)
+
+    def add(self, sku_id: int, qty: int) -> int:
+        with self._lock:
+            items = self._live()
+            total = items.get(int(sku_id), 0) + int(qty)
+            if total > 0:
+                items[int(sku_id)] = total
+            else:
+                items.pop(int(sku_id), None)
+            self._carts[self.token] = (time.monotonic() + _ttl(), items)
+            return total
+
+    def remove(self, sku_id: int) -> None:
+        with self._lock:
+            items = self._live()
+            items.pop(int(sku_id), None)
+            self._carts[self.token] = (time.monotonic() + _ttl(), items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._carts.pop(self.token, None)
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop every cart (tests)."""
+        with cls._lock:
+            cls._carts.clear()
+
+
+_HDEL_IF_EMPTY = """
+if tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '0') <= 0 then
+  redis.call('HDEL', KEYS[1], ARGV[1])
+end
+"""
+
+
+class RedisGuestCartStore(GuestCartStore):
+    """One Redis hash per cart: field = SKU id, value = quantity."""
+
+    _client = None
+
+    @classmethod
+    def client(cls):
+        if cls._client is None:
+            import redis
+
+            cls._client = redis.Redis.from_url(getattr(settings, 'CART_GUEST_REDIS_URL', None) or settings.REDIS_URL)
+        return cls._client
+
+    @property
+    def key(self) -> str:
+        return f'cart:guest:{self.token}'
+
+    def items(self) -> dict[int, int]:
+        return {int(sku): int(qty) for sku, qty in self.client().hgetall(self.key).items()}
+
+    def get(self, sku_id: int) -> int:
+        return int(self.client().hget(self.key, int(sku_id)) or 0)
+
+    def set(self, sku_id: int, qty: int) -> None:
+        pipe = self.client().pipeline()
+        pipe.hset(self.key, int(sku_id), int(qty))
+        pipe.expire(self.key, _ttl())
+        pipe.execute()
+
+    def add(self, sku_id: int, qty: int) -> int:
+        pipe = self.client().pipeline()
+        pipe.hincrby(self.key, int(sku_id), int(qty))
+        pipe.expire(self.key, _ttl())
+        total, _ = pipe.execute()
+        if total <= 0:
+            # Only drop the field if nobody re-added it meanwhile.
+            self.client().eval(_HDEL_IF_EMPTY, 1, self.key, int(sku_id))
+        return int(total)
+
+    def remove(self, sku_id: int) -> None:
+        pipe = self.client().pipeline()
+        pipe.hdel(self.key, int(sku_id))
+        pipe.expire(self.key, _ttl())
+        pipe.execute()
+
+    def clear(self) -> None:
+        self.client().delete(self.key)
+
+
+_STORES = {'memory': MemoryGuestCartStore, 'redis': RedisGuestCartStore}
+
+
+def guest_token(request) -> str | None:
+    """The request's guest cart token (None if missing or malformed)."""
+    token = request.COOKIES.get(GUEST_COOKIE) or getattr(request, '_guest_cart_token', None)
+    return token if token and _TOKEN_RE.match(token) else None
+
+
+def guest_store(request, create: bool = False) -> GuestCartStore | None:
+    """The guest cart of ``request``; ``create`` issues a token (set by ``set_guest_cookie``)."""
+    token = guest_token(request)
+    if token is None:
+        if not create:
+            return None
+        token = request._guest_cart_token = secrets.token_urlsafe(24)
+    store_cls = _STORES[getattr(settings, 'CART_GUEST_STORE', 'redis')]
+    return store_cls(token)
+
+
+def set_guest_cookie(request, response):
+    """Send a newly issued guest token, or drop the cookie once the cart was promoted."""
+    if getattr(request, '_guest_cart_promoted', False):
+        response.delete_cookie(GUEST_COOKIE)
+    elif getattr(request, '_guest_cart_token', None) and GUEST_COOKIE not in request.COOKIES:
+        response.set_cookie(
+            GUEST_COOKIE,
+            request._guest_cart_token,
+            max_age=_ttl(),
+            httponly=True,
+            secure=settings.SESSION_COOKIE_SECURE,
+            samesite=getattr(settings, 'SESSION_COOKIE_SAMESITE', 'Lax'),
+        )
+    return response
+
+
+def promote_guest_cart(request, user) -> int:
+    """Merge the request's guest cart into ``user``'s DB cart; return lines merged.
+
+    Quantities add up with existing lines (one upsert, so a concurrent add of
+    the same SKU cannot collide on the unique line), capped at the SKU's
+    stock. The guest cart is cleared only once the merge commits.
+    """
+
+    from products.models import ProductItem
+    from .batch import upsert_lines
+    from .models import ShoppingCart, ShoppingCartItem
+
+    store = guest_store(request)
+    if store is None:
+        return 0
+    request._guest_cart_promoted = True
+    items = store.items()
+    if not items:
+        return 0
+
+    with transaction.atomic():
+        cart, _ = ShoppingCart.objects.get_or_create(user=user, defaults={'session_id': None})
+        stock = dict(ProductItem.objects.filter(id__in=list(items)).values_list('id', 'qty_in_stock'))
+        merged = upsert_lines(cart.id, [(sku_id, qty) for sku_id, qty in items.items() if sku_id in stock and qty > 0], merge=True)
+        capped, emptied = [], []
+        for line_id, sku_id, qty in merged:
+            before = qty - items[sku_id]
+            # Never shrink a line the customer already had.
+            allowed = max(before, min(qty, max(0, int(stock[sku_id] or 0))))
+            if allowed <= 0:
+                emptied.append(line_id)
+            elif allowed != qty:
+                capped.append(ShoppingCartItem(id=line_id, qty=allowed))
+        ShoppingCartItem.objects.bulk_update(capped, ['qty'])
+        if emptied:
+            ShoppingCartItem.objects.filter(id__in=emptied).delete()
+        # Upserts and bulk writes send no signals.
+        invalidate_cart_summary(cart.id)
+
+        def forget_guest_cart():
+            store.clear()
+            invalidate_guest_summary(store.token)
+
+        # An outer transaction may still roll the merge back: keep the guest cart until then.
+        transaction.on_commit(forget_guest_cart)
+    return len(merged) - len(emptied)
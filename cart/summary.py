@@ -0,0 +1,130 @@
+"""Cached cart summaries for header badges (``GET /api/cart/summary/``).
+
+A summary is ``{items, quantity, total, version}`` kept in the Django cache
+per DB cart (``cart:summary:c:<cart_id>:<gen>``) or guest cart
+(``cart:summary:g:<token>:<gen>``). Writes bump the cart's generation
+(``cart:gen:…``) after they commit (``cart.signals`` for ORM writes;
+explicit calls for bulk writes and guest stores), and the next read rebuilds
+the summary with one aggregate query and a new ``version``. The ``total``
+also depends on catalogue prices, so every key carries a global price
+generation (``cart:gen:prices``) that SKU price and product publishing
+changes bump. A reader that
+raced a write stores its (stale) result under the old generation, where no
+one reads it. Until then, reads are served from the cache without touching
+the database; clients refetch the full cart only when ``version`` changes.
+"""
+
+from __future__ import annotations
+
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+PRICES = 'prices'
+
+
+def _ttl() -> int:
+    return int(getattr(settings, 'CART_SUMMARY_TTL', 24 * 3600))
+
+
+def _generation(scope: str) -> int:
+    """Current generation of a cart (``c:<cart_id>`` / ``g:<token>``) or of ``PRICES``."""
+    key = f'cart:gen:{scope}'
+    gen = cache.get(key)
+    if gen is None:
+        # Evicted or new: start from a value no earlier generation used.
+        cache.add(key, time.time_ns(), _ttl())
+        gen = cache.get(key)
+    return gen
+
+
+def _bump(scope: str) -> None:
+    key = f'cart:gen:{scope}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), _ttl())
+
+
+def _summary_key(scope: str, gen) -> str:
+    return f'cart:summary:{scope}:{gen}:{_generation(PRICES)}'
+
+
+def _user_cart_key(user_id) -> str:
+    return f'cart:id:u:{user_id}'
+
+
+def _summary(items: int, quantity: int, total) -> dict:
+    return {
+        'items': int(items or 0),
+        'quantity': int(quantity or 0),
+        'total': f"{Decimal(total or 0):.2f}",
+        # Changes on every rebuild, i.e. after every write.
+        'version': time.time_ns() // 1000,
+    }
+
+
+def user_cart_summary(user) -> dict:
+    """Summary of ``user``'s DB cart (created if missing, like ``GET /api/cart/``)."""
+    from .models import ShoppingCart, ShoppingCartItem
+
+    cart_id = cache.get(_user_cart_key(user.id))
+    if cart_id is None:
+        cart, _ = ShoppingCart.objects.get_or_create(user=user, defaults={'session_id': None})
+        cart_id = cart.id
+        # Dropped when the cart is deleted (``cart.signals``); the TTL bounds other misses.
+        cache.set(_user_cart_key(user.id), cart_id, _ttl())
+
+    key = _summary_key(f'c:{cart_id}', _generation(f'c:{cart_id}'))
+    summary = cache.get(key)
+    if summary is None:
+        line_total = ExpressionWrapper(F('qty') * F('product_item__price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        row = ShoppingCartItem.objects.filter(cart_id=cart_id).aggregate(
+            items=Count('id'), quantity=Sum('qty'), total=Sum(line_total),
+        )
+        summary = _summary(row['items'], row['quantity'], row['total'])
+        cache.set(key, summary, _ttl())
+    return summary
+
+
+def guest_cart_summary(store) -> dict:
+    """Summary of a guest cart (``cart.storage``); an empty one when there is no store."""
+    from products.models import ProductItem
+
+    if store is None:
+        return {**_summary(0, 0, 0), 'version': 0}
+    key = _summary_key(f'g:{store.token}', _generation(f'g:{store.token}'))
+    summary = cache.get(key)
+    if summary is None:
+        items = store.items()
+        prices = dict(ProductItem.objects.filter(id__in=list(items)).values_list('id', 'price'))
+        lines = {sku_id: qty for sku_id, qty in items.items() if sku_id in prices}
+        total = sum((prices[sku_id] * qty for sku_id, qty in lines.items()), Decimal('0'))
+        summary = _summary(len(lines), sum(lines.values()), total)
+        cache.set(key, summary, _ttl())
+    return summary
+
+
+def invalidate_cart_summary(cart_id) -> None:
+    """Retire a DB cart's summary once the current transaction commits."""
+    transaction.on_commit(lambda: _bump(f'c:{cart_id}'))
+
+
+def invalidate_guest_summary(token: str) -> None:
+    """Retire a guest cart's summary (guest stores are not transactional)."""
+    _bump(f'g:{token}')
+
+
+def invalidate_price_summaries() -> None:
+    """Retire every cart summary (a price changed) once the current transaction commits."""
+    transaction.on_commit(lambda: _bump(PRICES))
+
+
+def forget_user_cart(user_id) -> None:
+    """Drop the cached cart id of ``user_id`` once its cart deletion commits."""
+    transaction.on_commit(lambda: cache.delete(_user_cart_key(user_id)))
@@ -3,10 +3,17 @@
 from datetime import date
 
 from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 
 from accounts.models import Country, Address, UserAddress, PaymentType, UserPaymentMethod
+from cart.models import ShoppingCart, ShoppingCartItem
+from cart.storage import GUEST_COOKIE, MemoryGuestCartStore
+from orders.models import OrderLine
 from products.models import ProductCategory, Product, ProductItem
 
 
@@ -67,6 +74,10 @@ class CartStockValidationTests(TestCase):
 			price='10.00',
 		)
 
+	def setUp(self):
+		MemoryGuestCartStore.reset()
+		cache.clear()
+
 	def test_cannot_add_more_than_stock(self):
 		client = APIClient()
 		client.force_authenticate(user=self.customer)
@@ -85,3 +96,158 @@ class CartStockValidationTests(TestCase):
 		# update to 3 (exceeds stock=2)
 		res2 = client.patch(f'/api/cart/cart-items/{item_id}/', data={'quantity': 3}, format='json')
 		self.assertEqual(res2.status_code, 400)
+
+	@override_settings(CART_GUEST_STORE='memory')
+	def test_guest_cart_stays_out_of_db_until_login(self):
+		client = APIClient()
+		res = client.get('/api/cart/')
+		self.assertEqual((res.status_code, res.data['items']), (200, []))
+		self.assertNotIn(GUEST_COOKIE, res.cookies)
+
+		res = client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json')
+		self.assertEqual(res.status_code, 201)
+		self.assertIn(GUEST_COOKIE, res.cookies)
+		self.assertEqual(client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json').data['quantity'], 2)
+		# Merged quantities are still checked against stock (2).
+		self.assertEqual(client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json').status_code, 400)
+		# The rejected increment was undone.
+		self.assertEqual(MemoryGuestCartStore(client.cookies[GUEST_COOKIE].value).get(self.item.id), 2)
+		res = client.patch(f'/api/cart/cart-items/{self.item.id}/', data={'quantity': 1}, format='json')
+		self.assertEqual(res.status_code, 200)
+
+		res = client.get('/api/cart/')
+		self.assertEqual([(i['id'], i['quantity']) for i in res.data['items']], [(self.item.id, 1)])
+		self.assertEqual(res.data['total_price'], 10)
+		self.assertFalse(Session.objects.exists())
+		self.assertFalse(ShoppingCart.objects.exists())
+
+		# Logging in moves the guest cart into the customer's DB cart (capped at stock),
+		# and the guest cart is dropped once that commits.
+		cart = ShoppingCart.objects.create(user=self.customer)
+		ShoppingCartItem.objects.create(cart=cart, product_item=self.item, qty=1)
+		client.patch(f'/api/cart/cart-items/{self.item.id}/', data={'quantity': 2}, format='json')
+		token = client.cookies[GUEST_COOKIE].value
+		with self.captureOnCommitCallbacks(execute=True):
+			res = client.post('/api/accounts/login/', data={'username': 'cart_customer', 'password': '12345678'}, format='json')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(list(ShoppingCartItem.objects.filter(cart__user=self.customer).values_list('product_item_id', 'qty')), [(self.item.id, 2)])
+		self.assertEqual(MemoryGuestCartStore(token).items(), {})
+		res = client.get('/api/cart/')
+		self.assertEqual(res.cookies[GUEST_COOKIE].value, '')
+		self.assertEqual(len(res.data['items']), 1)
+		self.assertEqual(client.delete(f'/api/cart/cart-items/{res.data["items"][0]["id"]}/').status_code, 204)
+
+	@override_settings(CART_GUEST_STORE='memory')
+	def test_checkout_promotes_guest_cart_without_session_login(self):
+		# JWT clients never fire user_logged_in: checkout itself picks the guest cart up.
+		client = APIClient()
+		client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 2}, format='json')
+		token = client.cookies[GUEST_COOKIE].value
+		client.force_authenticate(user=self.customer)
+		with self.captureOnCommitCallbacks(execute=True):
+			res = client.post('/api/orders/', data={}, format='json')
+		self.assertEqual(res.status_code, 201)
+		self.assertEqual(list(OrderLine.objects.filter(order_id=res.data['id']).values_list('product_item_id', 'qty')), [(self.item.id, 2)])
+		self.assertEqual(MemoryGuestCartStore(token).items(), {})
+		self.assertEqual(res.cookies[GUEST_COOKIE].value, '')
+
+	def test_cart_read_uses_fixed_query_count(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json')
+
+		def count_queries():
+			with CaptureQueriesContext(connection) as ctx:
+				res = client.get('/api/cart/')
+			self.assertEqual(res.status_code, 200)
+			return len(ctx.captured_queries), res.data
+
+		single, _ = count_queries()
+		for n in range(2, 6):
+			sku = ProductItem.objects.create(product=self.product, sku=f'CART-SKU-{n}', qty_in_stock=5, price='2.50')
+			client.post('/api/cart/cart-items/', data={'product_item': sku.id, 'quantity': 2}, format='json')
+		many, data = count_queries()
+		# Cart + lines (with SKU and product), whatever the line count.
+		self.assertEqual((single, many), (2, 2))
+		self.assertEqual(len(data['items']), 5)
+		self.assertEqual(data['total_price'], 30)
+
+	@override_settings(CART_GUEST_STORE='memory')
+	def test_cart_summary_is_served_from_cache_until_a_write(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		with self.captureOnCommitCallbacks(execute=True):
+			res = client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 2}, format='json')
+		line_id = res.data['id']
+
+		first = client.get('/api/cart/summary/').data
+		self.assertEqual((first['items'], first['quantity'], first['total']), (1, 2, '20.00'))
+		with self.assertNumQueries(0):
+			self.assertEqual(client.get('/api/cart/summary/').data, first)
+
+		# Writes drop the cached summary; the next read has a new version.
+		with self.captureOnCommitCallbacks(execute=True):
+			client.patch(f'/api/cart/cart-items/{line_id}/', data={'quantity': 1}, format='json')
+		second = client.get('/api/cart/summary/').data
+		self.assertEqual((second['quantity'], second['total']), (1, '10.00'))
+		self.assertNotEqual(second['version'], first['version'])
+		with self.captureOnCommitCallbacks(execute=True):
+			client.delete(f'/api/cart/cart-items/{line_id}/')
+		self.assertEqual(client.get('/api/cart/summary/').data['items'], 0)
+
+		# A deleted cart is replaced by a new one; the summary follows it.
+		with self.captureOnCommitCallbacks(execute=True):
+			ShoppingCart.objects.filter(user=self.customer).delete()
+		with self.captureOnCommitCallbacks(execute=True):
+			client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json')
+		self.assertEqual(client.get('/api/cart/summary/').data['items'], 1)
+
+		guest = APIClient()
+		self.assertEqual(guest.get('/api/cart/summary/').data['version'], 0)
+		guest.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json')
+		self.assertEqual(guest.get('/api/cart/summary/').data['total'], '10.00')
+		with self.assertNumQueries(0):
+			self.assertEqual(guest.get('/api/cart/summary/').data['quantity'], 1)
+
+		# A price change retires every cached total, DB and guest carts alike.
+		self.item.price = '12.50'
+		with self.captureOnCommitCallbacks(execute=True):
+			self.item.save(update_fields=['price'])
+		self.assertEqual(client.get('/api/cart/summary/').data['total'], '12.50')
+		self.assertEqual(guest.get('/api/cart/summary/').data['total'], '12.50')
+
+	@override_settings(CART_GUEST_STORE='memory')
+	def test_cart_batch_applies_all_operations_or_none(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		other = ProductItem.objects.create(product=self.product, sku='CART-SKU-B', qty_in_stock=5, price='1.00')
+		self.assertEqual(client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json').status_code, 201)
+
+		# Adds merge into the existing line via the upsert; one line per SKU.
+		res = client.post('/api/cart/batch/', data={'operations': [
+			{'op': 'add', 'product_item': self.item.id, 'quantity': 1},
+			{'op': 'set', 'product_item': other.id, 'quantity': 4},
+			{'op': 'add', 'product_item': other.id},
+		]}, format='json')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(sorted((i['product_item'], i['quantity']) for i in res.data['items']), [(self.item.id, 2), (other.id, 5)])
+		self.assertEqual(ShoppingCartItem.objects.filter(cart__user=self.customer).count(), 2)
+
+		# One SKU over stock rejects the whole batch.
+		res = client.post('/api/cart/batch/', data={'operations': [
+			{'op': 'remove', 'product_item': other.id},
+			{'op': 'add', 'product_item': self.item.id, 'quantity': 1},
+		]}, format='json')
+		self.assertEqual(res.status_code, 400)
+		self.assertEqual([(e['index'], e['product_item']) for e in res.data['errors']], [(1, self.item.id)])
+		self.assertEqual(dict(ShoppingCartItem.objects.filter(cart__user=self.customer).values_list('product_item_id', 'qty')), {self.item.id: 2, other.id: 5})
+		self.assertEqual(client.post('/api/cart/cart-items/', data={'product_item': self.item.id, 'quantity': 1}, format='json').status_code, 400)
+		self.assertEqual(client.post('/api/cart/batch/', data={'operations': []}, format='json').status_code, 400)
+
+		res = client.post('/api/cart/batch/', data={'operations': [{'op': 'remove', 'product_item': other.id}]}, format='json')
+		self.assertEqual([i['product_item'] for i in res.data['items']], [self.item.id])
+
+		guest = APIClient()
+		res = guest.post('/api/cart/batch/', data={'operations': [{'op': 'add', 'product_item': other.id, 'quantity': 2}]}, format='json')
+		self.assertEqual([(i['id'], i['quantity']) for i in res.data['items']], [(other.id, 2)])
+		self.assertFalse(ShoppingCart.objects.filter(user=None).exists())
@@ -1,24 +1,68 @@
 """Cart APIs and HTML view.
 
-Supports authenticated carts (user) and guest carts (session_id).
+Authenticated carts are ``ShoppingCart`` rows; guest carts live in the
+``cart.storage`` guest store (Redis) and never touch the database. Guest
+lines use the SKU id as their ``id``.
 """
 
 from django.shortcuts import render
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import Http404
+from products.models import ProductItem
+from .batch import CartBatchError, apply_operations, check_quantity, upsert_lines
 from .models import ShoppingCart, ShoppingCartItem
 from .serializers import ShoppingCartSerializer, ShoppingCartItemSerializer
+from .storage import guest_store, promote_guest_cart, set_guest_cookie
+from .summary import guest_cart_summary, invalidate_cart_summary, invalidate_guest_summary, user_cart_summary
 
-class CartViewSet(viewsets.ModelViewSet):
+
+def _user_cart(request) -> ShoppingCart:
+    """The authenticated user's cart (created if missing), after promoting any guest cart."""
+    promote_guest_cart(request._request, request.user)
+    cart, _ = ShoppingCart.objects.get_or_create(user=request.user, defaults={'session_id': None})
+    if cart.session_id:
+        cart.session_id = None
+        cart.save(update_fields=['session_id'])
+    return cart
+
+
+def _prefetch_lines(cart: ShoppingCart) -> ShoppingCart:
+    """Load the cart's lines with their SKU + product in one query (serializers read only these)."""
+    lines = ShoppingCartItem.objects.select_related('product_item__product').order_by('id')
+    prefetch_related_objects([cart], Prefetch('items', queryset=lines))
+    return cart
+
+
+def _guest_lines(items: dict[int, int]) -> list[ShoppingCartItem]:
+    """Unsaved cart lines for a guest cart's ``{sku_id: qty}`` (one query)."""
+    skus = ProductItem.objects.select_related('product').in_bulk(list(items))
+    return [
+        ShoppingCartItem(id=sku_id, product_item=skus[sku_id], qty=qty)
+        for sku_id, qty in items.items()
+        if sku_id in skus
+    ]
+
+
+class GuestCartMixin:
+    """Sends/clears the guest cart cookie after every cart response."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        return set_guest_cookie(request._request, response)
+
+class CartViewSet(GuestCartMixin, viewsets.ModelViewSet):
     """Cart API.
 
     - Authenticated users: cart is stored via ``user``.
-    - Anonymous users: cart is stored via Django session key.
+    - Anonymous users: cart is stored in the guest store (``cart.storage``).
     """
 
     serializer_class = ShoppingCartSerializer
@@ -33,33 +77,65 @@ class CartViewSet(viewsets.ModelViewSet):
             raise PermissionDenied('Sellers cannot use the customer cart.')
 
     def get_queryset(self):
-        """Return cart queryset scoped to the current user/session."""
+        """Return cart queryset scoped to the current user (guests have no DB cart)."""
         if self.request.user.is_authenticated:
             return ShoppingCart.objects.filter(user=self.request.user)
-        else:
-            return ShoppingCart.objects.filter(user__isnull=True, session_id=self.request.session.session_key)
+        return ShoppingCart.objects.none()
 
     def list(self, request, *args, **kwargs):
         """Return a single cart representation (create if missing)."""
         if request.user.is_authenticated:
-            cart, _ = ShoppingCart.objects.get_or_create(user=request.user, defaults={'session_id': None})
-            if cart.session_id:
-                cart.session_id = None
-                cart.save(update_fields=['session_id'])
+            serializer = self.get_serializer(_prefetch_lines(_user_cart(request)))
+            return Response(serializer.data)
+
+        # Guests: read-only, so no token (and no storage) until the first add.
+        store = guest_store(request._request)
+        lines = _guest_lines(store.items()) if store else []
+        items = ShoppingCartItemSerializer(lines, many=True, context=self.get_serializer_context()).data
+        return Response({
+            'id': None,
+            'user': None,
+            'items': items,
+            'total_price': sum((line.subtotal for line in lines), 0),
+        })
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Item count, quantity, total and ``version`` for header badges (cached; see ``cart.summary``).
+
+        Refetch ``GET /api/cart/`` only when ``version`` changed.
+        """
+        if request.user.is_authenticated:
+            promote_guest_cart(request._request, request.user)
+            return Response(user_cart_summary(request.user))
+        return Response(guest_cart_summary(guest_store(request._request)))
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Apply many add/set/remove operations in one transaction (see ``cart.batch``).
+
+        Payload: { operations: [{ op: add|set|remove, product_item, quantity? }] }
+        All-or-nothing: any failing operation returns 400 with per-operation
+        errors and leaves the cart unchanged; otherwise returns the cart.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if request.user.is_authenticated:
+            target = {'cart_id': _user_cart(request).id}
         else:
-            session_key = request.session.session_key
-            if not session_key:
-                request.session.create()
-                session_key = request.session.session_key
-            cart, _ = ShoppingCart.objects.get_or_create(user=None, session_id=session_key)
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+            target = {'store': guest_store(request._request, create=True)}
+        try:
+            errors = apply_operations(operations, **target)
+        except CartBatchError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if errors:
+            return Response({'detail': 'No changes were applied.', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return self.list(request)
 
 def cart_detail(request):
     """Render the cart HTML page."""
     return render(request, 'cart/cart_detail.html')
 
-class CartItemViewSet(viewsets.ModelViewSet):
+class CartItemViewSet(GuestCartMixin, viewsets.ModelViewSet):
     """Cart item API for adding/updating/removing items from the cart."""
 
     serializer_class = ShoppingCartItemSerializer
@@ -73,47 +149,57 @@ class CartItemViewSet(viewsets.ModelViewSet):
             raise PermissionDenied('Sellers cannot use the customer cart.')
 
     def get_queryset(self):
-        """Return cart items scoped to the current user/session."""
+        """Return cart items scoped to the current user (guests have no DB lines)."""
         if self.request.user.is_authenticated:
-            return ShoppingCartItem.objects.filter(cart__user=self.request.user)
-        else:
-            return ShoppingCartItem.objects.filter(cart__user__isnull=True, cart__session_id=self.request.session.session_key)
+            return ShoppingCartItem.objects.filter(cart__user=self.request.user).select_related('product_item__product')
+        return ShoppingCartItem.objects.none()
+
+    def get_object(self):
+        """DB line for users; for guests, an unsaved line whose ``id`` is the SKU id."""
+        if self.request.user.is_authenticated:
+            return super().get_object()
+        store = guest_store(self.request._request)
+        try:
+            sku_id = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (TypeError, ValueError):
+            raise Http404
+        qty = store.get(sku_id) if store else 0
+        lines = _guest_lines({sku_id: qty}) if qty else []
+        if not lines:
+            raise Http404
+        return lines[0]
 
     def create(self, request, *args, **kwargs):
         """Add an item to the cart, merging quantity if it already exists."""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        if request.user.is_authenticated:
-            cart, _ = ShoppingCart.objects.get_or_create(user=request.user, defaults={'session_id': None})
-            if cart.session_id:
-                cart.session_id = None
-                cart.save(update_fields=['session_id'])
-        else:
-            session_key = request.session.session_key
-            if not session_key:
-                request.session.create()
-                session_key = request.session.session_key
-            cart, _ = ShoppingCart.objects.get_or_create(user=None, session_id=session_key)
-
         product_item = serializer.validated_data.get('product_item')
         incoming_qty = int(serializer.validated_data.get('qty') or 1)
-
-        # Merge with existing line, but do not exceed available stock.
+        skus = {product_item.id: (int(product_item.qty_in_stock or 0), True)}
+
+        if not request.user.is_authenticated:
+            store = guest_store(request._request, create=True)
+            # Atomic increment (HINCRBY): concurrent adds cannot lose each other.
+            cart_item = ShoppingCartItem(id=product_item.id, product_item=product_item, qty=store.add(product_item.id, incoming_qty))
+            # Same stock validation against the merged quantity; undo the increment if it fails.
+            if error := check_quantity(skus, product_item.id, cart_item.qty):
+                store.add(product_item.id, -incoming_qty)
+                raise ValidationError({'quantity': error})
+            invalidate_guest_summary(store.token)
+            return Response(self.get_serializer(cart_item).data, status=status.HTTP_201_CREATED)
+
+        cart = _user_cart(request)
+
+        # One upsert merges into an existing line; roll back if the merged quantity exceeds stock.
         with transaction.atomic():
-            cart_item = ShoppingCartItem.objects.select_for_update().filter(cart=cart, product_item=product_item).first()
-            if cart_item is None:
-                cart_item = ShoppingCartItem(cart=cart, product_item=product_item, qty=incoming_qty)
-            else:
-                cart_item.qty = int(cart_item.qty or 0) + incoming_qty
-
-            # Re-run stock validation against the final quantity.
-            final_serializer = self.get_serializer(cart_item, data={'quantity': cart_item.qty}, partial=True)
-            final_serializer.is_valid(raise_exception=True)
-            final_serializer.save()
+            ((line_id, _, qty),) = upsert_lines(cart.id, [(product_item.id, incoming_qty)], merge=True)
+            if error := check_quantity(skus, product_item.id, qty):
+                raise ValidationError({'quantity': error})
+            invalidate_cart_summary(cart.id)
 
-        result_serializer = self.get_serializer(cart_item)
-        return Response(result_serializer.data, status=status.HTTP_201_CREATED)
+        cart_item = ShoppingCartItem(id=line_id, cart=cart, product_item=product_item, qty=qty)
+        return Response(self.get_serializer(cart_item).data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         """Update cart item quantity with stock validation."""
@@ -141,8 +227,20 @@ class CartItemViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         """Persist item updates (e.g., quantity changes)."""
+        if not self.request.user.is_authenticated:
+            line = serializer.instance
+            line.qty = serializer.validated_data.get('qty', line.qty)
+            store = guest_store(self.request._request)
+            store.set(line.product_item_id, line.qty)
+            invalidate_guest_summary(store.token)
+            return
         serializer.save()
 
     def perform_destroy(self, instance):
         """Delete an item from the cart."""
+        if not self.request.user.is_authenticated:
+            store = guest_store(self.request._request)
+            store.remove(instance.product_item_id)
+            invalidate_guest_summary(store.token)
+            return
         instance.delete()
\ No newline at end of file
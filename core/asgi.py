@@ -2,6 +2,9 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Docker runs it (gunicorn + uvicorn workers, ``events`` service) for the
+long-lived order update stream at ``/api/orders/stream/``; everything else is
+served by the WSGI app.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
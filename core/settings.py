@@ -15,6 +15,7 @@ import os
 from dotenv import load_dotenv
 import dj_database_url
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -261,7 +262,70 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for outbox messages whose post-commit kick was lost.
+    'process-outbox': {
+        'task': 'orders.tasks.process_outbox',
+        'schedule': float(os.getenv('OUTBOX_BEAT_SECONDS', '30')),
+    },
+    # Daily seller settlements (incremental; see finance.settlements).
+    'settle-seller-earnings': {
+        'task': 'finance.tasks.settle_seller_earnings',
+        'schedule': crontab(hour=int(os.getenv('SETTLEMENT_HOUR', '1')), minute=0),
+    },
+    # Finance report summary tables (finance.reports).
+    'refresh-revenue-summary': {
+        'task': 'finance.tasks.refresh_revenue_summary',
+        'schedule': float(os.getenv('REVENUE_SUMMARY_BEAT_SECONDS', '600')),
+    },
+}
+
+# Seller settlements: transactions per chunk, and how far before the watermark
+# each run re-reads (rows that committed late).
+SETTLEMENT_BATCH_SIZE = int(os.getenv('SETTLEMENT_BATCH_SIZE', '1000'))
+SETTLEMENT_WATERMARK_LAG_SECONDS = int(os.getenv('SETTLEMENT_WATERMARK_LAG_SECONDS', '300'))
+# A settlement run holds its lock this long at most (a crashed run frees it after).
+SETTLEMENT_RUN_LEASE_SECONDS = int(os.getenv('SETTLEMENT_RUN_LEASE_SECONDS', '3600'))
+
+# Transactional outbox (orders.outbox): 'celery' queues a drain after each commit,
+# 'inline' drains in-process (dev), 'off' leaves it to beat.
+OUTBOX_DISPATCH = os.getenv('OUTBOX_DISPATCH', 'inline' if DEBUG else 'celery')
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+
+# Live order updates (SSE): 'redis' fans out across processes, 'memory' is process-local.
+ORDER_EVENTS_LAYER = os.getenv('ORDER_EVENTS_LAYER', 'memory' if DEBUG else 'redis')
+ORDER_EVENTS_CHANNEL = os.getenv('ORDER_EVENTS_CHANNEL', 'orders:events')
+ORDER_EVENTS_HEARTBEAT = int(os.getenv('ORDER_EVENTS_HEARTBEAT', '20'))
+
+# Invoice PDFs (invoices.pdf): optional .ttf for the renderer and the header brand.
+INVOICE_PDF_FONT = os.getenv('INVOICE_PDF_FONT') or None
+INVOICE_PDF_BRAND = os.getenv('INVOICE_PDF_BRAND', 'Velo Store')
+
+# Guest carts (cart.storage): 'redis' hashes with a TTL, 'memory' is process-local (dev).
+CART_GUEST_STORE = os.getenv('CART_GUEST_STORE', 'memory' if DEBUG else 'redis')
+CART_GUEST_TTL = int(os.getenv('CART_GUEST_TTL', str(7 * 24 * 3600)))
+# Cached cart summaries (cart.summary) live in the default cache; it must be shared
+# between workers (Redis) so a write in one process invalidates it for all.
+CART_SUMMARY_TTL = int(os.getenv('CART_SUMMARY_TTL', str(24 * 3600)))
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        if os.getenv('CACHE_BACKEND', 'memory' if DEBUG else 'redis') == 'memory'
+        else {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.getenv('CACHE_URL', REDIS_URL)}
+    ),
+}
+
+# Status registries (orders.statuses): each process re-checks the shared version in the
+# default cache this often and reloads the table after the TTL regardless.
+STATUS_REGISTRY_CHECK_SECONDS = int(os.getenv('STATUS_REGISTRY_CHECK_SECONDS', '5'))
+STATUS_REGISTRY_TTL = int(os.getenv('STATUS_REGISTRY_TTL', '300'))
+
+# Order exports: rows streamed per request before switching to a Celery job.
+ORDER_EXPORT_SYNC_MAX_ROWS = int(os.getenv('ORDER_EXPORT_SYNC_MAX_ROWS', '20000'))
+ORDER_EXPORT_CHUNK_SIZE = int(os.getenv('ORDER_EXPORT_CHUNK_SIZE', '2000'))
 
 # الحفاظ على استمرارية الجلسة
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False # اجعلها False لكي لا يخرج اليوزر كلما أغلق التبويب
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+# Sessions are only written when they change (guests no longer get one just for a cart).
+SESSION_SAVE_EVERY_REQUEST = os.getenv('SESSION_SAVE_EVERY_REQUEST', 'False') == 'True'
\ No newline at end of file
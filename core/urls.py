@@ -25,12 +25,16 @@ from drf_yasg import openapi
 from orders.views import OrderViewSet
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from django.views.generic import TemplateView, RedirectView
-from orders.views_status_api import order_status_list, order_detail_view
+from orders.views_status_api import order_status_list, order_detail_view, order_events_view
+from orders.views_export import order_export, order_export_detail, order_export_download
+from orders.views_stream import order_stream_view
 from django.conf import settings
 from django.conf.urls.static import static
 from products.views_customer import product_detail_view, product_list_view
 from products.views_seller import seller_dashboard_view, seller_profile_view
 from orders.views_seller import seller_orders_view
+from finance.views import revenue_report_view, seller_settlements_view
+from invoices.views import invoice_pdf_download
 
 
 router = DefaultRouter()
@@ -51,6 +55,14 @@ urlpatterns = [
     # Default route: go to login view
     path('admin/', admin.site.urls),
     path('api/orders/<int:order_id>/', order_detail_view, name='order_detail'),
+    path('api/orders/<int:order_id>/events/', order_events_view, name='order_events'),
+    path('api/orders/stream/', order_stream_view, name='order_stream'),
+    path('api/orders/export/', order_export, name='order_export'),
+    path('api/orders/exports/<int:export_id>/', order_export_detail, name='order_export_detail'),
+    path('api/orders/exports/<int:export_id>/download/', order_export_download, name='order_export_download'),
+    path('api/invoices/<int:invoice_id>/pdf/', invoice_pdf_download, name='invoice_pdf'),
+    path('api/sellers/me/settlements/', seller_settlements_view, name='seller_settlements'),
+    path('api/finance/revenue/', revenue_report_view, name='finance_revenue'),
     path('api/', include(router.urls)),
     path('api/accounts/', include('accounts.urls')),
     path('api/cart/', include('cart.urls')),
@@ -1,7 +1,7 @@
 """Django admin configuration for finance models."""
 
 from django.contrib import admin
-from .models import Transaction, PaymentStatus
+from .models import PaymentStatus, SellerSettlement, Transaction
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -18,14 +18,36 @@ class TransactionAdmin(admin.ModelAdmin):
     
     readonly_fields = ('transaction_date',)
 
-    # دالة شيك لعرض رقم الأوردر بوضوح
+    # الحالة في نفس الـ query، ومفيش COUNT(*) للجدول كله مع كل صفحة
+    list_select_related = ('payment_status',)
+    show_full_result_count = False
+    ordering = ('-id',)
+
+    # دالة شيك لعرض رقم الأوردر بوضوح (من الـ FK column من غير query)
     def get_order_id(self, obj):
         """Render order id in a friendly format."""
-        return f"Order #{obj.order.id}"
+        return f"Order #{obj.order_id}"
     get_order_id.short_description = 'رقم الطلب'
 
 @admin.register(PaymentStatus)
 class PaymentStatusAdmin(admin.ModelAdmin):
     """Admin configuration for payment statuses."""
 
-    list_display = ('id', 'status')
\ No newline at end of file
+    list_display = ('id', 'status', 'key')
+
+
+@admin.register(SellerSettlement)
+class SellerSettlementAdmin(admin.ModelAdmin):
+    """Read-only view of daily seller settlements (written by ``settle_sellers``)."""
+
+    list_display = ('seller', 'day', 'amount', 'orders_count', 'updated_at')
+    list_filter = ('day',)
+    search_fields = ('seller__username',)
+    list_select_related = ('seller',)
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
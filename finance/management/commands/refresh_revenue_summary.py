@@ -0,0 +1,34 @@
+"""Rebuild the ``RevenueDaily`` summary behind the staff revenue report.
+
+Runs the same incremental pass as the ``refresh_revenue_summary`` Celery beat
+task: only local days with transactions changed since the watermark are
+recomputed. ``--full`` rebuilds every day (e.g. after deleting transactions).
+
+Usage:
+  python manage.py refresh_revenue_summary
+  python manage.py refresh_revenue_summary --full --days-per-chunk 90
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from finance.reports import refresh_revenue_summary
+
+
+class Command(BaseCommand):
+    help = 'Refresh the daily revenue summary from changed transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days-per-chunk', type=int, default=31, help='Days rebuilt per grouped query (default: 31).')
+        parser.add_argument('--full', action='store_true', help='Ignore the watermark and rebuild every day.')
+
+    def handle(self, *args, **options):
+        result = refresh_revenue_summary(days_per_chunk=options['days_per_chunk'], full=options['full'])
+        if result.get('skipped'):
+            self.stdout.write(self.style.WARNING('Another revenue refresh is in progress; nothing done.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {result['days']} days into {result['rows']} summary rows "
+            f"(watermark {result['watermark']:%Y-%m-%d %H:%M:%S})."
+        ))
@@ -0,0 +1,34 @@
+"""Fold successful transactions into per-seller, per-day settlements.
+
+Runs the same incremental pass as the daily ``settle_seller_earnings`` Celery
+beat task: only transactions changed since the stored watermark are read.
+``--full`` re-splits every transaction (e.g. after rebuilding seller links).
+
+Usage:
+  python manage.py settle_sellers
+  python manage.py settle_sellers --full --batch-size 5000
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from finance.settlements import settle_seller_earnings
+
+
+class Command(BaseCommand):
+    help = 'Aggregate successful transactions into seller settlements.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Transactions per chunk (default: 1000).')
+        parser.add_argument('--full', action='store_true', help='Ignore the watermark and re-split every transaction.')
+
+    def handle(self, *args, **options):
+        result = settle_seller_earnings(batch_size=options['batch_size'], full=options['full'])
+        if result.get('skipped'):
+            self.stdout.write(self.style.WARNING('Another settlement run is in progress; nothing done.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Settled {result['transactions']} transactions into {result['earnings']} seller earnings "
+            f"(watermark {result['watermark']:%Y-%m-%d %H:%M:%S})."
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+def backfill_keys(apps, schema_editor):
+    from finance.statuses import normalize_payment_status_key
+
+    PaymentStatus = apps.get_model('finance', 'PaymentStatus')
+    rows = list(PaymentStatus.objects.filter(key=''))
+    for row in rows:
+        row.key = normalize_payment_status_key(row.status) or ''
+    PaymentStatus.objects.bulk_update(rows, ['key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentstatus',
+            name='key',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('success', 'Success'), ('cancelled', 'Cancelled'), ('refunded', 'Refunded')], db_index=True, default='', max_length=20),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    Transaction = apps.get_model('finance', 'Transaction')
+
+    last_id = 0
+    while True:
+        ids = list(Transaction.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:1000])
+        if not ids:
+            break
+        last_id = ids[-1]
+        Transaction.objects.filter(id__in=ids).update(updated_at=F('transaction_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_paymentstatus_key'),
+        ('orders', '0014_outboxmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DateTimeField(blank=True, null=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='SellerEarning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='orders.shoporder')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Seller Earning',
+                'verbose_name_plural': 'Seller Earnings',
+                'indexes': [models.Index(fields=['seller', 'day'], name='finance_sel_seller__bdd1bb_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'seller'), name='finance_sellerearning_order_seller_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SellerSettlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='settlements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Seller Settlement',
+                'verbose_name_plural': 'Seller Settlements',
+                'constraints': [models.UniqueConstraint(fields=('seller', 'day'), name='finance_sellersettlement_seller_day_uniq')],
+            },
+        ),
+    ]
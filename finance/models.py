@@ -1,12 +1,17 @@
 """Database models for transactions and payment statuses."""
 
+from django.conf import settings
 from django.db import models
 from orders.models import ShopOrder
+from orders.tracking import TrackedFieldsModel
+from .statuses import PAYMENT_STATUS_KEY_CHOICES, normalize_payment_status_key
 
 class PaymentStatus(models.Model):
     """Reference model for payment status values (e.g., Pending, Success)."""
 
     status = models.CharField(max_length=50, unique=True)
+    # Canonical key used by business rules (derived from the label when blank).
+    key = models.CharField(max_length=20, choices=PAYMENT_STATUS_KEY_CHOICES, blank=True, default='', db_index=True)
 
     class Meta:
         verbose_name_plural = "Payment Statuses"
@@ -14,13 +19,112 @@ class PaymentStatus(models.Model):
     def __str__(self):
         return self.status
 
-class Transaction(models.Model):
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = normalize_payment_status_key(self.status) or ''
+        super().save(*args, **kwargs)
+
+class Transaction(TrackedFieldsModel):
     """Payment transaction attached to an order."""
 
+    # Invoice and stock receivers only act when the payment status changed.
+    tracked_fields = ('payment_status_id',)
+
     order = models.OneToOneField(ShopOrder, on_delete=models.CASCADE, related_name='transaction')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    transaction_date = models.DateTimeField(auto_now_add=True)
+    transaction_date = models.DateTimeField(auto_now_add=True, db_index=True)
     payment_status = models.ForeignKey(PaymentStatus, on_delete=models.CASCADE)
+    # Watermark column for incremental jobs (seller settlements).
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"TX for Order #{self.order.id}"
+
+    def save(self, *args, **kwargs):
+        # auto_now is only written when the field is saved; partial saves must bump it too.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'updated_at']
+        super().save(*args, **kwargs)
+
+
+class SellerEarning(models.Model):
+    """A seller's share of one successful transaction (see ``finance.settlements``).
+
+    The transaction amount is split across the order's sellers by their line
+    subtotals; ``day`` is the local day the payment first counted as earned.
+    """
+
+    order = models.ForeignKey(ShopOrder, on_delete=models.CASCADE, related_name='+')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Seller Earning"
+        verbose_name_plural = "Seller Earnings"
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seller'], name='finance_sellerearning_order_seller_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} - Seller #{self.seller_id}: {self.amount}"
+
+
+class SellerSettlement(models.Model):
+    """Per-seller, per-day total of ``SellerEarning`` rows (what gets paid out)."""
+
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='settlements')
+    day = models.DateField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Seller Settlement"
+        verbose_name_plural = "Seller Settlements"
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='finance_sellersettlement_seller_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Seller #{self.seller_id} {self.day}: {self.amount}"
+
+
+class SettlementWatermark(models.Model):
+    """Where an incremental job stopped: rows changed before ``value`` are done."""
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class RevenueDaily(models.Model):
+    """Transactions per local day, payment status and payment type (see ``finance.reports``).
+
+    A summary of ``Transaction`` refreshed incrementally, so reports read a
+    few rows per day instead of scanning transactions.
+    """
+
+    day = models.DateField()
+    payment_status = models.ForeignKey(PaymentStatus, on_delete=models.CASCADE, related_name='+')
+    # Null for orders without a saved payment method.
+    payment_type = models.ForeignKey('accounts.PaymentType', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    transactions_count = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Daily Revenue"
+        verbose_name_plural = "Daily Revenue"
+        indexes = [
+            models.Index(fields=['day', 'payment_status']),
+        ]
 
     def __str__(self):
-        return f"TX for Order #{self.order.id}"
\ No newline at end of file
+        return f"{self.day} {self.payment_status_id}/{self.payment_type_id}: {self.amount}"
@@ -0,0 +1,206 @@
+"""Revenue reporting from the ``RevenueDaily`` summary table.
+
+``refresh_revenue_summary`` (Celery beat) finds the local days that have
+transactions changed since its watermark and rebuilds only those days'
+summary rows with one grouped query per chunk of days; a status change moves
+the transaction between rows of its (unchanged) day. ``revenue_report``
+then answers the staff API from the summary rows alone.
+
+Deleted transactions are not seen by the watermark; ``--full`` rebuilds
+every day.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.queries import local_date_range
+
+from .models import RevenueDaily, SettlementWatermark, Transaction
+from .settlements import _claim_run, _release_run
+from .statuses import CANCELLED, REFUNDED, SUCCESS
+
+
+WATERMARK = 'revenue_daily'
+RUN_LOCK = 'revenue_daily:lock'
+
+# ``group_by`` values of the report -> summary columns.
+GROUPINGS = {
+    'day': ('day',),
+    'status': ('payment_status__key', 'payment_status__status'),
+    'payment_type': ('payment_type_id', 'payment_type__value'),
+}
+
+
+def _local_day():
+    return TruncDate('transaction_date', tzinfo=timezone.get_default_timezone())
+
+
+def _day_runs(days: list[dt.date]) -> list[tuple[dt.date, dt.date]]:
+    """Group sorted ``days`` into ``(first, last)`` runs of consecutive days."""
+    runs: list[tuple[dt.date, dt.date]] = []
+    for day in days:
+        if runs and day - runs[-1][1] == dt.timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def rebuild_days(days) -> int:
+    """Recompute the summary rows of ``days``; return how many rows were written.
+
+    Only the local-time ranges of ``days`` are scanned (one range per run of
+    consecutive days), so sparse days far apart do not read the years between.
+    """
+
+    days = sorted(set(days))
+    if not days:
+        return 0
+    in_days = Q()
+    for first, last in _day_runs(days):
+        start, end = local_date_range(first, last)
+        in_days |= Q(transaction_date__gte=start, transaction_date__lt=end)
+    rows = (
+        Transaction.objects.filter(in_days)
+        .annotate(day=_local_day())
+        .values('day', 'payment_status_id', 'order__payment_method__payment_type_id')
+        .annotate(n=Count('id'), total=Sum('amount'))
+        .order_by()
+    )
+    summary = [
+        RevenueDaily(
+            day=row['day'],
+            payment_status_id=row['payment_status_id'],
+            payment_type_id=row['order__payment_method__payment_type_id'],
+            transactions_count=row['n'],
+            amount=row['total'] or 0,
+        )
+        for row in rows
+    ]
+    RevenueDaily.objects.filter(day__in=days).delete()
+    RevenueDaily.objects.bulk_create(summary)
+    return len(summary)
+
+
+def refresh_revenue_summary(days_per_chunk: int = 31, full: bool = False) -> dict:
+    """Rebuild the summary for days with transactions changed since the watermark.
+
+    Like the seller settlements, each run re-reads
+    ``SETTLEMENT_WATERMARK_LAG_SECONDS`` before the watermark for rows that
+    committed late, holds a run lock (``revenue_daily:lock``) and commits
+    each chunk of days on its own. Chunks go by day, not by change time, so
+    after each chunk the watermark moves to the earliest change among the
+    days still to do: a run that dies half way resumes with those days.
+    ``full`` replaces the summary chunk by chunk (also dropping days whose
+    transactions were all deleted).
+    """
+
+    days_per_chunk = max(1, int(days_per_chunk))
+    lag = dt.timedelta(seconds=int(getattr(settings, 'SETTLEMENT_WATERMARK_LAG_SECONDS', 300)))
+    lease = dt.timedelta(seconds=int(getattr(settings, 'SETTLEMENT_RUN_LEASE_SECONDS', 3600)))
+    if not _claim_run(RUN_LOCK, lease):
+        return {'days': 0, 'rows': 0, 'watermark': None, 'skipped': True}
+
+    try:
+        state, _ = SettlementWatermark.objects.get_or_create(name=WATERMARK)
+        until = timezone.now()
+        qs = Transaction.objects.filter(updated_at__lt=until)
+        if state.value and not full:
+            qs = qs.filter(updated_at__gte=state.value - lag)
+        changed = list(
+            qs.annotate(day=_local_day()).values('day').annotate(first=Min('updated_at')).order_by('day')
+            .values_list('day', 'first')
+        )
+        days = [day for day, _ in changed]
+        # resume[i]: earliest change among changed[i:] (``until`` past the end).
+        resume = [until] * (len(changed) + 1)
+        for i in range(len(changed) - 1, -1, -1):
+            resume[i] = min(changed[i][1], resume[i + 1])
+
+        rows = 0
+        for i in range(0, len(days), days_per_chunk):
+            chunk = days[i:i + days_per_chunk]
+            watermark = resume[i + len(chunk)]
+            if state.value:
+                watermark = max(watermark, state.value)
+            with transaction.atomic():
+                if full:
+                    # Days between the chunks had no transactions left.
+                    gap = RevenueDaily.objects.filter(day__lt=chunk[-1])
+                    if i:
+                        gap = gap.filter(day__gt=days[i - 1])
+                    gap.delete()
+                rows += rebuild_days(chunk)
+                SettlementWatermark.objects.filter(name=WATERMARK).update(value=watermark, last_run_at=until)
+        if full:
+            (RevenueDaily.objects.filter(day__gt=days[-1]) if days else RevenueDaily.objects.all()).delete()
+        SettlementWatermark.objects.filter(name=WATERMARK).update(value=until, last_run_at=until)
+    finally:
+        _release_run(RUN_LOCK)
+    return {'days': len(days), 'rows': rows, 'watermark': until}
+
+
+def _rate(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def revenue_report(date_from: dt.date | None = None, date_to: dt.date | None = None, group_by: str = 'day') -> dict:
+    """Transactions, amounts and refund/cancel rates per ``group_by`` bucket.
+
+    ``revenue`` only counts successful payments; ``amount`` is every
+    transaction in the bucket. Rates are shares of the bucket's transactions.
+    """
+
+    columns = GROUPINGS[group_by]
+    qs = RevenueDaily.objects.all()
+    if date_from:
+        qs = qs.filter(day__gte=date_from)
+    if date_to:
+        qs = qs.filter(day__lte=date_to)
+    rows = (
+        qs.values(*dict.fromkeys((*columns, 'payment_status__key')))
+        .annotate(n=Sum('transactions_count'), total=Sum('amount'))
+        .order_by(*columns)
+    )
+
+    buckets: dict[tuple, dict] = {}
+    grand = {'transactions': 0, 'amount': Decimal('0'), 'revenue': Decimal('0'), REFUNDED: 0, CANCELLED: 0}
+    for row in rows:
+        key = tuple(row[c] for c in columns)
+        bucket = buckets.setdefault(key, {'transactions': 0, 'amount': Decimal('0'), 'revenue': Decimal('0'), REFUNDED: 0, CANCELLED: 0})
+        status = row['payment_status__key']
+        for target in (bucket, grand):
+            target['transactions'] += row['n'] or 0
+            target['amount'] += row['total'] or 0
+            if status == SUCCESS:
+                target['revenue'] += row['total'] or 0
+            if status in (REFUNDED, CANCELLED):
+                target[status] += row['n'] or 0
+
+    def render(values: dict) -> dict:
+        return {
+            'transactions': values['transactions'],
+            'amount': f"{values['amount']:.2f}",
+            'revenue': f"{values['revenue']:.2f}",
+            'refund_rate': _rate(values[REFUNDED], values['transactions']),
+            'cancel_rate': _rate(values[CANCELLED], values['transactions']),
+        }
+
+    results = []
+    for key, values in buckets.items():
+        if group_by == 'day':
+            label = {'day': key[0].isoformat()}
+        elif group_by == 'status':
+            label = {'status': key[0], 'label': key[1]}
+        else:
+            label = {'payment_type_id': key[0], 'payment_type': key[1]}
+        results.append({**label, **render(values)})
+    return {'group_by': group_by, 'results': results, 'totals': render(grand)}
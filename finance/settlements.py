@@ -0,0 +1,195 @@
+"""Seller settlements: per-seller, per-day earnings from successful transactions.
+
+``settle_seller_earnings`` (Celery beat, daily) reads only transactions whose
+``updated_at`` moved since the stored watermark, in chunks of ids. For each
+chunk it drops the orders' ``SellerEarning`` rows, re-splits the successful
+ones across sellers by their line subtotals (the OrderSeller / archived
+links, one row per order + seller) and recomputes just the touched
+``SellerSettlement`` (seller, day) rows. Everything is set-based, so the cost
+follows the number of changed transactions, not the size of the order history;
+rerunning a chunk gives the same result.
+
+A refund or cancellation after success removes the order's earnings on the
+next run, which lowers the day it was first earned on.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from orders.models import ArchivedOrderSeller, OrderSeller
+
+from .models import SellerEarning, SellerSettlement, SettlementWatermark, Transaction
+from .statuses import SUCCESS, payment_statuses
+
+
+WATERMARK = 'seller_settlements'
+RUN_LOCK = 'seller_settlements:lock'
+CENT = Decimal('0.01')
+
+
+def split_amount(amount: Decimal, subtotals: dict[int, Decimal]) -> dict[int, Decimal]:
+    """Split ``amount`` across sellers in proportion to ``subtotals``.
+
+    Shares are rounded to cents and the last seller takes the rounding
+    remainder, so they always add up to ``amount``. Sellers with a zero
+    subtotal get nothing; if every subtotal is zero the split is even.
+    """
+
+    sellers = sorted(subtotals)
+    if not sellers:
+        return {}
+    amount = Decimal(amount or 0)
+    total = sum(subtotals.values(), Decimal('0'))
+    shares, left = {}, amount
+    for seller_id in sellers[:-1]:
+        ratio = subtotals[seller_id] / total if total else Decimal(1) / len(sellers)
+        share = (amount * ratio).quantize(CENT, rounding=ROUND_HALF_UP)
+        shares[seller_id] = share
+        left -= share
+    shares[sellers[-1]] = left
+    return shares
+
+
+def _order_subtotals(order_ids) -> dict[int, dict[int, Decimal]]:
+    """``{order_id: {seller_id: subtotal}}`` from live and archived seller links."""
+    out: dict[int, dict[int, Decimal]] = defaultdict(dict)
+    for model in (OrderSeller, ArchivedOrderSeller):
+        rows = model.objects.filter(order_id__in=order_ids).values_list('order_id', 'seller_id', 'seller_subtotal')
+        for order_id, seller_id, subtotal in rows:
+            out[order_id][seller_id] = subtotal or Decimal('0')
+    return out
+
+
+def _refresh_settlements(keys: set[tuple[int, dt.date]]) -> None:
+    """Recompute the ``SellerSettlement`` rows of ``keys`` from the earnings."""
+    if not keys:
+        return
+    sellers = {seller_id for seller_id, _ in keys}
+    days = {day for _, day in keys}
+    totals = {
+        (row['seller_id'], row['day']): row
+        for row in SellerEarning.objects.filter(seller_id__in=sellers, day__in=days)
+        .values('seller_id', 'day')
+        .annotate(total=Sum('amount'), n=Count('id'))
+        .order_by()
+        if (row['seller_id'], row['day']) in keys
+    }
+
+    now = timezone.now()
+    SellerSettlement.objects.bulk_create(
+        [
+            SellerSettlement(seller_id=seller_id, day=day, amount=row['total'], orders_count=row['n'], updated_at=now)
+            for (seller_id, day), row in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['seller', 'day'],
+        update_fields=['amount', 'orders_count', 'updated_at'],
+    )
+    emptied = [
+        pk for pk, seller_id, day in SellerSettlement.objects.filter(seller_id__in=sellers, day__in=days)
+        .values_list('id', 'seller_id', 'day')
+        if (seller_id, day) in keys and (seller_id, day) not in totals
+    ]
+    if emptied:
+        SellerSettlement.objects.filter(id__in=emptied).delete()
+
+
+def settle_transactions(rows) -> int:
+    """Re-split ``(order_id, amount, payment_status_id, updated_at)`` rows; return earnings written.
+
+    Call inside a transaction: the chunk's earnings and settlements change together.
+    """
+
+    rows = list(rows)
+    order_ids = [order_id for order_id, _, _, _ in rows]
+    old = list(SellerEarning.objects.filter(order_id__in=order_ids).values_list('order_id', 'seller_id', 'day'))
+    # The day an order was first earned on stays put when it is re-split.
+    first_day = {order_id: day for order_id, _, day in old}
+    touched = {(seller_id, day) for _, seller_id, day in old}
+    SellerEarning.objects.filter(order_id__in=order_ids).delete()
+
+    paid = [row for row in rows if payment_statuses.key_for_id(row[2]) == SUCCESS]
+    subtotals = _order_subtotals([order_id for order_id, _, _, _ in paid])
+    earnings = []
+    for order_id, amount, _, updated_at in paid:
+        day = first_day.get(order_id) or timezone.localdate(updated_at)
+        for seller_id, share in split_amount(amount, subtotals.get(order_id, {})).items():
+            earnings.append(SellerEarning(order_id=order_id, seller_id=seller_id, day=day, amount=share))
+            touched.add((seller_id, day))
+    SellerEarning.objects.bulk_create(earnings)
+    _refresh_settlements(touched)
+    return len(earnings)
+
+
+def _claim_run(name: str, lease: dt.timedelta) -> bool:
+    """Take the run lock ``name`` (a watermark row holding its expiry); False if held."""
+    with transaction.atomic():
+        lock, _ = SettlementWatermark.objects.select_for_update().get_or_create(name=name)
+        now = timezone.now()
+        if lock.value and lock.value > now:
+            return False
+        lock.value = now + lease
+        lock.last_run_at = now
+        lock.save(update_fields=['value', 'last_run_at'])
+    return True
+
+
+def _release_run(name: str) -> None:
+    SettlementWatermark.objects.filter(name=name).update(value=None)
+
+
+def settle_seller_earnings(batch_size: int = 1000, full: bool = False) -> dict:
+    """Fold transactions changed since the watermark into seller settlements.
+
+    Each chunk commits on its own, so neither transactions nor locks grow
+    with the backlog; a run lock (``seller_settlements:lock``, expiring after
+    ``SETTLEMENT_RUN_LEASE_SECONDS`` if a run dies) keeps two runs apart and
+    the watermark only moves once the last chunk committed. A run that dies
+    half way is simply redone from the old watermark (re-splitting is
+    idempotent).
+
+    Rows saved shortly before the previous run may have committed after it,
+    so each run re-reads ``SETTLEMENT_WATERMARK_LAG_SECONDS`` before the
+    watermark. ``full`` ignores the watermark.
+    """
+
+    batch_size = max(1, int(batch_size))
+    lag = dt.timedelta(seconds=int(getattr(settings, 'SETTLEMENT_WATERMARK_LAG_SECONDS', 300)))
+    lease = dt.timedelta(seconds=int(getattr(settings, 'SETTLEMENT_RUN_LEASE_SECONDS', 3600)))
+    if not _claim_run(RUN_LOCK, lease):
+        return {'transactions': 0, 'earnings': 0, 'watermark': None, 'skipped': True}
+
+    try:
+        state, _ = SettlementWatermark.objects.get_or_create(name=WATERMARK)
+        until = timezone.now()
+        qs = Transaction.objects.filter(updated_at__lt=until)
+        if state.value and not full:
+            qs = qs.filter(updated_at__gte=state.value - lag)
+
+        processed = written = 0
+        last_id = 0
+        while True:
+            chunk = list(
+                qs.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'order_id', 'amount', 'payment_status_id', 'updated_at')[:batch_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            with transaction.atomic():
+                written += settle_transactions(row[1:] for row in chunk)
+            processed += len(chunk)
+
+        SettlementWatermark.objects.filter(name=WATERMARK).update(value=until, last_run_at=until)
+    finally:
+        _release_run(RUN_LOCK)
+    return {'transactions': processed, 'earnings': written, 'watermark': until}
@@ -1,73 +1,80 @@
 """Signals for finance side-effects (e.g., stock adjustments)."""
 
-from django.db.models.signals import post_save, pre_save
+from collections import defaultdict
+
+from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.db import transaction
+from orders import outbox
+from orders.models import OrderLine, ShopOrder
+from orders.statuses import DELIVERED, order_statuses
+from products.inventory import movement, record_movements
+from products.models import InventoryMovement
 from .models import Transaction
+from .statuses import SUCCESS, payment_statuses
+
+
+def _order_status_key(tx: Transaction):
+    """Status key of the transaction's order (no query when the order is loaded)."""
+    if Transaction.order.is_cached(tx):
+        status_id = tx.order.order_status_id
+    else:
+        status_id = ShopOrder.objects.filter(id=tx.order_id).values_list('order_status_id', flat=True).first()
+    return order_statuses.key_for_id(status_id)
+
 
-# 1. حفظ الحالة القديمة للمقارنة (مهم جداً لمنع التكرار)
-@receiver(pre_save, sender=Transaction)
-def capture_old_data(sender, instance, **kwargs):
-    """Capture previous payment/order status to make post-save actions idempotent."""
-    try:
-        if instance.pk:
-            old_obj = Transaction.objects.get(pk=instance.pk)
-            # بنحفظ حالة الدفع القديمة وحالة الأوردر القديمة
-            instance._old_pay_status = old_obj.payment_status.status if old_obj.payment_status else None
-            instance._old_order_status = old_obj.order.order_status.status if old_obj.order.order_status else None
-        else:
-            instance._old_pay_status = None
-            instance._old_order_status = None
-    except Transaction.DoesNotExist:
-        instance._old_pay_status = None
-        instance._old_order_status = None
-
-# 2. تنفيذ الخصم أو الإرجاع بناءً على الشرط المزدوج
+# 1. تسجيل الخصم أو الإرجاع في الـ outbox بناءً على الشرط المزدوج
 @receiver(post_save, sender=Transaction)
 def handle_stock_double_check(sender, instance, **kwargs):
-    """Adjust inventory exactly once when payment+delivery conditions change.
+    """Queue a stock adjustment when payment+delivery conditions change.
 
-    Decrements stock when a transaction becomes (Success + Delivered), and restores stock
-    if it transitions away from that fully-confirmed state.
+    Stock is decremented when a transaction becomes (Success + Delivered) and
+    restored if it transitions away from that fully-confirmed state; the
+    adjustment itself runs from the outbox (``adjust_order_stock``). The
+    previous payment status comes from the values loaded with the instance
+    (``TrackedFieldsModel``), so saves that keep it cost no queries.
     """
 
-    order = instance.order
-    # الحالات الجديدة بعد الحفظ
-    new_pay_status = instance.payment_status.status if instance.payment_status else None
-    new_order_status = order.order_status.status if order.order_status else None
-    
-    # الحالات القديمة قبل الحفظ
-    old_pay_status = getattr(instance, '_old_pay_status', None)
-    old_order_status = getattr(instance, '_old_order_status', None)
-
-    # التحقق: هل العملية الآن (نجاح + تم التوصيل)؟
-    is_fully_confirmed = (new_pay_status == 'Success' and new_order_status == 'Delivered')
-    # التحقق: هل كانت العملية (نجاح + تم التوصيل) وتغيرت؟
-    was_fully_confirmed = (old_pay_status == 'Success' and old_order_status == 'Delivered')
-
-    # لو مفيش تغيير في الحالة النهائية، اخرج
-    if is_fully_confirmed == was_fully_confirmed:
+    if not instance.has_changed('payment_status_id'):
+        return
+
+    # الحالة القديمة (وقت التحميل) والجديدة بعد الحفظ
+    was_paid = payment_statuses.key_for_id(instance.loaded_value('payment_status_id')) == SUCCESS
+    is_paid = payment_statuses.key_for_id(instance.payment_status_id) == SUCCESS
+
+    # لو مفيش تغيير في الحالة النهائية (نجاح + تم التوصيل)، اخرج
+    if was_paid == is_paid or _order_status_key(instance) != DELIVERED:
         return
 
-    from orders.models import OrderLine
-    order_items = OrderLine.objects.filter(order=order)
-
-    with transaction.atomic():
-        for item in order_items:
-            product_item = item.product_item
-            existing_fields = [f.name for f in product_item._meta.fields]
-            target_field = next((f for f in ['qty_in_stock', 'stock', 'quantity', 'stock_quantity'] if f in existing_fields), None)
-            
-            if not target_field: continue
-            current_stock = getattr(product_item, target_field)
-
-            # الحالة أ: العملية اكتملت الآن (Success + Delivered) -> اخصم
-            if is_fully_confirmed:
-                if current_stock >= item.qty:
-                    setattr(product_item, target_field, current_stock - item.qty)
-                    product_item.save()
-
-            # الحالة ب: العملية كانت مكتملة وتم التراجع عنها -> رجع المخزن
-            elif was_fully_confirmed and not is_fully_confirmed:
-                setattr(product_item, target_field, current_stock + item.qty)
-                product_item.save()
\ No newline at end of file
+    outbox.enqueue(outbox.STOCK_ADJUST, {'order_id': instance.order_id, 'restore': was_paid})
+
+
+@outbox.handler(outbox.STOCK_ADJUST)
+def adjust_order_stock(payload: dict) -> None:
+    """Deduct (or with ``restore`` give back) the order's line quantities.
+
+    Writes one ledger movement per line and moves every SKU with one
+    set-based UPDATE (``products.inventory``). Deductions skip SKUs without
+    enough stock left.
+    """
+
+    order_id = payload['order_id']
+    restore = bool(payload.get('restore'))
+    lines = list(
+        OrderLine.objects.filter(order_id=order_id, product_item__isnull=False)
+        .values_list('id', 'product_item_id', 'qty', 'product_item__qty_in_stock')
+    )
+
+    if restore:
+        # العملية كانت مكتملة وتم التراجع عنها -> رجع المخزن
+        movements = [movement(sku_id, qty, InventoryMovement.DELIVERY_REVERSAL, order_id, line_id) for line_id, sku_id, qty, _ in lines]
+    else:
+        # العملية اكتملت (Success + Delivered) -> اخصم
+        needed = defaultdict(int)
+        for _, sku_id, qty, _ in lines:
+            needed[sku_id] += qty
+        movements = [
+            movement(sku_id, -qty, InventoryMovement.DELIVERY, order_id, line_id)
+            for line_id, sku_id, qty, stock in lines
+            if stock >= needed[sku_id]
+        ]
+    record_movements(movements)
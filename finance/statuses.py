@@ -0,0 +1,50 @@
+"""Canonical payment status keys and the process-local PaymentStatus registry.
+
+Mirrors :mod:`orders.statuses`: labels are free-form, business rules use
+``PaymentStatus.key``.
+"""
+
+from __future__ import annotations
+
+from orders.statuses import StatusRegistry
+
+
+PENDING = 'pending'
+SUCCESS = 'success'
+CANCELLED = 'cancelled'
+REFUNDED = 'refunded'
+
+PAYMENT_STATUS_LABELS: dict[str, str] = {
+    PENDING: 'Pending',
+    SUCCESS: 'Success',
+    CANCELLED: 'Cancelled',
+    REFUNDED: 'Refunded',
+}
+
+PAYMENT_STATUS_KEY_CHOICES = [(k, v) for k, v in PAYMENT_STATUS_LABELS.items()]
+
+
+def normalize_payment_status_key(label: str) -> str | None:
+    """Normalize a PaymentStatus label into a canonical key (None if unknown)."""
+
+    s = str(label or '').strip().lower()
+    if not s:
+        return None
+
+    cancelled = {'cancelled', 'canceled', 'cancel', 'ملغي', 'ملغى', 'إلغاء', 'الغاء'}
+    refunded = {'refunded', 'refund', 'returned', 'مرتجع', 'استرجاع', 'ارجاع', 'إرجاع'}
+    success = {'success', 'paid', 'completed', 'complete', 'مدفوع', 'تم الدفع', 'ناجح'}
+    pending = {'pending', 'unpaid', 'قيد', 'انتظار'}
+
+    if any(m in s for m in cancelled):
+        return CANCELLED
+    if any(m in s for m in refunded):
+        return REFUNDED
+    if any(m in s for m in success):
+        return SUCCESS
+    if any(m in s for m in pending):
+        return PENDING
+    return None
+
+
+payment_statuses = StatusRegistry('finance.PaymentStatus', PAYMENT_STATUS_LABELS)
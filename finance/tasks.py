@@ -0,0 +1,23 @@
+"""Celery tasks for finance."""
+
+from __future__ import annotations
+
+from celery import shared_task
+from django.conf import settings
+
+from .reports import refresh_revenue_summary as _refresh_revenue
+from .settlements import settle_seller_earnings as _settle
+
+
+@shared_task(ignore_result=True)
+def settle_seller_earnings() -> dict:
+    """Fold new/changed transactions into seller settlements (daily, by beat)."""
+    result = _settle(batch_size=getattr(settings, 'SETTLEMENT_BATCH_SIZE', 1000))
+    return {'transactions': result['transactions'], 'earnings': result['earnings']}
+
+
+@shared_task(ignore_result=True)
+def refresh_revenue_summary() -> dict:
+    """Rebuild ``RevenueDaily`` rows for days with changed transactions (by beat)."""
+    result = _refresh_revenue()
+    return {'days': result['days'], 'rows': result['rows']}
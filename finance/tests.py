@@ -1,5 +1,152 @@
 """Finance app tests."""
 
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cart.models import ShoppingCart, ShoppingCartItem
+from finance.models import RevenueDaily, SellerSettlement, SettlementWatermark, Transaction
+from finance.reports import _day_runs, rebuild_days, refresh_revenue_summary
+from finance.settlements import settle_seller_earnings, split_amount
+from finance.statuses import payment_statuses
+from orders.models import OrderStatus, ShopOrder
+from orders.outbox import drain_outbox
+from orders.tests import CheckoutFixtureMixin
+from products.models import Product, ProductItem
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'])
+class FinanceTests(CheckoutFixtureMixin, TestCase):
+	"""Seller settlements and revenue reporting from order transactions."""
+
+	def test_seller_settlements_split_orders_by_line_owner(self):
+		other_seller = get_user_model().objects.create_user(
+			username='settle_seller', email='settle@example.com', password='12345678', user_type='seller',
+		)
+		other_item = ProductItem.objects.create(
+			product=Product.objects.create(seller=other_seller, category=self.category, name='Other', description='Test'),
+			sku='SETTLE-SKU', qty_in_stock=10, price='30.00',
+		)
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		ShoppingCartItem.objects.create(cart=cart, product_item=other_item, qty=1)
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		# 10.00 (self.seller) + 30.00 (other_seller).
+		order_id = self._place_order(client)
+		unpaid_id = self._place_order(client)
+
+		order = ShopOrder.objects.get(id=order_id)
+		order.order_status = OrderStatus.objects.create(status='Delivered')
+		order.save(update_fields=['order_status'])
+		drain_outbox()
+		result = settle_seller_earnings()
+		self.assertEqual((result['transactions'], result['earnings']), (2, 2))
+		today = timezone.localdate()
+		rows = dict(SellerSettlement.objects.filter(day=today).values_list('seller_id', 'amount'))
+		self.assertEqual(rows, {self.seller.id: Decimal('10.00'), other_seller.id: Decimal('30.00')})
+
+		# Nothing changed since the watermark: only the lag window is re-read.
+		with override_settings(SETTLEMENT_WATERMARK_LAG_SECONDS=0):
+			self.assertEqual(settle_seller_earnings()['transactions'], 0)
+
+		# A run in progress (unexpired lock) keeps others out.
+		lock = SettlementWatermark.objects.filter(name='seller_settlements:lock')
+		lock.update(value=timezone.now() + timedelta(minutes=5))
+		self.assertTrue(settle_seller_earnings().get('skipped'))
+		lock.update(value=None)
+
+		# A refund after success takes the earnings back out.
+		Transaction.objects.filter(order_id=unpaid_id).update(updated_at=timezone.now() - timedelta(days=1))
+		tx = Transaction.objects.get(order_id=order_id)
+		tx.payment_status = payment_statuses.get('refunded')
+		tx.save(update_fields=['payment_status'])
+		with override_settings(SETTLEMENT_WATERMARK_LAG_SECONDS=0):
+			self.assertEqual(settle_seller_earnings()['transactions'], 1)
+		self.assertFalse(SellerSettlement.objects.exists())
+
+		tx.payment_status = payment_statuses.get('success')
+		tx.save(update_fields=['payment_status'])
+		settle_seller_earnings()
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=other_seller)
+		res = seller_client.get('/api/sellers/me/settlements/', {'date_from': today.isoformat()})
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(res.data['results'], [{'day': today.isoformat(), 'amount': '30.00', 'orders_count': 1}])
+		self.assertEqual(client.get('/api/sellers/me/settlements/').status_code, 403)
+
+		# Shares always add up to the paid amount.
+		shares = split_amount(Decimal('10.00'), {1: Decimal('1'), 2: Decimal('1'), 3: Decimal('1')})
+		self.assertEqual((sum(shares.values()), shares[3]), (Decimal('10.00'), Decimal('3.34')))
+
+	def test_revenue_report_reads_refreshed_summary(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_ids = [self._place_order(client) for _ in range(4)]
+		delivered = OrderStatus.objects.create(status='Delivered')
+		for order in ShopOrder.objects.filter(id__in=order_ids[:2]):
+			order.order_status = delivered
+			order.save(update_fields=['order_status'])
+		drain_outbox()
+		tx = Transaction.objects.get(order_id=order_ids[1])
+		tx.payment_status = payment_statuses.get('refunded')
+		tx.save(update_fields=['payment_status'])
+		tx = Transaction.objects.get(order_id=order_ids[2])
+		tx.payment_status = payment_statuses.get('cancelled')
+		tx.save(update_fields=['payment_status'])
+		self.assertEqual(refresh_revenue_summary()['days'], 1)
+
+		staff = get_user_model().objects.create_user(username='finance_staff', password='12345678', is_staff=True)
+		staff_client = APIClient()
+		staff_client.force_authenticate(user=staff)
+		today = timezone.localdate().isoformat()
+		# The report reads summary rows only, never transactions.
+		with CaptureQueriesContext(connection) as ctx:
+			res = staff_client.get('/api/finance/revenue/', {'date_from': today, 'date_to': today})
+		self.assertEqual(res.status_code, 200)
+		self.assertFalse(any('finance_transaction' in q['sql'] for q in ctx.captured_queries))
+		self.assertEqual(res.data['results'], [{
+			'day': today, 'transactions': 4, 'amount': '40.00', 'revenue': '10.00', 'refund_rate': 0.25, 'cancel_rate': 0.25,
+		}])
+		res = staff_client.get('/api/finance/revenue/', {'group_by': 'payment_type'})
+		self.assertEqual([(r['payment_type'], r['transactions']) for r in res.data['results']], [('Cash on Delivery', 4)])
+		self.assertEqual(staff_client.get('/api/finance/revenue/', {'group_by': 'seller'}).status_code, 400)
+		self.assertEqual(client.get('/api/finance/revenue/').status_code, 403)
+
+		# A later status change moves the transaction to its new status row.
+		tx.payment_status = payment_statuses.get('success')
+		tx.save(update_fields=['payment_status'])
+		refresh_revenue_summary()
+		res = staff_client.get('/api/finance/revenue/', {'group_by': 'status'})
+		by_status = {r['status']: r['transactions'] for r in res.data['results']}
+		self.assertEqual(by_status, {'pending': 1, 'refunded': 1, 'success': 2})
+		self.assertEqual(RevenueDaily.objects.count(), 3)
+
+		# Sparse days are rebuilt from their own ranges, not the span between them.
+		old_day = timezone.localdate() - timedelta(days=400)
+		Transaction.objects.filter(id=tx.id).update(transaction_date=timezone.now() - timedelta(days=400))
+		self.assertEqual(_day_runs([old_day, old_day + timedelta(days=1), timezone.localdate()]), [
+			(old_day, old_day + timedelta(days=1)), (timezone.localdate(), timezone.localdate()),
+		])
+		rebuild_days([old_day, timezone.localdate()])
+		self.assertEqual(RevenueDaily.objects.get(day=old_day).transactions_count, 1)
+
+		# A full run replaces the summary one committed chunk at a time and
+		# drops days with no transactions left, then moves the watermark.
+		gap_day, late_day = old_day + timedelta(days=3), timezone.localdate() + timedelta(days=2)
+		for day in (gap_day, late_day):
+			RevenueDaily.objects.create(day=day, payment_status=tx.payment_status, transactions_count=1, amount=1)
+		result = refresh_revenue_summary(days_per_chunk=1, full=True)
+		self.assertEqual(result['days'], 2)
+		self.assertEqual(sorted(set(RevenueDaily.objects.values_list('day', flat=True))), [old_day, timezone.localdate()])
+		self.assertEqual(SettlementWatermark.objects.get(name='revenue_daily').value, result['watermark'])
+
+		# A run in progress (unexpired lock) keeps others out.
+		lock = SettlementWatermark.objects.filter(name='revenue_daily:lock')
+		lock.update(value=timezone.now() + timedelta(minutes=5))
+		self.assertTrue(refresh_revenue_summary().get('skipped'))
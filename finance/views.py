@@ -1,5 +1,72 @@
 """Finance API views.
 
-This module is intentionally minimal; most finance logic is handled by models/signals.
+Most finance logic is handled by models/signals; sellers read their
+settlements (``finance.settlements``) and staff read revenue reports
+(``finance.reports``) here. Both read summary tables, never raw transactions.
 """
 
+from django.db.models import Count, Sum
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from accounts.permissions import IsSeller
+from orders.queries import OrderFilters
+from .models import SellerSettlement
+from .reports import GROUPINGS, revenue_report
+
+MAX_SETTLEMENT_DAYS = 366
+
+
+@api_view(['GET'])
+@permission_classes([IsSeller])
+def seller_settlements_view(request):
+    """Return the seller's daily settlements, newest first.
+
+    ``?date_from`` / ``?date_to`` (YYYY-MM-DD, inclusive) narrow the range;
+    at most ``limit`` days are returned (default/max 366). ``total`` covers
+    the whole filtered range.
+    """
+    qs = SellerSettlement.objects.filter(seller=request.user)
+    # Same date parsing as the order lists (invalid dates are ignored).
+    filters = OrderFilters.from_params(request.query_params)
+    if filters.date_from:
+        qs = qs.filter(day__gte=filters.date_from)
+    if filters.date_to:
+        qs = qs.filter(day__lte=filters.date_to)
+    try:
+        limit = min(MAX_SETTLEMENT_DAYS, max(1, int(request.query_params.get('limit') or MAX_SETTLEMENT_DAYS)))
+    except (TypeError, ValueError):
+        return Response({'detail': 'limit must be an integer.'}, status=400)
+
+    totals = qs.aggregate(amount=Sum('amount'), orders_count=Sum('orders_count'), days=Count('id'))
+    rows = qs.order_by('-day').values('day', 'amount', 'orders_count')[:limit]
+    return Response({
+        'results': [
+            {'day': row['day'].isoformat(), 'amount': f"{row['amount']:.2f}", 'orders_count': row['orders_count']}
+            for row in rows
+        ],
+        'total': {
+            'amount': f"{totals['amount'] or 0:.2f}",
+            'orders_count': totals['orders_count'] or 0,
+            'days': totals['days'],
+        },
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def revenue_report_view(request):
+    """Staff revenue report from the ``RevenueDaily`` summary.
+
+    ``?group_by=day|status|payment_type`` (default ``day``), optional
+    ``date_from`` / ``date_to`` (transaction local day, inclusive). Each row
+    and the totals carry transactions, amount, revenue (successful payments)
+    and refund/cancel rates. The summary lags transactions by up to one
+    ``refresh_revenue_summary`` beat interval.
+    """
+    group_by = request.query_params.get('group_by') or 'day'
+    if group_by not in GROUPINGS:
+        return Response({'detail': f"group_by must be one of: {', '.join(GROUPINGS)}."}, status=400)
+    filters = OrderFilters.from_params(request.query_params)
+    return Response(revenue_report(filters.date_from, filters.date_to, group_by))
@@ -62,11 +62,11 @@
   }
 
   /**
-   * Update cart count from a cart API response payload.
+   * Update cart count from a cart API response payload (full cart or /summary/).
    * Prefers VeloState (api.js) so all listeners stay consistent.
    */
   function updateGlobalCartCount(data) {
-    const totalQty = computeTotalQty(data?.items);
+    const totalQty = typeof data?.quantity === 'number' ? data.quantity : computeTotalQty(data?.items);
     if (window.VeloState && typeof window.VeloState.setCartCount === 'function') {
       window.VeloState.setCartCount(totalQty);
       return;
@@ -82,14 +82,15 @@
   }
 
   /**
-   * Fetch cart data and update the global badge.
+   * Fetch the cached cart summary and update the global badge.
    * - Guests can browse products: don't force login by calling cart APIs.
    * - Sellers don't see customer cart UI.
+   * - The summary carries a `version`; pages needing lines refetch /api/cart/ only when it changes.
    */
   async function refreshCartBadge() {
     try {
-      const apiUrl = window.CART_CONFIG?.apiUrl || '/api/cart/';
-      const url = `${apiUrl}?t=${Date.now()}`;
+      const summaryUrl = window.CART_CONFIG?.summaryUrl || '/api/cart/summary/';
+      const url = `${summaryUrl}?t=${Date.now()}`;
 
       const response = (typeof window.request === 'function')
         ? await window.request(url, { method: 'GET', redirectOnAuthError: false })
@@ -100,6 +101,8 @@
 
       const data = await response.json().catch(() => null);
       if (!data) return;
+      if (data.version !== undefined && data.version === window.VELO_CART_VERSION) return;
+      window.VELO_CART_VERSION = data.version;
       updateGlobalCartCount(data);
     } catch (_) {
       // Intentionally ignore: badge refresh should never break the page.
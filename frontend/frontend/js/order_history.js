@@ -13,7 +13,7 @@
   const trackBtn = document.getElementById('orders-track');
 
   const state = {
-    nextUrl: '/api/orders/my-orders/',
+    nextUrl: '/api/orders/my-orders/?view=summary',
     loading: false,
   };
 
@@ -38,10 +38,11 @@
   }
 
   function buildMyOrdersUrl({ q } = {}) {
-    const base = '/api/orders/my-orders/';
+    // The history list only shows id/date/total/status: ask for the flat summary rows.
+    const base = '/api/orders/my-orders/?view=summary';
     const qs = String(q || '').trim();
     if (!qs) return base;
-    return `${base}?q=${encodeURIComponent(qs)}`;
+    return `${base}&q=${encodeURIComponent(qs)}`;
   }
 
   function showToast(message, type = 'info') {
@@ -7,6 +7,15 @@
 
   const detailsEl = byId('order-track-details');
   const statusUpdateEl = byId('order-status-update');
+  const timelineEl = byId('order-track-timeline');
+
+  // Timeline state: events are read incrementally with ?after=<last id>.
+  // Live updates come from the SSE stream; polling is the fallback.
+  const EVENTS_POLL_MS = 30000;
+  let timelineEvents = [];
+  let lastEventId = 0;
+  let pollTimer = null;
+  let refreshTimer = null;
 
   const esc = (value) => {
     if (typeof window.escapeHtml === 'function') return window.escapeHtml(value);
@@ -270,7 +279,95 @@
 
       showToast('تم تحديث حالة الطلب.', 'success');
       await loadOrder(order.id);
+      await loadNewEvents(order.id);
+    });
+  }
+
+  function eventLabel(ev) {
+    const status = esc(ev.status || '—');
+    if (ev.type === 'placed') return 'تم إنشاء الطلب';
+    if (ev.type === 'order_status') return `حالة الطلب: <span class="fw-bold">${status}</span>`;
+    if (ev.type === 'line_status') return `حالة العنصر #${esc(ev.line_id)}: <span class="fw-bold">${status}</span>`;
+    if (ev.type === 'tracking') {
+      const d = ev.data || {};
+      return `بيانات الشحن: ${esc(d.shipping_carrier || '—')} ${d.tracking_number ? `(${esc(d.tracking_number)})` : ''}`;
+    }
+    return esc(ev.type);
+  }
+
+  function renderTimeline() {
+    if (!timelineEl) return;
+    if (!timelineEvents.length) {
+      timelineEl.innerHTML = '';
+      return;
+    }
+    const items = timelineEvents
+      .slice()
+      .reverse()
+      .map(
+        (ev) => `
+        <li class="list-group-item d-flex justify-content-between align-items-center gap-3">
+          <div>${eventLabel(ev)}</div>
+          <div class="text-muted small text-nowrap">${formatDate(ev.created_at)}</div>
+        </li>`
+      )
+      .join('');
+    timelineEl.innerHTML = `
+      <div class="card border-0 shadow-sm p-3" style="border-radius:16px;">
+        <h6 class="mb-2">سجل الطلب</h6>
+        <ul class="list-group list-group-flush">${items}</ul>
+      </div>
+    `;
+  }
+
+  // Fetch only events newer than the last one seen; returns how many arrived.
+  async function loadNewEvents(orderId) {
+    let added = 0;
+    for (;;) {
+      const res = await window.request(`/api/orders/${orderId}/events/?after=${lastEventId}`);
+      if (!res || !res.ok) break;
+      const data = await readJsonSafe(res);
+      const events = Array.isArray(data?.events) ? data.events : [];
+      timelineEvents = timelineEvents.concat(events);
+      added += events.length;
+      lastEventId = Number(data?.last_event_id ?? lastEventId) || lastEventId;
+      if (!data?.has_more) break;
+    }
+    if (added) renderTimeline();
+    return added;
+  }
+
+  // Coalesce bursts of pushed events into one events + order refetch.
+  function scheduleRefresh(orderId) {
+    if (refreshTimer) clearTimeout(refreshTimer);
+    refreshTimer = setTimeout(async () => {
+      refreshTimer = null;
+      if (await loadNewEvents(orderId)) await loadOrder(orderId, { quiet: true });
+    }, 300);
+  }
+
+  function startEventStream(orderId) {
+    if (typeof window.EventSource !== 'function') return false;
+    const source = new EventSource(`/api/orders/stream/?order=${orderId}`, { withCredentials: true });
+    // (Re)connected: catch up on anything missed while offline.
+    source.addEventListener('open', () => scheduleRefresh(orderId));
+    source.addEventListener('order', () => scheduleRefresh(orderId));
+    source.addEventListener('resync', () => scheduleRefresh(orderId));
+    source.addEventListener('error', () => {
+      // CLOSED means the server refused the stream; fall back to polling.
+      if (source.readyState === EventSource.CLOSED) startEventsPolling(orderId);
     });
+    window.addEventListener('beforeunload', () => source.close());
+    return true;
+  }
+
+  function startEventsPolling(orderId) {
+    if (pollTimer) clearInterval(pollTimer);
+    pollTimer = setInterval(async () => {
+      if (document.hidden) return;
+      // The full order is only refetched when something actually changed.
+      if (await loadNewEvents(orderId)) await loadOrder(orderId, { quiet: true });
+    }, EVENTS_POLL_MS);
   }
 
   function getOrderIdFromUrl() {
@@ -280,13 +377,13 @@
     return Number.isFinite(n) ? n : null;
   }
 
-  async function loadOrder(orderId) {
+  async function loadOrder(orderId, { quiet = false } = {}) {
     if (!orderId) {
       renderError('رقم الطلب غير صحيح.');
       return;
     }
 
-    renderLoading();
+    if (!quiet) renderLoading();
 
     const res = await window.request(`/api/orders/${orderId}/`);
     if (!res) return;
@@ -305,5 +402,9 @@
     if (typeof window.bindCartBadge === 'function') window.bindCartBadge('cart-count');
     const orderId = getOrderIdFromUrl();
     await loadOrder(orderId);
+    if (orderId) {
+      await loadNewEvents(orderId);
+      if (!startEventStream(orderId)) startEventsPolling(orderId);
+    }
   });
 })();
@@ -16,11 +16,13 @@
   const dateToInput = byId('so-date-to');
   const applyBtn = byId('so-apply');
   const resetBtn = byId('so-reset');
+  const exportBtn = byId('so-export');
 
   let currentBaseUrl = '/api/orders/seller-orders/';
   let searchDebounceId = null;
   let cachedStatuses = null;
   let loadedTotal = 0;
+  let liveReloadTimer = null;
 
   const esc = (value) => {
     if (typeof window.escapeHtml === 'function') return window.escapeHtml(value);
@@ -232,12 +234,11 @@
   }
 
   function orderCardHtml(order, statuses) {
+    // `order` is a summary row (?view=summary): lines, address and phone are
+    // loaded from /api/orders/<id>/ when the card is expanded.
     const canUpdate = !!order?.can_update_status;
-    const isMultiVendor = !canUpdate;
     const otherCount = Number(order?.other_sellers_lines_count ?? 0) || 0;
-    const addr = order?.shipping_address_details || null;
-    const shipShort = addr ? [addr.city, addr.region].filter(Boolean).join('، ') : '';
-    const customerPhone = order?.customer_phone_number || '';
+    const lineCount = Number(order?.line_count ?? 0) || 0;
     const customerUsername = order?.customer_username || '';
 
     const carrier = order?.shipping_carrier || '';
@@ -252,9 +253,8 @@
             <div class="fw-bold" style="color:#0f172a;">طلب رقم #${order.id}</div>
             <div class="text-muted small">تاريخ الطلب: ${formatDate(order.order_date)}</div>
             <div class="text-muted small">حالة الدفع: ${paymentBadge(order.payment_status)}</div>
-            ${shipShort ? `<div class="text-muted small">الشحن: <span class="fw-bold">${esc(shipShort)}</span></div>` : ''}
             ${customerUsername ? `<div class="text-muted small">العميل: <span class="fw-bold">${esc(customerUsername)}</span></div>` : ''}
-            ${customerPhone ? `<div class="text-muted small">هاتف العميل: <span class="fw-bold">${esc(customerPhone)}</span></div>` : ''}
+            <div class="text-muted small" data-role="order-contact" data-order-id="${order.id}"></div>
           </div>
           <div class="text-end">
             <div class="text-muted small">الإجمالي</div>
@@ -302,11 +302,55 @@
           </div>
         `}
 
-        ${linesHtml(order.id, order.lines, statuses, isMultiVendor)}
+        <div class="mt-3">
+          <button class="btn btn-sm btn-outline-secondary rounded-pill" data-action="order-expand" data-order-id="${order.id}">
+            عرض التفاصيل${lineCount ? ` (${lineCount})` : ''}
+          </button>
+        </div>
+        <div class="d-none" data-role="order-details" data-order-id="${order.id}"></div>
       </div>
     `;
   }
 
+  function contactHtml(order) {
+    const addr = order?.shipping_address_details || null;
+    const shipShort = addr ? [addr.city, addr.region].filter(Boolean).join('، ') : '';
+    const customerPhone = order?.customer_phone_number || '';
+    return `
+      ${shipShort ? `<div>الشحن: <span class="fw-bold">${esc(shipShort)}</span></div>` : ''}
+      ${customerPhone ? `<div>هاتف العميل: <span class="fw-bold">${esc(customerPhone)}</span></div>` : ''}
+    `;
+  }
+
+  async function expandOrder(orderId, btn) {
+    const box = root?.querySelector(`[data-role="order-details"][data-order-id="${orderId}"]`);
+    if (!box) return;
+    if (box.dataset.loaded === '1') {
+      box.classList.toggle('d-none');
+      return;
+    }
+
+    btn.disabled = true;
+    box.classList.remove('d-none');
+    box.innerHTML = '<div class="text-muted small mt-2">جاري التحميل...</div>';
+    try {
+      const statuses = await ensureStatuses();
+      const res = await window.request(`/api/orders/${orderId}/`);
+      if (!res) return;
+      const data = await readJsonSafe(res);
+      if (!res.ok || !data) {
+        box.innerHTML = `<div class="text-danger small mt-2">${esc((data && data.detail) || 'تعذر تحميل تفاصيل الطلب.')}</div>`;
+        return;
+      }
+      box.innerHTML = linesHtml(data.id, data.lines, statuses, !data.can_update_status);
+      box.dataset.loaded = '1';
+      const contact = root.querySelector(`[data-role="order-contact"][data-order-id="${orderId}"]`);
+      if (contact) contact.innerHTML = contactHtml(data);
+    } finally {
+      btn.disabled = false;
+    }
+  }
+
   async function loadStatuses() {
     const res = await window.request('/api/orders/statuses/');
     if (!res) return [];
@@ -391,6 +435,7 @@
     try {
       const apiUrl = buildUrlWithFilters('/api/orders/seller-orders/');
       const u = new URL(apiUrl, window.location.origin);
+      u.searchParams.delete('view');
       // Keep only filters in the browser URL (no API path)
       const browserUrl = `${window.location.pathname}${u.search}`;
       window.history.replaceState({}, '', browserUrl);
@@ -401,6 +446,7 @@
 
   function buildUrlWithFilters(base) {
     const url = new URL(base, window.location.origin);
+    url.searchParams.set('view', 'summary');
     const q = String(searchInput?.value || '').trim();
     const status = String(statusSelect?.value || '').trim();
     const date_from = String(dateFromInput?.value || '').trim();
@@ -414,6 +460,70 @@
     return url.pathname + url.search;
   }
 
+  function buildExportUrl() {
+    // Same filters as the list (order id search does not apply to exports).
+    const url = new URL(buildUrlWithFilters('/api/orders/export/'), window.location.origin);
+    url.searchParams.delete('view');
+    url.searchParams.delete('q');
+    url.searchParams.set('output', 'csv');
+    return url.pathname + url.search;
+  }
+
+  async function saveResponseAsFile(res, fallbackName) {
+    const disposition = res.headers.get('Content-Disposition') || '';
+    const match = disposition.match(/filename="?([^";]+)"?/);
+    const blob = await res.blob();
+    const link = document.createElement('a');
+    link.href = URL.createObjectURL(blob);
+    link.download = match ? match[1] : fallbackName;
+    document.body.appendChild(link);
+    link.click();
+    link.remove();
+    window.setTimeout(() => URL.revokeObjectURL(link.href), 1000);
+  }
+
+  async function waitForExport(statusUrl) {
+    // Large exports run in the background: poll until the file is ready.
+    for (let i = 0; i < 120; i += 1) {
+      await new Promise((resolve) => window.setTimeout(resolve, 3000));
+      const res = await window.request(statusUrl);
+      if (!res) return null;
+      const data = await readJsonSafe(res);
+      if (!res.ok || !data) return null;
+      if (data.status === 'done') return data.download_url;
+      if (data.status === 'failed') return null;
+    }
+    return null;
+  }
+
+  async function exportOrders() {
+    if (!exportBtn || typeof window.request !== 'function') return;
+    exportBtn.disabled = true;
+    try {
+      let res = await window.request(buildExportUrl());
+      if (!res) return;
+      if (res.status === 202) {
+        const job = await readJsonSafe(res);
+        showToast('جاري تجهيز ملف التصدير...', 'info');
+        const downloadUrl = job?.status_url ? await waitForExport(job.status_url) : null;
+        if (!downloadUrl) {
+          showToast('تعذر تجهيز ملف التصدير.', 'error');
+          return;
+        }
+        res = await window.request(downloadUrl);
+        if (!res) return;
+      }
+      if (!res.ok) {
+        const data = await readJsonSafe(res);
+        showToast((data && data.detail) || 'تعذر تصدير الطلبات.', 'error');
+        return;
+      }
+      await saveResponseAsFile(res, 'orders.csv');
+    } finally {
+      exportBtn.disabled = false;
+    }
+  }
+
   function clearFilters() {
     if (searchInput) searchInput.value = '';
     if (statusSelect) statusSelect.value = '';
@@ -503,6 +613,13 @@
       }
     });
 
+    root.addEventListener('click', async (e) => {
+      const btn = e.target?.closest?.('[data-action="order-expand"]');
+      if (!btn || btn.disabled) return;
+      const orderId = btn.getAttribute('data-order-id');
+      if (orderId) await expandOrder(orderId, btn);
+    });
+
     root.addEventListener('click', async (e) => {
       const btn = e.target?.closest?.('[data-action="line-status-save"]');
       if (!btn) return;
@@ -583,6 +700,28 @@
     });
   }
 
+  // New orders / overall status changes pushed over SSE refresh the list.
+  function startLiveUpdates() {
+    if (typeof window.EventSource !== 'function') return;
+    const source = new EventSource('/api/orders/stream/', { withCredentials: true });
+    source.addEventListener('order', (e) => {
+      let ev = null;
+      try {
+        ev = JSON.parse(e.data);
+      } catch (_) {
+        return;
+      }
+      if (!ev || (ev.type !== 'placed' && ev.type !== 'order_status')) return;
+      if (ev.type === 'placed') showToast(`طلب جديد #${ev.order_id}`, 'info');
+      if (liveReloadTimer) clearTimeout(liveReloadTimer);
+      liveReloadTimer = setTimeout(() => {
+        liveReloadTimer = null;
+        if (!document.hidden) loadSellerOrders(currentBaseUrl);
+      }, 1500);
+    });
+    window.addEventListener('beforeunload', () => source.close());
+  }
+
   function bindToolbar() {
     if (applyBtn) {
       applyBtn.addEventListener('click', async () => {
@@ -592,6 +731,8 @@
       });
     }
 
+    exportBtn?.addEventListener('click', exportOrders);
+
     if (resetBtn) {
       resetBtn.addEventListener('click', async () => {
         clearFilters();
@@ -651,5 +792,6 @@
     currentBaseUrl = buildUrlWithFilters('/api/orders/seller-orders/');
     pushUrlState();
     await loadSellerOrders(currentBaseUrl);
+    startLiveUpdates();
   });
 })();
@@ -1,6 +1,7 @@
 """Django admin configuration for invoices."""
 
 from django.contrib import admin
+from django.urls import reverse
 from django.utils.html import format_html, format_html_join
 
 from .models import Invoice
@@ -11,6 +12,7 @@ class InvoiceAdmin(admin.ModelAdmin):
 
     list_display = ('invoice_number', 'get_order_id', 'get_customer', 'get_total', 'issued_at', 'print_invoice_button')
     list_filter = ('issued_at',)
+    actions = ['regenerate_pdf']
     search_fields = ('invoice_number', 'order__id', 'order__user__username')
     
     # الحقول اللي هتظهر جوه صفحة الفاتورة نفسها
@@ -30,7 +32,8 @@ class InvoiceAdmin(admin.ModelAdmin):
 
     # Render order lines safely (escape all dynamic values).
     def get_order_details(self, obj):
-        lines = obj.order.lines.all()
+        order = obj.order
+        lines = order.archived_lines.all() if order.archived_at else order.lines.all()
         rows = format_html_join(
             '',
             '<tr>'
@@ -38,7 +41,7 @@ class InvoiceAdmin(admin.ModelAdmin):
             '<td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{}</td>'
             '<td style="padding: 8px; border: 1px solid #ddd; text-align: center;">{}</td>'
             '</tr>',
-            ((line.product_item, line.qty, line.price) for line in lines),
+            ((line.product_name or line.product_item, line.qty, line.price) for line in lines),
         )
         return format_html(
             '<table style="width:100%; border-collapse: collapse; border:1px solid #ccc;">'
@@ -55,14 +58,29 @@ class InvoiceAdmin(admin.ModelAdmin):
         )
     get_order_details.short_description = 'تفاصيل محتوى الفاتورة'
 
-    # دالة زرار الطباعة (تم تصحيحها لتجنب الـ TypeError)
+    # زرار الطباعة: بيفتح ملف الـ PDF لو اترسم (build_invoice_pdf) من الـ endpoint المحمي مش من /media/
     def print_invoice_button(self, obj):
-        # Avoid inline JS in the admin (XSS hardening). Keep a non-destructive placeholder.
+        if obj.pdf_file:
+            return format_html(
+                '<a class="button" href="{}" target="_blank" rel="noopener" '
+                'style="background-color:#417690; color:white; padding:5px 10px; border-radius:4px; '
+                'text-decoration:none;">معاينة وطباعة</a>',
+                reverse('invoice_pdf', args=[obj.id]),
+            )
         return format_html(
             '<a class="button" href="#" aria-disabled="true" '
             'style="background-color:#417690; color:white; padding:5px 10px; border-radius:4px; '
             'text-decoration:none; opacity:.75; cursor:not-allowed;">'
-            'معاينة وطباعة</a>'
+            'جاري تجهيز الـ PDF</a>'
         )
     
-    print_invoice_button.short_description = 'العمليات'
\ No newline at end of file
+    print_invoice_button.short_description = 'العمليات'
+
+    @admin.action(description='إعادة توليد ملف الـ PDF')
+    def regenerate_pdf(self, request, queryset):
+        from .tasks import build_invoice_pdf
+
+        ids = list(queryset.values_list('id', flat=True))
+        for invoice_id in ids:
+            build_invoice_pdf.delay(invoice_id)
+        self.message_user(request, f'{len(ids)} invoice PDF(s) queued.')
@@ -0,0 +1,101 @@
+"""Re-render invoice PDFs for a date range with a pool of worker processes.
+
+Invoice ids issued in the range are split into chunks; each worker process
+loads a chunk in a few queries, renders it with fonts and the page template
+it built once (``invoices.pdf``) and saves the files, so throughput scales
+with ``--workers``. ``--missing-only`` only fills invoices without a PDF
+(e.g. after a lost ``build_invoice_pdf`` task).
+
+Usage:
+  python manage.py regenerate_invoice_pdfs --from 2026-01-01 --to 2026-01-31
+  python manage.py regenerate_invoice_pdfs --from 2026-01-01 --workers 8 --chunk-size 50
+  python manage.py regenerate_invoice_pdfs --missing-only --workers 1
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+
+from invoices.models import Invoice
+from invoices.pdf import invoice_documents, store_invoice_pdfs
+from orders.queries import local_date_range
+
+
+def _init_worker() -> None:
+    import django
+
+    # Spawned workers start from scratch; forked ones must not reuse the parent's connections.
+    django.setup()
+    connections.close_all()
+
+
+def render_chunk(invoice_ids) -> int:
+    """Render and store one chunk of invoices (runs in a worker process)."""
+    try:
+        return store_invoice_pdfs(invoice_documents(invoice_ids))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Regenerate invoice PDFs for a date range using a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First local issue date (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='date_to', help='Last local issue date, inclusive (YYYY-MM-DD).')
+        parser.add_argument('--missing-only', action='store_true', help='Only invoices that have no PDF yet.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count; 1 renders in-process).')
+        parser.add_argument('--chunk-size', type=int, default=50, help='Invoices per worker task (default: 50).')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = dt.date.fromisoformat(options['date_from']) if options['date_from'] else None
+            date_to = dt.date.fromisoformat(options['date_to']) if options['date_to'] else None
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+        start, end = local_date_range(date_from, date_to)
+
+        qs = Invoice.objects.all()
+        if start:
+            qs = qs.filter(issued_at__gte=start)
+        if end:
+            qs = qs.filter(issued_at__lt=end)
+        if options['missing_only']:
+            qs = qs.filter(Q(pdf_file='') | Q(pdf_file__isnull=True))
+        ids = list(qs.order_by('id').values_list('id', flat=True))
+        if not ids:
+            self.stdout.write(self.style.WARNING('No invoices to render.'))
+            return
+
+        chunk_size = max(1, int(options['chunk_size']))
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        workers = max(1, min(int(options['workers']), len(chunks)))
+
+        rendered = failed = 0
+        if workers == 1:
+            for chunk in chunks:
+                rendered += store_invoice_pdfs(invoice_documents(chunk))
+        else:
+            # Children must open their own database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {pool.submit(render_chunk, chunk): chunk for chunk in chunks}
+                for future in as_completed(futures):
+                    try:
+                        rendered += future.result()
+                    except Exception as exc:
+                        chunk = futures[future]
+                        failed += len(chunk)
+                        self.stderr.write(f'Invoices {chunk[0]}..{chunk[-1]} failed: {exc}')
+
+        message = f'Rendered {rendered} invoice PDFs with {workers} worker(s).'
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{message} {failed} failed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
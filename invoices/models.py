@@ -1,6 +1,7 @@
 """Database models for invoices."""
 
-from django.db import models
+from django.db import connection, models
+
 
 class Invoice(models.Model):
     """Invoice generated for an order."""
@@ -26,4 +27,42 @@ class Invoice(models.Model):
         verbose_name_plural = "Invoices"
 
     def __str__(self):
-        return f"Invoice {self.invoice_number} for Order #{self.order.id}"
\ No newline at end of file
+        return f"Invoice {self.invoice_number} for Order #{self.order.id}"
+
+
+class InvoiceSequence(models.Model):
+    """Per-year invoice counter; ``next_value`` is the next unused number."""
+
+    year = models.PositiveIntegerField(unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Invoice Sequence"
+        verbose_name_plural = "Invoice Sequences"
+
+    def __str__(self):
+        return f"{self.year}: next {self.next_value}"
+
+    @classmethod
+    def allocate(cls, year: int, count: int = 1) -> range:
+        """Reserve ``count`` consecutive numbers of ``year`` with one row UPDATE.
+
+        The row stays locked until the caller's transaction ends, so
+        concurrent workers get disjoint blocks, and a rolled-back block is
+        handed out again (no gaps).
+        """
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        sql = (
+            f"UPDATE {table} SET next_value = next_value + %s "
+            f"WHERE year = %s RETURNING next_value"
+        )
+        for _ in range(2):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [count, year])
+                row = cursor.fetchone()
+            if row:
+                return range(row[0] - count, row[0])
+            # أول فاتورة في السنة: نعمل الصف (لو worker تاني سبقنا مفيش مشكلة)
+            cls.objects.bulk_create([cls(year=year, next_value=1)], ignore_conflicts=True)
+        raise RuntimeError(f"Could not allocate invoice numbers for {year}")
@@ -0,0 +1,198 @@
+"""Invoice PDF rendering (Pillow; no extra dependency).
+
+``invoice_documents`` loads everything a batch of invoices needs in a fixed
+number of queries (invoices + orders + customers, then lines, live and
+archived); ``render_invoice_pdf`` draws one document onto copies of a
+cached A4 page template and returns the PDF bytes. Fonts and the template
+are built once per process, so a worker rendering many invoices (the
+``build_invoice_pdf`` task or ``regenerate_invoice_pdfs``) pays for them once.
+
+Pillow draws characters left to right without joining them, so Arabic text
+(customer names, addresses, product names) is shaped with ``arabic_reshaper``
+and reordered with ``python-bidi`` when both are installed; without them it
+is drawn as isolated, left-to-right letters. The font must cover Arabic too
+(``INVOICE_PDF_FONT``; DejaVu Sans does).
+"""
+
+from __future__ import annotations
+
+import io
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageDraw, ImageFont
+
+from .models import Invoice
+
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except ImportError:  # optional: see the module docstring
+    arabic_reshaper = None
+
+
+# A4 at 150 dpi.
+DPI = 150
+PAGE_SIZE = (1240, 1754)
+MARGIN = 90
+LINES_PER_PAGE = 26
+ROW_HEIGHT = 38
+TABLE_TOP = 560
+
+# (header, x from the left margin, PIL anchor): text columns start at x,
+# numeric columns end at x.
+_COLUMNS = (
+    ('Item', 0, 'la'),
+    ('SKU', 520, 'la'),
+    ('Qty', 840, 'ra'),
+    ('Price', 960, 'ra'),
+    ('Total', PAGE_SIZE[0] - 2 * MARGIN, 'ra'),
+)
+
+
+@lru_cache(maxsize=None)
+def _font(size: int) -> ImageFont.ImageFont:
+    # INVOICE_PDF_FONT (a .ttf path) first, then common system fonts.
+    for name in (getattr(settings, 'INVOICE_PDF_FONT', None), 'DejaVuSans.ttf', 'arial.ttf'):
+        if not name:
+            continue
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+@lru_cache(maxsize=1)
+def _page_template() -> Image.Image:
+    """Blank page with the static header, table heading and footer drawn once."""
+    page = Image.new('RGB', PAGE_SIZE, 'white')
+    draw = ImageDraw.Draw(page)
+    draw.text((MARGIN, MARGIN), getattr(settings, 'INVOICE_PDF_BRAND', 'Velo Store'), font=_font(44), fill='#1f2937')
+    draw.text((PAGE_SIZE[0] - MARGIN, MARGIN), 'INVOICE', font=_font(44), fill='#417690', anchor='ra')
+    draw.line((MARGIN, MARGIN + 70, PAGE_SIZE[0] - MARGIN, MARGIN + 70), fill='#d1d5db', width=2)
+
+    top = TABLE_TOP - ROW_HEIGHT - 12
+    draw.rectangle((MARGIN, top, PAGE_SIZE[0] - MARGIN, TABLE_TOP - 8), fill='#f3f4f6')
+    for header, x, anchor in _COLUMNS:
+        draw.text((MARGIN + x, top + 8), header, font=_font(22), fill='#111827', anchor=anchor)
+
+    footer_y = PAGE_SIZE[1] - MARGIN
+    draw.line((MARGIN, footer_y - 40, PAGE_SIZE[0] - MARGIN, footer_y - 40), fill='#d1d5db', width=1)
+    draw.text((MARGIN, footer_y - 28), 'Thank you for your order.', font=_font(18), fill='#6b7280')
+    return page
+
+
+def _clip(text: str, limit: int) -> str:
+    text = str(text or '')
+    return _shape(text if len(text) <= limit else text[: limit - 1] + '…')
+
+
+def _shape(text: str) -> str:
+    """Join and visually order right-to-left runs (no-op without the optional packages)."""
+    if arabic_reshaper is None or text.isascii():
+        return text
+    return get_display(arabic_reshaper.reshape(text))
+
+
+def _money(value) -> str:
+    return f"{Decimal(value or 0):.2f}"
+
+
+def invoice_documents(invoice_ids) -> list[dict]:
+    """Render inputs for ``invoice_ids``: 3 queries for any batch size."""
+    from orders.models import ArchivedOrderLine, OrderLine
+
+    invoices = list(Invoice.objects.filter(id__in=list(invoice_ids)).select_related('order__user').order_by('id'))
+    order_ids = [inv.order_id for inv in invoices]
+    fields = ('order_id', 'product_name', 'sku', 'qty', 'price')
+    lines: dict[int, list[dict]] = {oid: [] for oid in order_ids}
+    for model in (OrderLine, ArchivedOrderLine):
+        for row in model.objects.filter(order_id__in=order_ids).order_by('id').values(*fields):
+            lines[row['order_id']].append(row)
+
+    return [
+        {
+            'invoice': inv,
+            'invoice_number': inv.invoice_number,
+            'issued_at': inv.issued_at,
+            'order_id': inv.order_id,
+            'customer': inv.order.user.get_full_name() or inv.order.user.username,
+            'address': inv.order.shipping_address_snapshot or {},
+            'total': inv.order.order_total,
+            'lines': lines[inv.order_id],
+        }
+        for inv in invoices
+    ]
+
+
+def render_invoice_pdf(doc: dict) -> bytes:
+    """Draw one invoice document (see ``invoice_documents``) and return PDF bytes."""
+    lines = doc['lines']
+    chunks = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    body, small = _font(22), _font(20)
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        page = _page_template().copy()
+        draw = ImageDraw.Draw(page)
+
+        issued = timezone.localtime(doc['issued_at']) if doc['issued_at'] else None
+        meta = [
+            f"Invoice: {doc['invoice_number']}",
+            f"Order: #{doc['order_id']}",
+            f"Date: {issued:%Y-%m-%d}" if issued else '',
+        ]
+        for i, text in enumerate(meta):
+            draw.text((PAGE_SIZE[0] - MARGIN, MARGIN + 100 + i * 34), text, font=body, fill='#111827', anchor='ra')
+
+        address = doc['address']
+        bill_to = [
+            'Bill to:',
+            doc['customer'],
+            ' '.join(str(address.get(k) or '') for k in ('unit_number', 'street_number', 'address_line1')).strip(),
+            ', '.join(str(address.get(k)) for k in ('city', 'region', 'postal_code', 'country_name') if address.get(k)),
+        ]
+        for i, text in enumerate(bill_to):
+            draw.text((MARGIN, MARGIN + 100 + i * 34), _clip(text, 60), font=body if i else _font(24), fill='#111827')
+
+        for row_no, line in enumerate(chunk):
+            y = TABLE_TOP + row_no * ROW_HEIGHT
+            qty = int(line['qty'] or 0)
+            cells = (
+                _clip(line['product_name'], 40),
+                _clip(line['sku'], 20),
+                str(qty),
+                _money(line['price']),
+                _money(Decimal(line['price'] or 0) * qty),
+            )
+            for (_, x, anchor), text in zip(_COLUMNS, cells):
+                draw.text((MARGIN + x, y), text, font=small, fill='#111827', anchor=anchor)
+
+        if number == len(chunks):
+            y = TABLE_TOP + len(chunk) * ROW_HEIGHT + 20
+            draw.line((PAGE_SIZE[0] // 2, y, PAGE_SIZE[0] - MARGIN, y), fill='#d1d5db', width=2)
+            draw.text((PAGE_SIZE[0] - MARGIN, y + 16), f"Total: {_money(doc['total'])}", font=_font(28), fill='#111827', anchor='ra')
+        if len(chunks) > 1:
+            draw.text((PAGE_SIZE[0] - MARGIN, PAGE_SIZE[1] - MARGIN - 28), f"Page {number}/{len(chunks)}", font=_font(18), fill='#6b7280', anchor='ra')
+        pages.append(page)
+
+    out = io.BytesIO()
+    pages[0].save(out, 'PDF', resolution=DPI, save_all=True, append_images=pages[1:])
+    return out.getvalue()
+
+
+def store_invoice_pdfs(docs) -> int:
+    """Render ``docs`` and save each file to ``Invoice.pdf_file``; return the count."""
+    saved = []
+    for doc in docs:
+        invoice = doc['invoice']
+        old_name = invoice.pdf_file.name if invoice.pdf_file else None
+        invoice.pdf_file.save(f"{invoice.invoice_number}.pdf", ContentFile(render_invoice_pdf(doc)), save=False)
+        if old_name and old_name != invoice.pdf_file.name:
+            invoice.pdf_file.storage.delete(old_name)
+        saved.append(invoice)
+    Invoice.objects.bulk_update(saved, ['pdf_file'])
+    return len(saved)
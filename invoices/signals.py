@@ -1,30 +1,64 @@
 """Signals for invoice generation and updates."""
 
-import uuid
+from functools import partial
+
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Invoice
+from django.utils import timezone
+from .models import Invoice, InvoiceSequence
+from .tasks import build_invoice_pdf
 from finance.models import Transaction
+from finance.statuses import SUCCESS, payment_statuses
+from orders import outbox
+from orders.models import ShopOrder
 
 @receiver(post_save, sender=Transaction)
 def create_invoice_on_payment_success(sender, instance, **kwargs):
-    """Create an invoice when a transaction is marked successful.
+    """Queue an invoice when a transaction is marked successful.
 
-    Uses a simple uniqueness guard (order has no existing invoice).
+    Only runs when ``payment_status_id`` changed (see TrackedFieldsModel);
+    the invoice is created from the outbox (``create_order_invoices``).
     """
 
-    # 1. الوصول لكلمة الحالة من خلال الجدول المرتبط (payment_status)
-    # بنستخدم .status لأن ده اسم الحقل جوه موديل PaymentStatus
-    if instance.payment_status.status == 'Success':
-        order = instance.order
-        
-        # 2. التأكد إن مفيش فاتورة اتعملت للأوردر ده قبل كدة
-        if not hasattr(order, 'invoice'):
-            # توليد رقم فاتورة مميز
-            new_invoice_no = f"INV-{order.id}-{uuid.uuid4().hex[:4].upper()}"
-            
-            Invoice.objects.create(
-                order=order,
-                invoice_number=new_invoice_no
-            )
-            print(f"✅ تم إنشاء الفاتورة {new_invoice_no} بنجاح!")
\ No newline at end of file
+    if not instance.has_changed('payment_status_id'):
+        return
+
+    # 1. حالة الدفع من الـ registry (بدون query)
+    if payment_statuses.key_for_id(instance.payment_status_id) == SUCCESS:
+        outbox.enqueue(outbox.INVOICE_CREATE, {'order_id': instance.order_id})
+
+
+@outbox.handler(outbox.INVOICE_CREATE, batch=True)
+def create_order_invoices(payloads: list) -> None:
+    """Create the missing invoices of a drained batch (safe to replay).
+
+    The batch's orders are locked first (in id order) and those that already
+    have an invoice (replay, concurrent worker) or no longer exist are
+    skipped; only then is one block of ``InvoiceSequence`` numbers reserved
+    for exactly the claimed orders, so no number is handed out and then lost
+    to a conflicting insert.
+    """
+
+    order_ids = sorted(set(p['order_id'] for p in payloads))
+    # أوردر اتمسح بعد الدفع: مفيش فاتورة (وإلا الـ FK يفشل وقت الـ commit)
+    # القفل على الأوردرات الأول: worker تاني لنفس الأوردر يستنى لحد الـ commit
+    live = list(ShopOrder.objects.select_for_update().filter(id__in=order_ids).order_by('id').values_list('id', flat=True))
+    # 2. التأكد إن مفيش فاتورة اتعملت للأوردرات دي قبل كدة (query واحدة للـ batch)
+    existing = set(Invoice.objects.filter(order_id__in=live).values_list('order_id', flat=True))
+    order_ids = [oid for oid in live if oid not in existing]
+    if not order_ids:
+        return
+
+    # أرقام متسلسلة لكل سنة: INV-2026-000001
+    year = timezone.localdate().year
+    numbers = InvoiceSequence.allocate(year, len(order_ids))
+    invoices = Invoice.objects.bulk_create([
+        Invoice(order_id=oid, invoice_number=f"INV-{year}-{seq:06d}")
+        for oid, seq in zip(order_ids, numbers)
+    ])
+
+    for invoice in invoices:
+        print(f"✅ تم إنشاء الفاتورة {invoice.invoice_number} بنجاح!")
+        # الـ PDF بيترسم في الـ worker بعد الـ commit (regenerate_invoice_pdfs يعيد الناقص)
+        transaction.on_commit(partial(build_invoice_pdf.delay, invoice.id), robust=True)
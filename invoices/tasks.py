@@ -0,0 +1,13 @@
+"""Celery tasks for invoices."""
+
+from __future__ import annotations
+
+from celery import shared_task
+
+from .pdf import invoice_documents, store_invoice_pdfs
+
+
+@shared_task(ignore_result=True)
+def build_invoice_pdf(invoice_id: int) -> None:
+    """Render an invoice's PDF into ``Invoice.pdf_file`` (queued after the invoice commits)."""
+    store_invoice_pdfs(invoice_documents([invoice_id]))
@@ -1,5 +1,98 @@
 """Invoices app tests."""
 
-from django.test import TestCase
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from invoices.models import Invoice, InvoiceSequence
+from invoices.pdf import invoice_documents, render_invoice_pdf
+from invoices.signals import create_order_invoices
+from invoices.tasks import build_invoice_pdf
+from orders.models import OrderStatus, ShopOrder
+from orders.outbox import drain_outbox
+from orders.tests import CheckoutFixtureMixin
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'])
+class InvoiceTests(CheckoutFixtureMixin, TestCase):
+	"""Invoices created from the outbox once a payment succeeds."""
+
+	def test_invoice_pdfs_render_in_background_and_in_batches(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_ids = [self._place_order(client) for _ in range(2)]
+		delivered = OrderStatus.objects.create(status='Delivered')
+		with self.captureOnCommitCallbacks() as callbacks:
+			for order in ShopOrder.objects.filter(id__in=order_ids):
+				order.order_status = delivered
+				order.save(update_fields=['order_status'])
+			drain_outbox()
+		invoices = list(Invoice.objects.filter(order_id__in=order_ids).order_by('id'))
+		self.assertEqual(len(invoices), 2)
+		# Rendering is queued for after the commit, not done in the handler.
+		self.assertFalse(any(inv.pdf_file for inv in invoices))
+		self.assertEqual(len([cb for cb in callbacks if getattr(cb, 'func', None) == build_invoice_pdf.delay]), 2)
+
+		with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+			build_invoice_pdf(invoices[0].id)
+			invoices[0].refresh_from_db()
+			with invoices[0].pdf_file.open('rb') as fh:
+				self.assertTrue(fh.read().startswith(b'%PDF'))
+
+			out = StringIO()
+			call_command('regenerate_invoice_pdfs', '--missing-only', '--workers', '1', stdout=out)
+			self.assertIn('Rendered 1 invoice PDFs', out.getvalue())
+			self.assertTrue(Invoice.objects.get(id=invoices[1].id).pdf_file)
+
+			# Downloads go through the API: the order's customer and staff only.
+			url = reverse('invoice_pdf', args=[invoices[0].id])
+			response = client.get(url)
+			self.assertEqual(response.status_code, 200)
+			self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+			response.close()
+			other = APIClient()
+			other.force_authenticate(user=self.seller)
+			self.assertEqual(other.get(url).status_code, 404)
+			self.seller.is_staff = True
+			self.seller.save(update_fields=['is_staff'])
+			response = other.get(url)
+			self.assertEqual(response.status_code, 200)
+			response.close()
+			self.assertEqual(APIClient().get(url).status_code, 403)
+
+		# Long orders continue on further pages.
+		with self.assertNumQueries(3):
+			doc = invoice_documents([invoices[0].id])[0]
+		doc['lines'] = doc['lines'] * 30
+		self.assertIn(b'/Count 2', render_invoice_pdf(doc))
+
+	def test_invoice_numbers_come_from_yearly_sequence(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_ids = [self._place_order(client) for _ in range(3)]
+		delivered = OrderStatus.objects.create(status='Delivered')
+		for order in ShopOrder.objects.filter(id__in=order_ids[:2]):
+			order.order_status = delivered
+			order.save(update_fields=['order_status'])
+		drain_outbox()
+
+		year = timezone.localdate().year
+		numbers = list(Invoice.objects.filter(order_id__in=order_ids).order_by('invoice_number').values_list('invoice_number', flat=True))
+		self.assertEqual(numbers, [f'INV-{year}-000001', f'INV-{year}-000002'])
+
+		# Replays skip invoiced orders; only the new order takes a number.
+		with self.captureOnCommitCallbacks() as callbacks:
+			create_order_invoices([{'order_id': oid} for oid in order_ids])
+		self.assertEqual(len(callbacks), 1)
+		self.assertEqual(Invoice.objects.get(order_id=order_ids[2]).invoice_number, f'INV-{year}-000003')
+		self.assertEqual(Invoice.objects.filter(order_id__in=order_ids).count(), 3)
+
+		# Blocks are disjoint: one UPDATE reserves the whole range.
+		with self.assertNumQueries(1):
+			self.assertEqual(InvoiceSequence.allocate(year, 5), range(4, 9))
+		self.assertEqual(InvoiceSequence.allocate(year + 1, 2), range(1, 3))
@@ -1,5 +1,32 @@
-"""Invoice HTML/API views (currently minimal)."""
+"""Invoice download endpoint.
 
-from django.shortcuts import render
+Invoice PDFs live under ``MEDIA_ROOT/invoices_pdfs/`` but are not served by
+nginx (the numbers are sequential, so the files would be enumerable); they
+are downloaded here by staff or the customer who owns the order.
+"""
 
-# Create your views here.
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import Invoice
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def invoice_pdf_download(request, invoice_id: int):
+    """Return the rendered PDF of an invoice (staff, or the order's customer)."""
+    invoices = Invoice.objects.all()
+    if not request.user.is_staff:
+        invoices = invoices.filter(order__user=request.user)
+    invoice = get_object_or_404(invoices, id=invoice_id)
+    if not invoice.pdf_file:
+        return Response({'detail': 'Invoice PDF is not ready yet.'}, status=404)
+    return FileResponse(
+        invoice.pdf_file.open('rb'),
+        as_attachment=False,
+        filename=f"{invoice.invoice_number}.pdf",
+        content_type='application/pdf',
+    )
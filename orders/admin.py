@@ -1,7 +1,7 @@
 """Django admin configuration for orders and related models."""
 
 from django.contrib import admin
-from .models import ShopOrder, OrderLine, OrderStatus
+from .models import ArchivedOrderLine, OrderEvent, OrderExport, OutboxMessage, ShopOrder, OrderLine, OrderStatus
 from finance.models import Transaction
 
 # 1. عرض منتجات الطلب في جدول منظم
@@ -11,9 +11,29 @@ class OrderLineInline(admin.TabularInline):
     model = OrderLine
     extra = 0
     # جعل الحقول للقراءة فقط لضمان عدم التلاعب في أسعار الطلبات القديمة
-    readonly_fields = ('product_item', 'price', 'qty')
+    readonly_fields = ('product_item', 'product_name', 'sku', 'store_name', 'price', 'qty')
     can_delete = False 
 
+class ArchivedOrderLineInline(admin.TabularInline):
+    """Read-only lines of an archived order."""
+
+    model = ArchivedOrderLine
+    extra = 0
+    max_num = 0
+    can_delete = False
+    fields = ('product_name', 'sku', 'store_name', 'price', 'qty', 'line_status')
+    readonly_fields = fields
+
+class OrderEventInline(admin.TabularInline):
+    """Read-only order timeline (append-only)."""
+
+    model = OrderEvent
+    extra = 0
+    max_num = 0
+    can_delete = False
+    fields = ('created_at', 'event_type', 'status', 'line_id', 'seller', 'actor', 'data')
+    readonly_fields = fields
+
 # 2. عرض بيانات الدفع بشكل ديناميكي (أكثر جزء احترافي في كودك)
 class TransactionInline(admin.StackedInline):
     """Inline display of the order's related transaction."""
@@ -39,16 +59,44 @@ class TransactionInline(admin.StackedInline):
 class OrderStatusAdmin(admin.ModelAdmin):
     """Admin configuration for order statuses."""
 
-    list_display = ('id', 'status')
+    list_display = ('id', 'status', 'key')
 
 # 4. تسجيل الطلب الرئيسي وربط كل ما سبق
 @admin.register(ShopOrder)
 class ShopOrderAdmin(admin.ModelAdmin):
     """Admin configuration for customer orders."""
 
-    list_display = ('id', 'user', 'order_total', 'order_status', 'order_date')
+    list_display = ('id', 'user', 'order_total', 'order_status', 'order_date', 'archived_at')
     list_filter = ('order_status', 'order_date')
     search_fields = ('id', 'user__username')
     
     # دمج المنتجات والدفع تحت بعض في صفحة واحدة
-    inlines = [OrderLineInline, TransactionInline]
\ No newline at end of file
+    inlines = [OrderLineInline, ArchivedOrderLineInline, TransactionInline, OrderEventInline]
+
+
+@admin.register(OrderExport)
+class OrderExportAdmin(admin.ModelAdmin):
+    """Admin configuration for background order exports."""
+
+    list_display = ('id', 'requested_by', 'seller', 'file_format', 'status', 'row_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'file_format')
+    readonly_fields = ('file', 'row_count', 'error', 'created_at', 'finished_at')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """Admin view of queued order side effects (see ``orders.outbox``)."""
+
+    list_display = ('id', 'topic', 'status', 'attempts', 'available_at', 'created_at', 'processed_at')
+    list_filter = ('status', 'topic')
+    readonly_fields = ('topic', 'payload', 'attempts', 'last_error', 'created_at', 'processed_at')
+    actions = ['retry_messages']
+
+    @admin.action(description='Retry selected messages now')
+    def retry_messages(self, request, queryset):
+        from django.utils import timezone
+
+        updated = queryset.exclude(status=OutboxMessage.DONE).update(
+            status=OutboxMessage.PENDING, attempts=0, available_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} message(s) queued again.')
@@ -0,0 +1,269 @@
+"""Bulk order / line status updates for sellers.
+
+``POST /api/orders/bulk-status/`` accepts many items, each targeting either a
+whole order (``order_id``) or a single line (``line_id``)::
+
+    {"items": [
+        {"order_id": 12, "status": 3, "shipping_carrier": "Aramex", "tracking_number": "X1"},
+        {"line_id": 40, "status": 5}
+    ]}
+
+Items follow the same rules as ``set-status`` / ``set-line-status``
+(ownership, multi-vendor safety, lifecycle transitions, restocking), but the
+whole batch is validated and applied in memory over a fixed number of queries:
+touched orders and all their lines are locked once, restocking is one ledger
+INSERT plus one set-based UPDATE (``products.inventory``), orders/lines are written with ``bulk_update`` and the
+resulting order events with one ``bulk_create``. Items are
+applied in request order, so later items see earlier ones. A failing item does
+not stop the others; each one gets a result entry.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from products.inventory import movement, record_movements
+from products.models import InventoryMovement
+
+from .events import line_status_event, order_change_events, order_snapshot, record_events
+from .models import OrderLine, OrderSeller, ShopOrder
+from .statuses import (
+    CANCELLED, DELIVERED, PENDING, RETURNED, SHIPPED,
+    aggregate_status_key, order_statuses, restores_stock, transition_allowed,
+)
+
+
+MAX_BULK_ITEMS = 500
+
+_ORDER_FIELDS = ['order_status', 'line_status_counts', 'shipping_carrier', 'tracking_number', 'shipped_at', 'delivered_at']
+_LINE_FIELDS = ['line_status', 'line_shipped_at', 'line_delivered_at']
+
+
+class BulkStatusError(ValueError):
+    """The request body itself is invalid (not a single item)."""
+
+
+def _as_id(raw) -> int | None:
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _clean_text(raw) -> str | None:
+    return str(raw).strip() or None
+
+
+def parse_items(data) -> list[dict]:
+    """Normalize the request payload into item dicts (or raise BulkStatusError).
+
+    Per-item problems are kept on the item (``error``) so they can be reported
+    next to the other results.
+    """
+
+    raw_items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(raw_items, list) or not raw_items:
+        raise BulkStatusError('Expected a non-empty "items" list.')
+    if len(raw_items) > MAX_BULK_ITEMS:
+        raise BulkStatusError(f'Too many items (max {MAX_BULK_ITEMS}).')
+
+    items = []
+    for index, raw in enumerate(raw_items):
+        item = {'index': index}
+        items.append(item)
+        if not isinstance(raw, dict):
+            item['error'] = 'Invalid item.'
+            continue
+
+        order_id, line_id = raw.get('order_id'), raw.get('line_id')
+        if (order_id is None) == (line_id is None):
+            item['error'] = 'Provide exactly one of order_id or line_id.'
+            continue
+        target = 'order_id' if order_id is not None else 'line_id'
+        item[target] = _as_id(order_id if order_id is not None else line_id)
+        if item[target] is None:
+            item['error'] = f'Invalid {target}.'
+            continue
+
+        status = order_statuses.by_id(_as_id(raw.get('status')))
+        if status is None:
+            item['error'] = 'Invalid status.'
+            continue
+        item['status'] = status
+
+        for field in ('shipping_carrier', 'tracking_number'):
+            if raw.get(field) is not None:
+                item[field] = _clean_text(raw[field])
+    return items
+
+
+def _restock_movement(line, now):
+    return movement(line.product_item_id, max(0, int(line.qty or 0)), InventoryMovement.RESTOCK, line.order_id, line.id, now)
+
+
+def _line_counts(lines) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for ln in lines:
+        key = order_statuses.key_for_id(ln.line_status_id) or PENDING
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _stamp(obj, next_key, now, shipped_field, delivered_field) -> None:
+    if next_key == SHIPPED and not getattr(obj, shipped_field):
+        setattr(obj, shipped_field, now)
+    if next_key == DELIVERED and not getattr(obj, delivered_field):
+        setattr(obj, delivered_field, now)
+
+
+def _enqueue_payment_syncs(orders, before) -> None:
+    """Queue the payment sync for orders whose status changed (one INSERT).
+
+    ``bulk_update`` skips ``post_save``, so this replaces the order receiver.
+    """
+    from .outbox import PAYMENT_SYNC, enqueue_many
+
+    enqueue_many(
+        (PAYMENT_SYNC, {'order_id': o.id}) for o in orders if o.order_status_id != before[o.id][0]
+    )
+
+
+def apply_bulk_status(seller, items: list[dict]) -> list[dict]:
+    """Validate and apply parsed ``items`` for ``seller``; return per-item results."""
+
+    results: dict[int, dict] = {}
+    for item in items:
+        if 'error' in item:
+            results[item['index']] = {'index': item['index'], 'ok': False, 'detail': item['error']}
+    todo = [item for item in items if 'error' not in item]
+    if not todo:
+        return [results[i] for i in sorted(results)]
+
+    now = timezone.now()
+    with transaction.atomic():
+        line_ids = {item['line_id'] for item in todo if 'line_id' in item}
+        order_by_line = dict(OrderLine.objects.filter(id__in=line_ids).values_list('id', 'order_id')) if line_ids else {}
+        order_ids = {item['order_id'] for item in todo if 'order_id' in item} | set(order_by_line.values())
+
+        # Orders first, then their lines: the lock order of the single-item endpoints.
+        orders = {o.id: o for o in ShopOrder.objects.select_for_update().filter(id__in=order_ids).order_by('id')}
+        before = {order_id: order_snapshot(o) for order_id, o in orders.items()}
+        lines_by_order: dict[int, list[OrderLine]] = defaultdict(list)
+        lines_by_id: dict[int, OrderLine] = {}
+        for ln in OrderLine.objects.select_for_update().filter(order_id__in=list(orders)).order_by('id'):
+            lines_by_order[ln.order_id].append(ln)
+            lines_by_id[ln.id] = ln
+        sellers_by_order: dict[int, set[int]] = defaultdict(set)
+        for order_id, seller_id in OrderSeller.objects.filter(order_id__in=list(orders)).values_list('order_id', 'seller_id'):
+            sellers_by_order[order_id].add(seller_id)
+
+        restock = []
+        events = []
+        dirty_orders: set[int] = set()
+        derive_status: dict[int, bool] = {}
+        dirty_lines: set[int] = set()
+
+        def fail(item, detail):
+            results[item['index']] = {'index': item['index'], 'ok': False, 'detail': detail}
+
+        for item in todo:
+            new_status = item['status']
+            next_key = new_status.key or None
+
+            if 'order_id' in item:
+                order = orders.get(item['order_id'])
+                sellers = sellers_by_order.get(item['order_id'], set())
+                if order is None or seller.id not in sellers:
+                    fail(item, 'Order not found.')
+                    continue
+                if len(sellers) > 1:
+                    fail(item, 'Multi-vendor order: you cannot update the overall status.')
+                    continue
+                prev_key = order_statuses.key_for_id(order.order_status_id)
+                if not transition_allowed(prev_key, next_key):
+                    fail(item, 'Invalid status transition.')
+                    continue
+
+                lines = lines_by_order.get(order.id, [])
+                if restores_stock(prev_key, next_key, shipped=bool(order.shipped_at or order.delivered_at)):
+                    for ln in lines:
+                        # Lines cancelled/returned on their own were already restocked.
+                        if order_statuses.key_for_id(ln.line_status_id) not in {CANCELLED, RETURNED}:
+                            restock.append(_restock_movement(ln, now))
+                for ln in lines:
+                    ln.line_status_id = new_status.id
+                    _stamp(ln, next_key, now, 'line_shipped_at', 'line_delivered_at')
+                    dirty_lines.add(ln.id)
+
+                order.order_status_id = new_status.id
+                if 'shipping_carrier' in item:
+                    order.shipping_carrier = item['shipping_carrier']
+                if 'tracking_number' in item:
+                    order.tracking_number = item['tracking_number']
+                _stamp(order, next_key, now, 'shipped_at', 'delivered_at')
+                derive_status[order.id] = False
+                dirty_orders.add(order.id)
+                results[item['index']] = {
+                    'index': item['index'], 'ok': True, 'order_id': order.id,
+                    'status_id': new_status.id, 'status_key': next_key,
+                }
+                continue
+
+            line = lines_by_id.get(item['line_id'])
+            if line is None or line.seller_id != seller.id:
+                fail(item, 'Line not found.')
+                continue
+            order = orders[line.order_id]
+            if ('shipping_carrier' in item or 'tracking_number' in item) and len(sellers_by_order[order.id]) > 1:
+                fail(item, 'Multi-vendor order: shipping details can only be set on single-vendor orders.')
+                continue
+            current_key = order_statuses.key_for_id(line.line_status_id or order.order_status_id)
+            if not transition_allowed(current_key, next_key):
+                fail(item, 'Invalid status transition.')
+                continue
+
+            if restores_stock(current_key or PENDING, next_key, shipped=bool(line.line_shipped_at or line.line_delivered_at)):
+                restock.append(_restock_movement(line, now))
+            line_changed = line.line_status_id != new_status.id
+            line.line_status_id = new_status.id
+            _stamp(line, next_key, now, 'line_shipped_at', 'line_delivered_at')
+            dirty_lines.add(line.id)
+            if line_changed:
+                events.append(line_status_event(line, seller.id, seller, now))
+
+            if 'shipping_carrier' in item:
+                order.shipping_carrier = item['shipping_carrier']
+            if 'tracking_number' in item:
+                order.tracking_number = item['tracking_number']
+            derive_status[order.id] = True
+            dirty_orders.add(order.id)
+            results[item['index']] = {
+                'index': item['index'], 'ok': True, 'order_id': order.id, 'line_id': line.id,
+                'status_id': new_status.id, 'status_key': next_key,
+            }
+
+        # Counters are rebuilt from the locked, in-memory lines; orders touched by
+        # line items re-derive their status like set-line-status does.
+        changed = [orders[oid] for oid in sorted(dirty_orders)]
+        for order in changed:
+            order.line_status_counts = _line_counts(lines_by_order.get(order.id, []))
+            if derive_status.get(order.id):
+                agg = aggregate_status_key(order.line_status_counts)
+                if agg is not None:
+                    order.order_status_id = order_statuses.get(agg).id
+
+        record_movements(restock)
+        if dirty_lines:
+            OrderLine.objects.bulk_update([lines_by_id[i] for i in sorted(dirty_lines)], _LINE_FIELDS)
+        if changed:
+            ShopOrder.objects.bulk_update(changed, _ORDER_FIELDS)
+            _enqueue_payment_syncs(changed, before)
+            for order in changed:
+                events.extend(order_change_events(order, before[order.id], seller, now))
+        record_events(events)
+
+    return [results[i] for i in sorted(results)]
@@ -0,0 +1,131 @@
+"""Order event log (``OrderEvent``): writers and the incremental reader.
+
+Every status mutation path (checkout, ``set-status``, ``set-line-status``,
+``bulk-status``) builds unsaved events with the helpers below and writes them
+with one ``bulk_create`` inside its transaction; once it commits, the events
+are pushed to live SSE listeners (``orders.realtime``). Readers page through
+an order's events by id (``after``), which the ``(order, id)`` index serves
+directly.
+"""
+
+from __future__ import annotations
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OrderEvent
+from .realtime import publish_order_events
+from .statuses import order_statuses
+
+
+MAX_EVENTS_PAGE = 500
+
+
+def _actor_id(actor):
+    return getattr(actor, 'id', None) if getattr(actor, 'is_authenticated', False) else None
+
+
+def placed_event(order, actor=None, now=None) -> OrderEvent:
+    return OrderEvent(
+        order_id=order.id, event_type=OrderEvent.PLACED, status_id=order.order_status_id,
+        actor_id=_actor_id(actor), created_at=now or timezone.now(),
+    )
+
+
+def order_status_event(order, actor=None, now=None) -> OrderEvent:
+    return OrderEvent(
+        order_id=order.id, event_type=OrderEvent.ORDER_STATUS, status_id=order.order_status_id,
+        actor_id=_actor_id(actor), created_at=now or timezone.now(),
+    )
+
+
+def line_status_event(line, seller_id, actor=None, now=None) -> OrderEvent:
+    return OrderEvent(
+        order_id=line.order_id, line_id=line.id, seller_id=seller_id, event_type=OrderEvent.LINE_STATUS,
+        status_id=line.line_status_id, actor_id=_actor_id(actor), created_at=now or timezone.now(),
+    )
+
+
+def tracking_event(order, actor=None, now=None) -> OrderEvent:
+    return OrderEvent(
+        order_id=order.id, event_type=OrderEvent.TRACKING, actor_id=_actor_id(actor),
+        data={'shipping_carrier': order.shipping_carrier, 'tracking_number': order.tracking_number},
+        created_at=now or timezone.now(),
+    )
+
+
+def order_change_events(order, before: tuple, actor=None, now=None) -> list[OrderEvent]:
+    """Events for an order whose ``(order_status_id, carrier, tracking)`` was ``before``."""
+
+    status_id, carrier, tracking = before
+    events = []
+    if order.order_status_id != status_id:
+        events.append(order_status_event(order, actor, now))
+    if (order.shipping_carrier, order.tracking_number) != (carrier, tracking):
+        events.append(tracking_event(order, actor, now))
+    return events
+
+
+def order_snapshot(order) -> tuple:
+    """State compared by ``order_change_events``."""
+    return order.order_status_id, order.shipping_carrier, order.tracking_number
+
+
+def record_events(events) -> list[OrderEvent]:
+    """Write events with a single INSERT (no-op when empty) and publish them on commit."""
+    events = [e for e in events if e is not None]
+    if not events:
+        return []
+    created = OrderEvent.objects.bulk_create(events)
+    transaction.on_commit(partial(publish_order_events, created))
+    return created
+
+
+def events_queryset(order_id: int, after: int = 0, seller=None):
+    """Events of one order with ``id > after``, oldest first.
+
+    Sellers see order-level events and events of their own lines only.
+    """
+
+    qs = OrderEvent.objects.filter(order_id=order_id, id__gt=max(0, int(after or 0)))
+    if seller is not None:
+        qs = qs.filter(Q(line_id__isnull=True) | Q(seller=seller))
+    return qs.order_by('id')
+
+
+def event_payload(event: OrderEvent) -> dict:
+    """Row for a saved event, shaped like ``event_rows`` plus ``order_id``."""
+    status = order_statuses.by_id(event.status_id) if event.status_id else None
+    return {
+        'id': event.id,
+        'order_id': event.order_id,
+        'type': event.event_type,
+        'line_id': event.line_id,
+        'status_id': event.status_id,
+        'status': status.status if status else None,
+        'status_key': (status.key or None) if status else None,
+        'data': event.data or {},
+        'created_at': event.created_at,
+    }
+
+
+def event_rows(qs) -> list[dict]:
+    """Flat API rows for ``events_queryset`` results."""
+    return [
+        {
+            'id': row['id'],
+            'type': row['event_type'],
+            'line_id': row['line_id'],
+            'status_id': row['status_id'],
+            'status': row['status__status'],
+            'status_key': row['status__key'] or None,
+            'data': row['data'] or {},
+            'created_at': row['created_at'],
+        }
+        for row in qs.values(
+            'id', 'event_type', 'line_id', 'status_id', 'status__status', 'status__key', 'data', 'created_at',
+        )
+    ]
@@ -0,0 +1,106 @@
+"""Move old, closed orders out of the hot order tables.
+
+An order is archived when it is older than the cutoff and its status is
+closed (delivered, completed, cancelled, returned or refunded). In batches,
+its lines and seller links are moved to ArchivedOrderLine /
+ArchivedOrderSeller (same ids and columns) and ``ShopOrder.archived_at`` is
+set. The ShopOrder row itself stays because payments and invoices reference
+it; live customer lists skip it through a partial index.
+
+Archived orders are read-only and stay readable with ``?archived=1`` on the
+order list endpoints and through ``/api/orders/<id>/``.
+
+Usage:
+  python manage.py archive_orders
+  python manage.py archive_orders --older-than-days 180 --batch-size 200
+  python manage.py archive_orders --before 2024-01-01 --dry-run
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import ArchivedOrderLine, ArchivedOrderSeller, OrderLine, OrderSeller, ShopOrder
+from orders.queries import local_date_range
+from orders.statuses import CANCELLED, COMPLETED, DELIVERED, REFUNDED, RETURNED
+
+
+ARCHIVABLE_STATUS_KEYS = (DELIVERED, COMPLETED, CANCELLED, RETURNED, REFUNDED)
+
+_LINE_FIELDS = (
+    'id', 'order_id', 'product_item_id', 'qty', 'price',
+    'line_status_id', 'line_shipped_at', 'line_delivered_at',
+    'product_name', 'sku', 'seller_id', 'seller_username', 'store_name',
+)
+_LINK_FIELDS = ('order_id', 'seller_id', 'line_count', 'seller_subtotal', 'order_date')
+
+
+def archive_order_batch(order_ids, now=None) -> tuple[int, int]:
+    """Move lines + seller links of ``order_ids`` to the archive tables.
+
+    Must run inside a transaction with the orders locked. Returns
+    ``(lines_moved, links_moved)``.
+    """
+
+    lines = [ArchivedOrderLine(**row) for row in OrderLine.objects.filter(order_id__in=order_ids).values(*_LINE_FIELDS)]
+    links = [ArchivedOrderSeller(**row) for row in OrderSeller.objects.filter(order_id__in=order_ids).values(*_LINK_FIELDS)]
+    ArchivedOrderLine.objects.bulk_create(lines)
+    ArchivedOrderSeller.objects.bulk_create(links)
+    OrderLine.objects.filter(order_id__in=order_ids).delete()
+    OrderSeller.objects.filter(order_id__in=order_ids).delete()
+    ShopOrder.objects.filter(id__in=order_ids).update(archived_at=now or timezone.now())
+    return len(lines), len(links)
+
+
+class Command(BaseCommand):
+    help = 'Archive closed orders older than a cutoff (moves lines and seller links to archive tables).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=365, help='Archive orders older than N days (default: 365).')
+        parser.add_argument('--before', help='Archive orders placed before this local date (YYYY-MM-DD); overrides --older-than-days.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders per transaction (default: 500).')
+        parser.add_argument('--dry-run', action='store_true', help='Only count eligible orders; do not move anything.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff, _ = local_date_range(dt.date.fromisoformat(options['before']), None)
+            except ValueError as exc:
+                raise CommandError(f'Invalid --before date: {exc}')
+        else:
+            cutoff = timezone.now() - dt.timedelta(days=max(0, int(options['older_than_days'])))
+        batch_size = max(1, int(options['batch_size']))
+
+        eligible = ShopOrder.objects.filter(
+            archived_at__isnull=True,
+            order_date__lt=cutoff,
+            order_status__key__in=ARCHIVABLE_STATUS_KEYS,
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{eligible.count()} orders before {cutoff:%Y-%m-%d %H:%M} would be archived.'))
+            return
+
+        orders = lines = links = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    eligible.filter(id__gt=last_id)
+                    .select_for_update()
+                    .order_by('id')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                moved_lines, moved_links = archive_order_batch(ids)
+            last_id = ids[-1]
+            orders += len(ids)
+            lines += moved_lines
+            links += moved_links
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {orders} orders ({lines} lines, {links} seller links).'))
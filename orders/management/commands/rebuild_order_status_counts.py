@@ -0,0 +1,75 @@
+"""Check and rebuild ShopOrder.line_status_counts from order lines.
+
+The per-status line histogram is maintained incrementally by the order
+status endpoints. This command recounts lines (one grouped query per batch)
+and rewrites counters that drifted, e.g. for orders created before the
+column existed or edited directly in the database.
+
+Usage:
+  python manage.py rebuild_order_status_counts
+  python manage.py rebuild_order_status_counts --check
+  python manage.py rebuild_order_status_counts --batch-size 2000 --fix-status
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import ShopOrder
+from orders.statuses import aggregate_status_key, count_line_statuses, order_statuses
+
+
+class Command(BaseCommand):
+    help = 'Check (and by default rebuild) per-order line status counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders per batch (default: 1000).')
+        parser.add_argument('--check', action='store_true', help='Only report drifted orders; do not write.')
+        parser.add_argument(
+            '--fix-status',
+            action='store_true',
+            help='Also re-derive order_status from the rebuilt counters.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, int(options['batch_size']))
+        check_only = bool(options['check'])
+        fix_status = bool(options['fix_status'])
+
+        scanned = 0
+        drifted = 0
+        last_id = 0
+        while True:
+            batch = list(
+                # Archived orders keep their counters; their lines left OrderLine.
+                ShopOrder.objects.filter(id__gt=last_id, archived_at__isnull=True)
+                .order_by('id')
+                .values_list('id', 'line_status_counts', 'order_status_id')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            scanned += len(batch)
+
+            actual = count_line_statuses([row[0] for row in batch])
+            to_update = []
+            for order_id, stored, status_id in batch:
+                counts = actual[order_id]
+                new_status_id = status_id
+                if fix_status:
+                    agg = aggregate_status_key(counts)
+                    if agg is not None:
+                        new_status_id = order_statuses.get(agg).id
+                if (stored or {}) != counts or new_status_id != status_id:
+                    to_update.append(ShopOrder(id=order_id, line_status_counts=counts, order_status_id=new_status_id))
+
+            drifted += len(to_update)
+            if to_update and not check_only:
+                # bulk_update bypasses post_save: payment sync is not re-run here.
+                with transaction.atomic():
+                    ShopOrder.objects.bulk_update(to_update, ['line_status_counts', 'order_status'])
+
+        verb = 'would be rebuilt' if check_only else 'rebuilt'
+        style = self.style.WARNING if (check_only and drifted) else self.style.SUCCESS
+        self.stdout.write(style(f'Scanned {scanned} orders; {drifted} {verb}.'))
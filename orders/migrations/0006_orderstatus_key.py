@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+def backfill_keys(apps, schema_editor):
+    from orders.statuses import normalize_order_status_key
+
+    OrderStatus = apps.get_model('orders', 'OrderStatus')
+    rows = list(OrderStatus.objects.filter(key=''))
+    for row in rows:
+        row.key = normalize_order_status_key(row.status) or ''
+    OrderStatus.objects.bulk_update(rows, ['key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_orderline_line_delivered_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderstatus',
+            name='key',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('returned', 'Returned'), ('refunded', 'Refunded')], db_index=True, default='', max_length=20),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
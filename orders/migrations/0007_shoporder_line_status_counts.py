@@ -0,0 +1,18 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_orderstatus_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoporder',
+            name='line_status_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_order_sellers(apps, schema_editor):
+    from decimal import Decimal
+
+    from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+    ShopOrder = apps.get_model('orders', 'ShopOrder')
+    OrderLine = apps.get_model('orders', 'OrderLine')
+    OrderSeller = apps.get_model('orders', 'OrderSeller')
+
+    last_id = 0
+    while True:
+        batch = list(
+            ShopOrder.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'order_date')[:1000]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        dates = dict(batch)
+        rows = (
+            OrderLine.objects.filter(order_id__in=list(dates))
+            .values('order_id', 'product_item__product__seller_id')
+            .annotate(
+                n=Count('id'),
+                subtotal=Sum(ExpressionWrapper(F('price') * F('qty'), output_field=DecimalField(max_digits=12, decimal_places=2))),
+            )
+            .order_by()
+        )
+        OrderSeller.objects.bulk_create([
+            OrderSeller(
+                order_id=r['order_id'],
+                seller_id=r['product_item__product__seller_id'],
+                line_count=r['n'],
+                seller_subtotal=r['subtotal'] or Decimal('0.00'),
+                order_date=dates[r['order_id']],
+            )
+            for r in rows
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_shoporder_line_status_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSeller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('seller_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('order_date', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_links', to='orders.shoporder')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_links', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Order Seller',
+                'verbose_name_plural': 'Order Sellers',
+                'indexes': [models.Index(fields=['seller', 'order_date'], name='orders_orde_seller__5d1052_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'seller'), name='orders_orderseller_order_seller_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_order_sellers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_alter_phone_number_lengths'),
+        ('orders', '0009_orderexport'),
+        ('products', '0008_postgres_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrderLine',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('qty', models.IntegerField(default=1)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('line_shipped_at', models.DateTimeField(blank=True, null=True)),
+                ('line_delivered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Order Item',
+                'verbose_name_plural': 'Archived Order Items',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderSeller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_count', models.PositiveIntegerField(default=0)),
+                ('seller_subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('order_date', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Archived Order Seller',
+                'verbose_name_plural': 'Archived Order Sellers',
+            },
+        ),
+        migrations.AddField(
+            model_name='shoporder',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='shoporder',
+            index=models.Index(condition=models.Q(('archived_at__isnull', True)), fields=['user', 'order_date'], name='orders_shoporder_live_user_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='line_status',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.orderstatus'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_lines', to='orders.shoporder'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='product_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.productitem'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderseller',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_seller_links', to='orders.shoporder'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderseller',
+            name='seller',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorderseller',
+            index=models.Index(fields=['seller', 'order_date'], name='orders_arch_seller__247330_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedorderseller',
+            constraint=models.UniqueConstraint(fields=('order', 'seller'), name='orders_archivedorderseller_order_seller_uniq'),
+        ),
+    ]
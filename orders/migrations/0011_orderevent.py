@@ -0,0 +1,80 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_order_events(apps, schema_editor):
+    """Rebuild a coarse timeline from the order's milestone columns."""
+
+    ShopOrder = apps.get_model('orders', 'ShopOrder')
+    OrderStatus = apps.get_model('orders', 'OrderStatus')
+    OrderEvent = apps.get_model('orders', 'OrderEvent')
+
+    status_by_key = dict(OrderStatus.objects.exclude(key='').values_list('key', 'id'))
+    pending_id, shipped_id, delivered_id = (status_by_key.get(k) for k in ('pending', 'shipped', 'delivered'))
+
+    last_id = 0
+    while True:
+        batch = list(
+            ShopOrder.objects.filter(id__gt=last_id).order_by('id').values(
+                'id', 'user_id', 'order_date', 'order_status_id', 'shipped_at', 'delivered_at',
+                'shipping_carrier', 'tracking_number',
+            )[:1000]
+        )
+        if not batch:
+            break
+        last_id = batch[-1]['id']
+        events = []
+        for o in batch:
+            events.append(OrderEvent(
+                order_id=o['id'], event_type='placed', status_id=pending_id, actor_id=o['user_id'], created_at=o['order_date'],
+            ))
+            last_status, last_at = pending_id, o['order_date']
+            if o['shipped_at']:
+                events.append(OrderEvent(order_id=o['id'], event_type='order_status', status_id=shipped_id, created_at=o['shipped_at']))
+                last_status, last_at = shipped_id, o['shipped_at']
+            if o['shipping_carrier'] or o['tracking_number']:
+                events.append(OrderEvent(
+                    order_id=o['id'], event_type='tracking', created_at=o['shipped_at'] or o['order_date'],
+                    data={'shipping_carrier': o['shipping_carrier'], 'tracking_number': o['tracking_number']},
+                ))
+            if o['delivered_at']:
+                events.append(OrderEvent(order_id=o['id'], event_type='order_status', status_id=delivered_id, created_at=o['delivered_at']))
+                last_status, last_at = delivered_id, o['delivered_at']
+            if o['order_status_id'] != last_status:
+                events.append(OrderEvent(order_id=o['id'], event_type='order_status', status_id=o['order_status_id'], created_at=last_at))
+        OrderEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_id', models.BigIntegerField(blank=True, null=True)),
+                ('event_type', models.CharField(choices=[('placed', 'Placed'), ('order_status', 'Order status'), ('line_status', 'Line status'), ('tracking', 'Tracking')], max_length=20)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='orders.shoporder')),
+                ('seller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('status', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.orderstatus')),
+            ],
+            options={
+                'verbose_name': 'Order Event',
+                'verbose_name_plural': 'Order Events',
+                'indexes': [models.Index(fields=['order', 'id'], name='orders_orde_order_i_2001ca_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_order_events, migrations.RunPython.noop),
+    ]
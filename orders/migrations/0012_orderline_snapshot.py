@@ -0,0 +1,113 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_line_snapshots(apps, schema_editor):
+    fields = ['product_name', 'sku', 'seller_id', 'seller_username', 'store_name']
+    for model_name in ('OrderLine', 'ArchivedOrderLine'):
+        Line = apps.get_model('orders', model_name)
+        last_id = 0
+        while True:
+            rows = list(
+                Line.objects.filter(id__gt=last_id, product_item__isnull=False)
+                .order_by('id')
+                .values_list(
+                    'id',
+                    'product_item__product__name',
+                    'product_item__sku',
+                    'product_item__product__seller_id',
+                    'product_item__product__seller__username',
+                    'product_item__product__seller__seller_profile__store_name',
+                )[:1000]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            Line.objects.bulk_update([
+                Line(
+                    id=line_id, product_name=name or '', sku=sku or '', seller_id=seller_id,
+                    seller_username=username or '', store_name=store_name or '',
+                )
+                for line_id, name, sku, seller_id, username, store_name in rows
+            ], fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_alter_phone_number_lengths'),
+        ('orders', '0011_orderevent'),
+        ('products', '0008_postgres_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='seller_username',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='sku',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='archivedorderline',
+            name='store_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='seller_username',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='sku',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='orderline',
+            name='store_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='archivedorderline',
+            name='product_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.productitem'),
+        ),
+        migrations.AlterField(
+            model_name='orderline',
+            name='product_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.productitem'),
+        ),
+        migrations.AddIndex(
+            model_name='orderline',
+            index=models.Index(fields=['seller', 'order'], name='orders_orde_seller__4b9a89_idx'),
+        ),
+        migrations.RunPython(backfill_line_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:36
+
+from django.db import migrations, models
+
+
+def backfill_address_snapshots(apps, schema_editor):
+    ShopOrder = apps.get_model('orders', 'ShopOrder')
+
+    fields = ('unit_number', 'street_number', 'address_line1', 'address_line2', 'city', 'region', 'postal_code')
+    last_id = 0
+    while True:
+        rows = list(
+            ShopOrder.objects.filter(id__gt=last_id, shipping_address__isnull=False)
+            .order_by('id')
+            .values(
+                'id', 'shipping_address_id', 'shipping_address__country__country_name',
+                *(f'shipping_address__{f}' for f in fields),
+            )[:1000]
+        )
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        ShopOrder.objects.bulk_update([
+            ShopOrder(id=row['id'], shipping_address_snapshot={
+                'id': row['shipping_address_id'],
+                **{f: row[f'shipping_address__{f}'] for f in fields},
+                'country_name': row['shipping_address__country__country_name'],
+            })
+            for row in rows
+        ], ['shipping_address_snapshot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_orderline_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoporder',
+            name='shipping_address_snapshot',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_address_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.11 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+def backfill_line_status_counts(apps, schema_editor):
+    """Fill ``line_status_counts`` of orders created before the column (0007)."""
+    from django.db.models import Count
+
+    from orders.statuses import PENDING
+
+    ShopOrder = apps.get_model('orders', 'ShopOrder')
+    OrderLine = apps.get_model('orders', 'OrderLine')
+    OrderStatus = apps.get_model('orders', 'OrderStatus')
+
+    keys = dict(OrderStatus.objects.values_list('id', 'key'))
+    last_id = 0
+    while True:
+        batch = list(
+            ShopOrder.objects.filter(id__gt=last_id, archived_at__isnull=True)
+            .order_by('id')
+            .values_list('id', 'line_status_counts')[:1000]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        counts = {order_id: {} for order_id, stored in batch if not stored}
+        rows = (
+            OrderLine.objects.filter(order_id__in=list(counts))
+            .values_list('order_id', 'line_status_id')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        for order_id, status_id, n in rows:
+            key = keys.get(status_id) or PENDING
+            counts[order_id][key] = counts[order_id].get(key, 0) + int(n)
+        ShopOrder.objects.bulk_update(
+            [ShopOrder(id=order_id, line_status_counts=c) for order_id, c in counts.items() if c],
+            ['line_status_counts'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_line_status_counts, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,18 @@
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from products.models import ProductItem
 from accounts.models import Address, UserPaymentMethod
+from .statuses import ORDER_STATUS_KEY_CHOICES, normalize_order_status_key
+from .tracking import TrackedFieldsModel
 
 class OrderStatus(models.Model):
     """Order lifecycle status (e.g., Pending, Shipped, Delivered)."""
 
     status = models.CharField(max_length=50, unique=True)
+    # Canonical key used by business rules (derived from the label when blank).
+    key = models.CharField(max_length=20, choices=ORDER_STATUS_KEY_CHOICES, blank=True, default='', db_index=True)
     
     class Meta:
         verbose_name_plural = "Order Statuses"
@@ -16,20 +21,49 @@ class OrderStatus(models.Model):
     def __str__(self):
         return self.status
 
-class ShopOrder(models.Model):
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = normalize_order_status_key(self.status) or ''
+        super().save(*args, **kwargs)
+
+def address_snapshot(address) -> dict:
+    """Shipping address fields copied onto an order (``country`` must be loaded)."""
+    return {
+        'id': address.id,
+        'unit_number': address.unit_number,
+        'street_number': address.street_number,
+        'address_line1': address.address_line1,
+        'address_line2': address.address_line2,
+        'city': address.city,
+        'region': address.region,
+        'postal_code': address.postal_code,
+        'country_name': getattr(address.country, 'country_name', None),
+    }
+
+
+class ShopOrder(TrackedFieldsModel):
     """Represents a customer's order and fulfillment tracking."""
 
+    # post_save receivers only act when the status changed (see orders.signals).
+    tracked_fields = ('order_status_id',)
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     order_date = models.DateTimeField(auto_now_add=True)
     payment_method = models.ForeignKey(UserPaymentMethod, on_delete=models.SET_NULL, null=True)
     shipping_address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True)
+    # Address as it was at checkout; reads use this, so later edits/deletes don't rewrite history.
+    shipping_address_snapshot = models.JSONField(default=dict, blank=True)
     order_total = models.DecimalField(max_digits=10, decimal_places=2)
     order_status = models.ForeignKey(OrderStatus, on_delete=models.CASCADE)
+    # Per-status line histogram ({status_key: count}); order_status is derived from it.
+    line_status_counts = models.JSONField(default=dict, blank=True)
 
     shipping_carrier = models.CharField(max_length=100, null=True, blank=True)
     tracking_number = models.CharField(max_length=120, null=True, blank=True)
     shipped_at = models.DateTimeField(null=True, blank=True)
     delivered_at = models.DateTimeField(null=True, blank=True)
+    # Set by ``archive_orders`` once lines/seller links moved to the archive tables.
+    archived_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = "Shop Order"
@@ -38,19 +72,44 @@ class ShopOrder(models.Model):
             models.Index(fields=['user', 'order_date']),
             models.Index(fields=['order_status', 'order_date']),
             models.Index(fields=['user', 'order_status', 'order_date']),
+            # Customer lists only read live orders; keep their index small.
+            models.Index(
+                fields=['user', 'order_date'],
+                condition=models.Q(archived_at__isnull=True),
+                name='orders_shoporder_live_user_idx',
+            ),
         ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        # Checkout passes the snapshot; other writers (seed data, admin) get it here.
+        if not self.shipping_address_snapshot and self.shipping_address_id:
+            self.shipping_address_snapshot = address_snapshot(self.shipping_address)
+        super().save(*args, **kwargs)
+
 class OrderLine(models.Model):
-    """Line item inside an order."""
+    """Line item inside an order.
 
-    product_item = models.ForeignKey(ProductItem, on_delete=models.CASCADE)
+    Product name, SKU and seller are copied from the SKU at checkout, so
+    reading an order never joins the catalog and later renames (or deleted
+    products) do not change it.
+    """
+
+    # Kept for stock updates; history reads the snapshot columns below.
+    product_item = models.ForeignKey(ProductItem, on_delete=models.SET_NULL, null=True, blank=True)
     order = models.ForeignKey(ShopOrder, on_delete=models.CASCADE, related_name='lines')
     qty = models.IntegerField(default=1)
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Snapshot of the SKU at checkout (see ``fill_snapshot``).
+    product_name = models.CharField(max_length=255, blank=True, default='')
+    sku = models.CharField(max_length=255, blank=True, default='')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    seller_username = models.CharField(max_length=150, blank=True, default='')
+    store_name = models.CharField(max_length=255, blank=True, default='')
+
     # Per-line fulfillment status (important for multi-vendor orders).
     line_status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True, blank=True, related_name='order_lines')
     line_shipped_at = models.DateTimeField(null=True, blank=True)
@@ -62,7 +121,215 @@ class OrderLine(models.Model):
         indexes = [
             models.Index(fields=['order', 'product_item']),
             models.Index(fields=['order', 'line_status']),
+            models.Index(fields=['seller', 'order']),
+        ]
+
+    def __str__(self):
+        return f"Line for Order #{self.order_id} - {self.product_name or self.product_item}"
+
+    def fill_snapshot(self) -> None:
+        """Copy product name, SKU and seller from ``product_item``."""
+        item = self.product_item
+        product = item.product
+        seller = product.seller
+        profile = getattr(seller, 'seller_profile', None)
+        self.product_name = product.name
+        self.sku = item.sku
+        self.seller_id = seller.id
+        self.seller_username = seller.username
+        self.store_name = getattr(profile, 'store_name', None) or ''
+
+    def save(self, *args, **kwargs):
+        # Checkout passes the snapshot; other writers (seed data, admin) get it here.
+        if not self.sku and self.product_item_id:
+            self.fill_snapshot()
+        super().save(*args, **kwargs)
+
+class OrderSeller(models.Model):
+    """Order <-> seller link written at checkout.
+
+    Lets seller order lists filter on one indexed table instead of joining
+    lines -> SKUs -> products with DISTINCT, and carries the seller's share
+    of the order (line count + subtotal).
+    """
+
+    order = models.ForeignKey(ShopOrder, on_delete=models.CASCADE, related_name='seller_links')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='order_links')
+    line_count = models.PositiveIntegerField(default=0)
+    seller_subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Copy of ShopOrder.order_date so seller lists sort on this table's index.
+    order_date = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Order Seller"
+        verbose_name_plural = "Order Sellers"
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seller'], name='orders_orderseller_order_seller_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'order_date']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} - Seller #{self.seller_id}"
+
+
+class ArchivedOrderLine(models.Model):
+    """OrderLine moved out of the hot table by ``archive_orders`` (same id)."""
+
+    id = models.BigIntegerField(primary_key=True)
+    product_item = models.ForeignKey(ProductItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    order = models.ForeignKey(ShopOrder, on_delete=models.CASCADE, related_name='archived_lines')
+    qty = models.IntegerField(default=1)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    product_name = models.CharField(max_length=255, blank=True, default='')
+    sku = models.CharField(max_length=255, blank=True, default='')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    seller_username = models.CharField(max_length=150, blank=True, default='')
+    store_name = models.CharField(max_length=255, blank=True, default='')
+    line_status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    line_shipped_at = models.DateTimeField(null=True, blank=True)
+    line_delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Archived Order Item"
+        verbose_name_plural = "Archived Order Items"
+
+    def __str__(self):
+        return f"Archived line for Order #{self.order_id} - {self.product_name or self.product_item}"
+
+
+class ArchivedOrderSeller(models.Model):
+    """OrderSeller link of an archived order (read by ``?archived=1`` seller lists)."""
+
+    order = models.ForeignKey(ShopOrder, on_delete=models.CASCADE, related_name='archived_seller_links')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    line_count = models.PositiveIntegerField(default=0)
+    seller_subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    order_date = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Archived Order Seller"
+        verbose_name_plural = "Archived Order Sellers"
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'seller'], name='orders_archivedorderseller_order_seller_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'order_date']),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.order_id} - Seller #{self.seller_id}"
+
+
+class OrderEvent(models.Model):
+    """Append-only order timeline (placed, status and tracking changes).
+
+    Written in bulk by every status mutation path (see ``orders.events``).
+    Clients read new entries with ``/api/orders/<id>/events/?after=<id>``
+    instead of refetching the whole order.
+    """
+
+    PLACED = 'placed'
+    ORDER_STATUS = 'order_status'
+    LINE_STATUS = 'line_status'
+    TRACKING = 'tracking'
+    TYPE_CHOICES = [
+        (PLACED, 'Placed'),
+        (ORDER_STATUS, 'Order status'),
+        (LINE_STATUS, 'Line status'),
+        (TRACKING, 'Tracking'),
+    ]
+
+    order = models.ForeignKey(ShopOrder, on_delete=models.CASCADE, related_name='events')
+    # Plain id, not a FK: lines can move to ArchivedOrderLine (same id).
+    line_id = models.BigIntegerField(null=True, blank=True)
+    # Owner of the line for line events; sellers only see their own lines' events.
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    event_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Extra fields for the event type (e.g. shipping_carrier / tracking_number).
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Order Event"
+        verbose_name_plural = "Order Events"
+        indexes = [
+            models.Index(fields=['order', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} - {self.event_type} #{self.id}"
+
+
+class OrderExport(models.Model):
+    """Order/line export built in the background (see ``orders.tasks``).
+
+    Small exports are streamed straight from the API; larger ones are
+    written to ``MEDIA_ROOT`` by a Celery job and downloaded later.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+    FORMAT_CHOICES = [('csv', 'CSV'), ('ndjson', 'NDJSON')]
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='order_exports')
+    # Seller scope; null means every seller (staff/finance exports).
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    # OrderFilters values (status_id, date_from, date_to) as JSON.
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    row_count = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/orders/', null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Order Export"
+        verbose_name_plural = "Order Exports"
+
+    def __str__(self):
+        return f"Order export #{self.id} ({self.file_format}, {self.status})"
+
+
+class OutboxMessage(models.Model):
+    """Side effect recorded in the same transaction as the change causing it.
+
+    Signals only insert a message (see ``orders.outbox``); a Celery worker
+    runs the registered handler later, in batches, with retries. Handlers
+    run in the transaction that marks the message done, so each message
+    takes effect once.
+    """
+
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    topic = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Retries are pushed back here (exponential backoff).
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outbox Message"
+        verbose_name_plural = "Outbox Messages"
+        indexes = [
+            # The drain query: pending messages that are due, oldest first.
+            models.Index(fields=['available_at', 'id'], condition=models.Q(status='pending'), name='outbox_pending_idx'),
         ]
 
     def __str__(self):
-        return f"Line for Order #{self.order.id} - {self.product_item}"
\ No newline at end of file
+        return f"Outbox #{self.id} {self.topic} ({self.status})"
@@ -0,0 +1,238 @@
+"""Transactional outbox for order side effects.
+
+Signal receivers no longer do slow work (payment sync, invoices, stock) in
+the request's transaction; they ``enqueue`` an ``OutboxMessage`` instead,
+which commits or rolls back with the change itself. After the commit the
+messages are drained (``OUTBOX_DISPATCH``):
+
+- ``celery``: the ``orders.tasks.process_outbox`` task is queued; Celery beat
+  also runs it periodically, so nothing is lost if a kick fails.
+- ``inline``: drained in-process right after the commit (dev/tests).
+- ``off``: left for beat / ``process_outbox`` only.
+
+Each handler runs in the transaction that marks its message done, so a
+message takes effect exactly once; failures are retried with backoff and
+marked failed after ``OUTBOX_MAX_ATTEMPTS``. A failing batch is retried one
+message at a time so only the bad message is charged, and if a claimed batch
+cannot commit (e.g. a deferred constraint) its messages are re-run one per
+transaction so the attempt bookkeeping always sticks.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+from typing import Callable
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+# Topics (handlers live next to the receivers that enqueue them).
+PAYMENT_SYNC = 'payment.sync'
+INVOICE_CREATE = 'invoice.create'
+STOCK_ADJUST = 'stock.adjust'
+
+_handlers: dict[str, Callable] = {}
+_batch_topics: set[str] = set()
+_local = threading.local()
+
+_FIELDS = ['status', 'attempts', 'available_at', 'last_error', 'processed_at']
+
+
+def handler(topic: str, batch: bool = False):
+    """Register ``func(payload)`` as the handler of ``topic``.
+
+    With ``batch=True`` the handler is called once per drained batch as
+    ``func(payloads)`` with every due message of the topic, so it can use
+    set-based queries; if the batch fails, each message is retried alone.
+    """
+
+    def register(func):
+        _handlers[topic] = func
+        if batch:
+            _batch_topics.add(topic)
+        else:
+            _batch_topics.discard(topic)
+        return func
+
+    return register
+
+
+def enqueue(topic: str, payload: dict) -> OutboxMessage:
+    """Record one side effect in the current transaction."""
+    message = OutboxMessage.objects.create(topic=topic, payload=payload)
+    _schedule_dispatch()
+    return message
+
+
+def enqueue_many(messages) -> list[OutboxMessage]:
+    """Record ``(topic, payload)`` pairs with a single INSERT (no-op when empty)."""
+    rows = [OutboxMessage(topic=topic, payload=payload) for topic, payload in messages]
+    if not rows:
+        return []
+    created = OutboxMessage.objects.bulk_create(rows)
+    _schedule_dispatch()
+    return created
+
+
+def _schedule_dispatch() -> None:
+    # Messages enqueued by handlers are picked up by the running drain.
+    if getattr(_local, 'draining', False):
+        return
+    connection = transaction.get_connection()
+    # One dispatch per transaction, however many messages it wrote.
+    if any(entry[1] is dispatch for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(dispatch)
+
+
+def dispatch() -> None:
+    """Start draining committed messages according to ``OUTBOX_DISPATCH``."""
+    mode = getattr(settings, 'OUTBOX_DISPATCH', 'celery')
+    if mode == 'inline':
+        drain_outbox()
+    elif mode == 'celery':
+        from .tasks import process_outbox
+
+        try:
+            process_outbox.delay()
+        except Exception:
+            # Beat drains the outbox periodically; the messages are safe.
+            logger.exception('Could not queue the outbox drain')
+
+
+def retry_delay(attempts: int) -> dt.timedelta:
+    """Backoff before attempt ``attempts + 1``: 30s, 60s, 120s, ... capped at 1h."""
+    return dt.timedelta(seconds=min(30 * 2 ** max(0, attempts - 1), 3600))
+
+
+def _check_deferred_constraints() -> None:
+    """Raise deferred FK violations now instead of at COMMIT (PostgreSQL defers them)."""
+    connection = transaction.get_connection()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+def _fail(messages: list[OutboxMessage], now, max_attempts: int, error: str) -> None:
+    """Charge ``messages`` one attempt: back off, or mark failed at ``max_attempts``."""
+    for message in messages:
+        message.attempts += 1
+        message.last_error = error[:2000]
+        if message.attempts >= max_attempts:
+            message.status = OutboxMessage.FAILED
+            message.processed_at = now
+        else:
+            message.available_at = now + retry_delay(message.attempts)
+
+
+def _run(messages: list[OutboxMessage], now, max_attempts: int) -> None:
+    """Run the handler for ``messages`` (one message, or one topic's batch)."""
+    topic = messages[0].topic
+    func = _handlers.get(topic)
+    if func is None:
+        _fail(messages, now, max_attempts, f'No handler for topic {topic!r}')
+        return
+    try:
+        # Savepoint: a failing handler leaves no partial writes behind.
+        with transaction.atomic():
+            if topic in _batch_topics:
+                func([m.payload for m in messages])
+            else:
+                func(messages[0].payload)
+            _check_deferred_constraints()
+    except Exception as exc:
+        logger.exception('Outbox message(s) %s (%s) failed', [m.id for m in messages], topic)
+        if len(messages) > 1:
+            # Find the bad message(s); the rest still succeed this run.
+            for message in messages:
+                _run([message], now, max_attempts)
+            return
+        _fail(messages, now, max_attempts, f'{type(exc).__name__}: {exc}')
+        return
+
+    for message in messages:
+        message.status = OutboxMessage.DONE
+        message.attempts += 1
+        message.processed_at = now
+        message.last_error = ''
+
+
+def _groups(batch: list[OutboxMessage]) -> list[list[OutboxMessage]]:
+    """Single messages in order; batch topics grouped at their first message."""
+    groups, by_topic = [], {}
+    for message in batch:
+        if message.topic not in _batch_topics:
+            groups.append([message])
+        elif message.topic in by_topic:
+            by_topic[message.topic].append(message)
+        else:
+            by_topic[message.topic] = [message]
+            groups.append(by_topic[message.topic])
+    return groups
+
+
+def drain_outbox(batch_size: int | None = None) -> int:
+    """Run due messages in batches until none are left; return how many ran.
+
+    Batches are claimed with ``SELECT … FOR UPDATE SKIP LOCKED``, so several
+    workers can drain at once without running a message twice.
+    """
+
+    batch_size = max(1, int(batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)))
+    max_attempts = max(1, int(getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)))
+    handled = 0
+    _local.draining = True
+    try:
+        while True:
+            now = timezone.now()
+            batch = []
+            try:
+                with transaction.atomic():
+                    batch = list(
+                        OutboxMessage.objects.filter(status=OutboxMessage.PENDING, available_at__lte=now)
+                        .select_for_update(skip_locked=True)
+                        .order_by('available_at', 'id')[:batch_size]
+                    )
+                    if not batch:
+                        break
+                    for group in _groups(batch):
+                        _run(group, now, max_attempts)
+                    OutboxMessage.objects.bulk_update(batch, _FIELDS)
+            except DatabaseError:
+                if not batch:
+                    raise
+                # The batch did not commit: nothing it did (bookkeeping included) stuck.
+                logger.exception('Outbox batch %s failed to commit', [m.id for m in batch])
+                _drain_isolated([m.id for m in batch], max_attempts)
+            handled += len(batch)
+    finally:
+        _local.draining = False
+    return handled
+
+
+def _drain_isolated(message_ids: list[int], max_attempts: int) -> None:
+    """Run each message in its own transaction; charge it if that cannot commit."""
+    for message_id in message_ids:
+        now = timezone.now()
+        claim = OutboxMessage.objects.filter(id=message_id, status=OutboxMessage.PENDING).select_for_update(skip_locked=True)
+        try:
+            with transaction.atomic():
+                message = claim.first()
+                if message is not None:
+                    _run([message], now, max_attempts)
+                    message.save(update_fields=_FIELDS)
+        except DatabaseError as exc:
+            logger.exception('Outbox message %s failed to commit', message_id)
+            with transaction.atomic():
+                message = claim.first()
+                if message is not None:
+                    _fail([message], now, max_attempts, f'{type(exc).__name__}: {exc}')
+                    message.save(update_fields=_FIELDS)
@@ -0,0 +1,197 @@
+"""Reusable order querysets for read endpoints.
+
+``ShopOrderSerializer`` touches the order status, customer, shipping address
+(+ country), transaction (+ payment status) and, per line, the SKU, product,
+seller, seller profile and line status. Loading all of them here keeps list
+endpoints at a fixed number of queries per page, whatever the page size.
+
+List filters (order id, status, date range) are parsed once into
+``OrderFilters`` and applied as plain column lookups, so every combination
+can be served from the ``(user, [order_status,] order_date)`` indexes on
+ShopOrder or the ``(seller, order_date)`` index on OrderSeller.
+
+Archived orders (see ``archive_orders``) keep their ShopOrder row but their
+lines and seller links live in ArchivedOrderLine / ArchivedOrderSeller. Lists
+read either live or archived orders (``OrderFilters.archived``), never both.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ArchivedOrderLine, ArchivedOrderSeller, OrderLine, OrderSeller, ShopOrder
+
+
+def local_date_range(date_from: dt.date | None, date_to: dt.date | None):
+    """Half-open ``[start, end)`` datetimes for whole local days in TIME_ZONE.
+
+    ``date_to`` is inclusive: ``end`` is midnight of the following day. Either
+    bound is None when the matching date is missing. Comparing the raw column
+    against these bounds (instead of ``order_date__date``) keeps the index usable.
+    """
+
+    tz = timezone.get_default_timezone()
+
+    def midnight(day: dt.date) -> dt.datetime:
+        return timezone.make_aware(dt.datetime.combine(day, dt.time.min), tz)
+
+    start = midnight(date_from) if date_from else None
+    end = midnight(date_to + dt.timedelta(days=1)) if date_to else None
+    return start, end
+
+
+def _parse_day(raw) -> dt.date | None:
+    try:
+        return parse_date(str(raw or '').strip())
+    except ValueError:
+        # Well-formed but impossible dates (e.g. 2024-02-30) are ignored.
+        return None
+
+
+def _parse_id(raw) -> int | None:
+    raw = str(raw or '').strip()
+    return int(raw) if raw.isdigit() else None
+
+
+def _parse_flag(raw) -> bool:
+    return str(raw or '').strip().lower() in {'1', 'true', 'yes'}
+
+
+@dataclass(frozen=True)
+class OrderFilters:
+    """Order list filters shared by the customer and seller endpoints."""
+
+    order_id: int | None = None
+    status_id: int | None = None
+    date_from: dt.date | None = None
+    date_to: dt.date | None = None
+    archived: bool = False
+
+    @classmethod
+    def from_params(cls, params) -> 'OrderFilters':
+        """Parse ``q`` (order id), ``status``, ``date_from``, ``date_to`` and ``archived``.
+
+        Invalid values are ignored, like the endpoints always did.
+        """
+        return cls(
+            order_id=_parse_id(params.get('q')),
+            status_id=_parse_id(params.get('status')),
+            date_from=_parse_day(params.get('date_from')),
+            date_to=_parse_day(params.get('date_to')),
+            archived=_parse_flag(params.get('archived')),
+        )
+
+    def lookups(self, date_field: str = 'order_date') -> dict:
+        """Filter kwargs; dates become a half-open range on ``date_field``."""
+        out = {}
+        if self.order_id is not None:
+            out['id'] = self.order_id
+        if self.status_id is not None:
+            out['order_status_id'] = self.status_id
+        start, end = local_date_range(self.date_from, self.date_to)
+        if start is not None:
+            out[f'{date_field}__gte'] = start
+        if end is not None:
+            out[f'{date_field}__lt'] = end
+        return out
+
+
+def customer_orders_queryset(user, filters: OrderFilters | None = None):
+    """A customer's live (or archived) orders, newest first, read from the ``(user, ...)`` indexes."""
+    filters = filters or OrderFilters()
+    return ShopOrder.objects.filter(
+        user=user,
+        archived_at__isnull=not filters.archived,
+        **filters.lookups(),
+    ).order_by('-order_date')
+
+
+# The shipping address is read from ShopOrder.shipping_address_snapshot (no join).
+ORDER_READ_RELATIONS = (
+    'order_status',
+    'user',
+    'transaction__payment_status',
+)
+
+
+def order_lines_queryset(archived: bool = False):
+    """(Archived)OrderLine queryset for OrderLineSerializer.
+
+    Product and seller details come from the line's snapshot columns; only
+    the status is joined.
+    """
+    model = ArchivedOrderLine if archived else OrderLine
+    return model.objects.select_related('line_status').order_by('id')
+
+
+def with_read_relations(qs, archived: bool = False):
+    """Select/prefetch every relation the order read serializers touch."""
+    return qs.select_related(*ORDER_READ_RELATIONS).prefetch_related(
+        Prefetch('archived_lines' if archived else 'lines', queryset=order_lines_queryset(archived)),
+    )
+
+
+def drop_stale_lines(order) -> None:
+    """Forget a ``lines`` prefetch after the order's lines were updated.
+
+    The serializer then reloads them (with relations) in one query.
+    """
+    getattr(order, '_prefetched_objects_cache', {}).pop('lines', None)
+
+
+# Columns of the flat order summary projection (see ``summary_values``).
+SUMMARY_FIELDS = (
+    'id',
+    'order_date',
+    'order_total',
+    'order_status_id',
+    'status_display',
+    'status_key',
+    'payment_status',
+    'customer_username',
+    'shipping_carrier',
+    'tracking_number',
+    'shipped_at',
+    'delivered_at',
+    'line_status_counts',
+    'seller_count',
+)
+
+
+def summary_values(qs, archived: bool = False):
+    """Flat ``.values()`` projection for order list summaries.
+
+    No line rows are read: line totals come from ``line_status_counts``, the
+    seller count from (Archived)OrderSeller, and seller querysets keep their
+    ``seller_line_count`` annotation.
+    """
+
+    links = ArchivedOrderSeller if archived else OrderSeller
+    seller_count = (
+        links.objects.filter(order=OuterRef('pk'))
+        .order_by()
+        .values('order')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    fields = list(SUMMARY_FIELDS)
+    if 'seller_line_count' in qs.query.annotations:
+        fields.append('seller_line_count')
+
+    return (
+        qs.prefetch_related(None)
+        .annotate(
+            status_display=F('order_status__status'),
+            status_key=F('order_status__key'),
+            payment_status=F('transaction__payment_status__status'),
+            customer_username=F('user__username'),
+            seller_count=Coalesce(Subquery(seller_count, output_field=IntegerField()), Value(0)),
+        )
+        .values(*fields)
+    )
@@ -0,0 +1,235 @@
+"""Live order updates: fan-out of OrderEvents to connected SSE clients.
+
+Committed events (see ``orders.events.record_events``) are published as one
+message per transaction, keyed by recipient user id: the order's customer
+gets every event; each involved seller gets order-level events and events of
+their own lines.
+
+Two layers share the same API (``ORDER_EVENTS_LAYER``):
+
+- ``memory``: process-local fan-out, for tests and ``runserver``.
+- ``redis``: publishers (gunicorn workers, Celery) ``PUBLISH`` to one Redis
+  channel. Each ASGI process holds a single subscription to it and hands
+  messages to its local listeners. An idle SSE client costs one asyncio
+  queue and no Redis connection.
+
+``order_event_stream`` turns a listener into ``text/event-stream`` chunks for
+``GET /api/orders/stream/`` (see ``orders.views_stream``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+logger = logging.getLogger(__name__)
+
+# Messages kept per listener before a slow client is told to resync.
+LISTENER_QUEUE_SIZE = 100
+RESYNC = {'type': 'resync'}
+
+
+def _offer(queue: asyncio.Queue, message) -> None:
+    """Queue ``message``; a full queue is replaced by a single resync marker."""
+    if queue.full():
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+        return
+    queue.put_nowait(message)
+
+
+class InMemoryLayer:
+    """Process-local fan-out keyed by user id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners: dict[int, set] = defaultdict(set)
+
+    @staticmethod
+    def _send(listeners, message) -> None:
+        for loop, queue in listeners:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                # Loop already closed; the listener is going away.
+                pass
+
+    def _dispatch(self, batch: dict) -> None:
+        """Hand ``{user_id: events}`` to local listeners (thread-safe)."""
+        for user_id, events in batch.items():
+            with self._lock:
+                listeners = list(self._listeners.get(int(user_id), ()))
+            self._send(listeners, {'type': 'events', 'events': events})
+
+    def _resync_all(self) -> None:
+        with self._lock:
+            listeners = [entry for entries in self._listeners.values() for entry in entries]
+        self._send(listeners, RESYNC)
+
+    def publish(self, batch: dict) -> None:
+        self._dispatch(batch)
+
+    async def _started(self) -> None:
+        """Hook for layers that need a background reader."""
+
+    @contextlib.asynccontextmanager
+    async def listen(self, user_id: int):
+        """Yield an asyncio.Queue receiving messages for ``user_id``."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=LISTENER_QUEUE_SIZE))
+        with self._lock:
+            self._listeners[user_id].add(entry)
+        try:
+            await self._started()
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._listeners[user_id].discard(entry)
+                if not self._listeners[user_id]:
+                    del self._listeners[user_id]
+
+
+class RedisLayer(InMemoryLayer):
+    """Redis pub/sub in front of the in-memory fan-out (one subscription per process)."""
+
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._reader: asyncio.Task | None = None
+
+    def publish(self, batch: dict) -> None:
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(self.channel, json.dumps(batch, cls=DjangoJSONEncoder))
+
+    async def _started(self) -> None:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def _read(self) -> None:
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for item in pubsub.listen():
+                        if item.get('type') == 'message':
+                            self._dispatch(json.loads(item['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Order events subscription lost; reconnecting')
+                # Listeners may have missed messages; they catch up from /events/.
+                self._resync_all()
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+_layer: InMemoryLayer | None = None
+_layer_lock = threading.Lock()
+
+
+def get_layer() -> InMemoryLayer:
+    """Return the process-wide layer configured by ``ORDER_EVENTS_LAYER``."""
+    global _layer
+    with _layer_lock:
+        if _layer is None:
+            if getattr(settings, 'ORDER_EVENTS_LAYER', 'memory') == 'redis':
+                _layer = RedisLayer(settings.REDIS_URL, getattr(settings, 'ORDER_EVENTS_CHANNEL', 'orders:events'))
+            else:
+                _layer = InMemoryLayer()
+        return _layer
+
+
+def reset_layer() -> None:
+    """Drop the cached layer (settings changes in tests)."""
+    global _layer
+    with _layer_lock:
+        _layer = None
+
+
+def recipient_batch(events) -> dict[int, list[dict]]:
+    """Group saved OrderEvents by the users allowed to see them."""
+    from .events import event_payload
+    from .models import OrderSeller, ShopOrder
+
+    order_ids = {e.order_id for e in events}
+    customers = dict(ShopOrder.objects.filter(id__in=order_ids).values_list('id', 'user_id'))
+    sellers = defaultdict(set)
+    for order_id, seller_id in OrderSeller.objects.filter(order_id__in=order_ids).values_list('order_id', 'seller_id'):
+        sellers[order_id].add(seller_id)
+
+    batch: dict[int, list[dict]] = defaultdict(list)
+    for event in events:
+        payload = event_payload(event)
+        if event.order_id in customers:
+            batch[customers[event.order_id]].append(payload)
+        for seller_id in sellers[event.order_id]:
+            if event.line_id is None or event.seller_id == seller_id:
+                batch[seller_id].append(payload)
+    return dict(batch)
+
+
+def publish_order_events(events) -> None:
+    """Publish committed events; failures only cost live delivery, never the write."""
+    try:
+        batch = recipient_batch(events)
+        if batch:
+            get_layer().publish(batch)
+    except Exception:
+        logger.exception('Could not publish order events')
+
+
+def stream_heartbeat() -> float:
+    """Seconds between keep-alive comments on idle streams."""
+    return float(getattr(settings, 'ORDER_EVENTS_HEARTBEAT', 20))
+
+
+def sse_message(data, event: str | None = None, event_id=None) -> str:
+    """Encode one server-sent event."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def order_event_stream(user_id: int, order_id: int | None = None, heartbeat: float | None = None):
+    """Yield SSE chunks with ``user_id``'s order events (optionally one order).
+
+    ``order`` events carry the same rows as ``/api/orders/<id>/events/`` plus
+    ``order_id``; ``resync`` means some were dropped and the client should
+    read ``/events/?after=`` again.
+    """
+    heartbeat = heartbeat or stream_heartbeat()
+    async with get_layer().listen(user_id) as queue:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if message['type'] == 'resync':
+                yield sse_message({}, event='resync')
+                continue
+            for event in message['events']:
+                if order_id is None or event['order_id'] == order_id:
+                    yield sse_message(event, event='order', event_id=event['id'])
@@ -0,0 +1,120 @@
+"""Helpers for the OrderSeller link table."""
+
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from .models import OrderLine, OrderSeller, ShopOrder
+
+
+def seller_orders_queryset(seller, filters=None):
+    """ShopOrder queryset for orders that include ``seller``'s SKUs, newest first.
+
+    Joins only the OrderSeller link table (unique per order + seller, so no
+    DISTINCT) and annotates the seller's own ``seller_line_count`` and
+    ``seller_subtotal``. Both annotations reuse the filter's join.
+
+    ``filters`` (an ``orders.queries.OrderFilters``) is applied in the same
+    ``filter()`` call; its date range goes on the link's ``order_date`` so
+    the ``(seller, order_date)`` index serves it. A separate ``filter()`` on
+    the link table would add a second join. ``filters.archived`` switches to
+    the ArchivedOrderSeller links of archived orders.
+    """
+
+    links = 'archived_seller_links' if (filters and filters.archived) else 'seller_links'
+    lookups = filters.lookups(date_field=f'{links}__order_date') if filters else {}
+    return (
+        ShopOrder.objects.filter(**{f'{links}__seller': seller}, **lookups)
+        .annotate(
+            seller_line_count=F(f'{links}__line_count'),
+            seller_subtotal=F(f'{links}__seller_subtotal'),
+        )
+        .order_by(f'-{links}__order_date')
+    )
+
+
+def line_snapshots(skus) -> dict[int, dict]:
+    """OrderLine snapshot fields per SKU id for checkout.
+
+    ``skus`` must have ``product`` loaded; sellers' usernames and store names
+    are read with one query (kept out of the locked SKU query).
+    """
+
+    seller_ids = {sku.product.seller_id for sku in skus}
+    sellers = {
+        seller_id: (username, store_name or '')
+        for seller_id, username, store_name in get_user_model().objects.filter(id__in=seller_ids)
+        .values_list('id', 'username', 'seller_profile__store_name')
+    }
+    snapshots = {}
+    for sku in skus:
+        username, store_name = sellers.get(sku.product.seller_id, ('', ''))
+        snapshots[sku.id] = {
+            'product_name': sku.product.name,
+            'sku': sku.sku,
+            'seller_id': sku.product.seller_id,
+            'seller_username': username,
+            'store_name': store_name,
+        }
+    return snapshots
+
+
+def seller_links_for_lines(order: ShopOrder, lines) -> list[OrderSeller]:
+    """Build (unsaved) OrderSeller rows for in-memory order lines.
+
+    Uses the lines' ``seller_id`` snapshot, so this costs no queries.
+    """
+
+    by_seller: dict[int, OrderSeller] = {}
+    for ln in lines:
+        seller_id = ln.seller_id
+        link = by_seller.get(seller_id)
+        if link is None:
+            link = by_seller[seller_id] = OrderSeller(
+                order=order,
+                seller_id=seller_id,
+                line_count=0,
+                seller_subtotal=Decimal('0.00'),
+                order_date=order.order_date,
+            )
+        link.line_count += 1
+        link.seller_subtotal += Decimal(str(ln.price)) * int(ln.qty or 0)
+    return list(by_seller.values())
+
+
+def rebuild_order_seller_links(order_ids) -> int:
+    """Recreate OrderSeller rows for ``order_ids`` from their lines.
+
+    Returns the number of links written.
+    """
+
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+
+    dates = dict(ShopOrder.objects.filter(id__in=order_ids).values_list('id', 'order_date'))
+    rows = (
+        OrderLine.objects.filter(order_id__in=order_ids)
+        .values('order_id', 'seller_id')
+        .annotate(
+            n=Count('id'),
+            subtotal=Sum(ExpressionWrapper(F('price') * F('qty'), output_field=DecimalField(max_digits=12, decimal_places=2))),
+        )
+        .order_by()
+    )
+    links = [
+        OrderSeller(
+            order_id=r['order_id'],
+            seller_id=r['seller_id'],
+            line_count=r['n'],
+            seller_subtotal=r['subtotal'] or Decimal('0.00'),
+            order_date=dates[r['order_id']],
+        )
+        for r in rows
+    ]
+    OrderSeller.objects.filter(order_id__in=order_ids).delete()
+    OrderSeller.objects.bulk_create(links)
+    return len(links)
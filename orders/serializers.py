@@ -3,15 +3,14 @@
 from rest_framework import serializers
 from .models import ShopOrder, OrderLine, OrderStatus
 from finance.models import Transaction
+from .queries import order_lines_queryset
 
 class OrderLineSerializer(serializers.ModelSerializer):
     """
     عرض تفاصيل المنتجات المشتراة داخل كل طلب.
+
+    Product, SKU and seller come from the line's checkout snapshot (no joins).
     """
-    # جلب اسم المنتج من موديل المنتج الأصلي المرتبط بالـ Item
-    product_name = serializers.ReadOnlyField(source='product_item.product.name')
-    # جلب الـ SKU (رمز التخزين) لتمييز القطعة
-    sku = serializers.ReadOnlyField(source='product_item.sku')
 
     line_status_display = serializers.ReadOnlyField(source='line_status.status')
     line_status_id = serializers.ReadOnlyField(source='line_status.id')
@@ -32,28 +31,13 @@ class OrderLineSerializer(serializers.ModelSerializer):
             return False
         if getattr(user, 'user_type', None) != 'seller':
             return False
-        try:
-            return getattr(getattr(obj.product_item, 'product', None), 'seller_id', None) == user.id
-        except Exception:
-            return False
+        return obj.seller_id == user.id
 
     def get_seller_name(self, obj):
-        try:
-            seller = getattr(getattr(getattr(obj, 'product_item', None), 'product', None), 'seller', None)
-            if not seller:
-                return None
-            profile = getattr(seller, 'seller_profile', None)
-            store_name = getattr(profile, 'store_name', None)
-            return store_name or getattr(seller, 'username', None) or None
-        except Exception:
-            return None
+        return obj.store_name or obj.seller_username or None
 
     def get_seller_username(self, obj):
-        try:
-            seller = getattr(getattr(getattr(obj, 'product_item', None), 'product', None), 'seller', None)
-            return getattr(seller, 'username', None) or None
-        except Exception:
-            return None
+        return obj.seller_username or None
 
 
 class ShopOrderSerializer(serializers.ModelSerializer):
@@ -109,51 +93,56 @@ class ShopOrderSerializer(serializers.ModelSerializer):
             'order_status', # for update
         ]
     def _lines_list(self, obj):
+        # Archived orders keep their lines in ArchivedOrderLine (same fields).
+        archived = getattr(obj, 'archived_at', None) is not None
+        relation = 'archived_lines' if archived else 'lines'
         try:
             # Prefer prefetched lines.
-            if hasattr(obj, '_prefetched_objects_cache') and 'lines' in obj._prefetched_objects_cache:
-                return list(obj.lines.all())
+            if hasattr(obj, '_prefetched_objects_cache') and relation in obj._prefetched_objects_cache:
+                return list(getattr(obj, relation).all())
         except Exception:
             pass
 
         try:
-            return list(obj.lines.select_related('product_item__product__seller', 'line_status').all())
+            return list(order_lines_queryset(archived).filter(order=obj))
         except Exception:
             return []
 
-    def _seller_owned_counts(self, obj, seller_id: int):
-        lines = self._lines_list(obj)
-        own = 0
-        other = 0
-        for ln in lines:
-            try:
-                sid = getattr(getattr(getattr(ln, 'product_item', None), 'product', None), 'seller_id', None)
-            except Exception:
-                sid = None
-            if sid == seller_id:
-                own += 1
-            else:
-                other += 1
-        return own, other, len(lines)
-
-    def get_lines(self, obj):
+    def _request_seller_id(self):
         request = self.context.get('request') if hasattr(self, 'context') else None
         user = getattr(request, 'user', None)
-        lines = self._lines_list(obj)
-
-        # Customers (and non-seller users) see full order lines.
         if not user or not getattr(user, 'is_authenticated', False) or getattr(user, 'user_type', None) != 'seller':
-            return OrderLineSerializer(lines, many=True, context=self.context).data
+            return None
+        return getattr(user, 'id', None)
 
-        seller_id = getattr(user, 'id', None)
-        if not seller_id:
-            return []
+    def _order_stats(self, obj):
+        """Walk the order's lines once and cache the result per order.
+
+        Returns ``(own, other, total, visible_lines)``. For sellers ``own`` /
+        ``other`` count their lines vs other sellers' and ``visible_lines``
+        holds only their own lines (privacy); for everyone else all lines are
+        visible and ``own``/``other`` are 0.
+        """
+
+        cache = self.__dict__.setdefault('_order_stats_cache', {})
+        stats = cache.get(obj.pk)
+        if stats is not None:
+            return stats
+
+        lines = self._lines_list(obj)
+        seller_id = self._request_seller_id()
+        own = other = 0
+        visible = lines
+        if seller_id is not None:
+            visible = [ln for ln in lines if ln.seller_id == seller_id]
+            own = len(visible)
+            other = len(lines) - own
 
-        own, other, _total = self._seller_owned_counts(obj, int(seller_id))
-        if other > 0:
-            # Privacy: hide other sellers' lines.
-            lines = [ln for ln in lines if getattr(getattr(getattr(ln, 'product_item', None), 'product', None), 'seller_id', None) == seller_id]
+        stats = cache[obj.pk] = (own, other, len(lines), visible)
+        return stats
 
+    def get_lines(self, obj):
+        _own, _other, _total, lines = self._order_stats(obj)
         return OrderLineSerializer(lines, many=True, context=self.context).data
 
 
@@ -183,24 +172,8 @@ class ShopOrderSerializer(serializers.ModelSerializer):
             return None
 
     def get_shipping_address_details(self, obj):
-        addr = getattr(obj, 'shipping_address', None)
-        if not addr:
-            return None
-        try:
-            country_name = getattr(getattr(addr, 'country', None), 'country_name', None)
-            return {
-                'id': getattr(addr, 'id', None),
-                'unit_number': getattr(addr, 'unit_number', None),
-                'street_number': getattr(addr, 'street_number', None),
-                'address_line1': getattr(addr, 'address_line1', None),
-                'address_line2': getattr(addr, 'address_line2', None),
-                'city': getattr(addr, 'city', None),
-                'region': getattr(addr, 'region', None),
-                'postal_code': getattr(addr, 'postal_code', None),
-                'country_name': country_name,
-            }
-        except Exception:
-            return None
+        # Checkout snapshot; the live Address row may have been edited or deleted since.
+        return obj.shipping_address_snapshot or None
 
     def get_can_update_status(self, obj):
         """Seller UX helper.
@@ -208,48 +181,70 @@ class ShopOrderSerializer(serializers.ModelSerializer):
         Sellers can update overall order status only when the whole order
         belongs to their store (all lines are their products).
         """
-        request = self.context.get('request') if hasattr(self, 'context') else None
-        user = getattr(request, 'user', None)
-        if not user or not getattr(user, 'is_authenticated', False):
-            return False
-        if getattr(user, 'user_type', None) != 'seller':
-            return False
-
-        try:
-            seller_id = int(getattr(user, 'id', 0) or 0)
-            own, other, _total = self._seller_owned_counts(obj, seller_id)
-            if own < 1:
-                return False
-            return other == 0
-        except Exception:
+        if self._request_seller_id() is None:
             return False
+        own, other, _total, _lines = self._order_stats(obj)
+        return own >= 1 and other == 0
 
     def get_is_multi_vendor(self, obj):
-        request = self.context.get('request') if hasattr(self, 'context') else None
-        user = getattr(request, 'user', None)
-        if not user or not getattr(user, 'is_authenticated', False) or getattr(user, 'user_type', None) != 'seller':
-            return False
-        try:
-            seller_id = int(getattr(user, 'id', 0) or 0)
-            own, other, _total = self._seller_owned_counts(obj, seller_id)
-            return own >= 1 and other > 0
-        except Exception:
+        if self._request_seller_id() is None:
             return False
+        own, other, _total, _lines = self._order_stats(obj)
+        return own >= 1 and other > 0
 
     def get_other_sellers_lines_count(self, obj):
-        request = self.context.get('request') if hasattr(self, 'context') else None
-        user = getattr(request, 'user', None)
-        if not user or not getattr(user, 'is_authenticated', False) or getattr(user, 'user_type', None) != 'seller':
-            return 0
-        try:
-            seller_id = int(getattr(user, 'id', 0) or 0)
-            _own, other, _total = self._seller_owned_counts(obj, seller_id)
-            return int(other)
-        except Exception:
+        if self._request_seller_id() is None:
             return 0
+        _own, other, _total, _lines = self._order_stats(obj)
+        return int(other)
 
     def get_total_lines_count(self, obj):
-        try:
-            return int(len(self._lines_list(obj)))
-        except Exception:
-            return 0
\ No newline at end of file
+        _own, _other, total, _lines = self._order_stats(obj)
+        return int(total)
+
+
+
+_SUMMARY_DATETIME = serializers.DateTimeField()
+_SUMMARY_MONEY = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def order_summary_rows(rows, *, seller_id=None) -> list[dict]:
+    """Shape ``orders.queries.summary_values`` rows for the API.
+
+    Formats values the same way ShopOrderSerializer does, without
+    instantiating a serializer per order. For sellers, ``line_count`` is
+    their own lines and the multi-vendor flags come from the seller link.
+    """
+
+    out = []
+    for row in rows:
+        counts = row.get('line_status_counts') or {}
+        total = int(sum(int(v or 0) for v in counts.values()))
+        item = {
+            'id': row['id'],
+            'order_date': _SUMMARY_DATETIME.to_representation(row['order_date']) if row['order_date'] else None,
+            'order_total': _SUMMARY_MONEY.to_representation(row['order_total']),
+            'status_display': row['status_display'],
+            'order_status_id': row['order_status_id'],
+            'status_key': row['status_key'] or None,
+            'payment_status': row['payment_status'] or 'Pending',
+            'customer_username': row['customer_username'],
+            'shipping_carrier': row['shipping_carrier'],
+            'tracking_number': row['tracking_number'],
+            'shipped_at': _SUMMARY_DATETIME.to_representation(row['shipped_at']) if row['shipped_at'] else None,
+            'delivered_at': _SUMMARY_DATETIME.to_representation(row['delivered_at']) if row['delivered_at'] else None,
+            'total_lines_count': total,
+            'line_count': total,
+            'seller_count': int(row['seller_count'] or 0),
+        }
+        if seller_id is not None:
+            own = int(row.get('seller_line_count') or 0)
+            other = max(0, total - own)
+            item.update({
+                'line_count': own,
+                'other_sellers_lines_count': other,
+                'can_update_status': own >= 1 and other == 0,
+                'is_multi_vendor': own >= 1 and other > 0,
+            })
+        out.append(item)
+    return out
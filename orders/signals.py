@@ -1,67 +1,72 @@
-"""Signals for order side-effects (e.g., transaction creation)."""
+"""Signals for order side-effects (e.g., transaction creation via the outbox)."""
 
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import ShopOrder
-from finance.models import Transaction, PaymentStatus
+from finance.models import Transaction
+from finance import statuses as payment_keys
+from finance.statuses import payment_statuses
+from . import outbox
+from . import statuses as order_keys
+from .statuses import order_statuses
 
 
-def _desired_payment_status_name_for_order(order: ShopOrder) -> str:
-    """Derive payment status from order status.
+# Order status key -> payment status key; anything else maps to Pending.
+_PAYMENT_KEY_BY_ORDER_KEY = {
+    order_keys.DELIVERED: payment_keys.SUCCESS,
+    order_keys.COMPLETED: payment_keys.SUCCESS,
+    order_keys.CANCELLED: payment_keys.CANCELLED,
+    order_keys.RETURNED: payment_keys.REFUNDED,
+    order_keys.REFUNDED: payment_keys.REFUNDED,
+}
+
+
+def _desired_payment_status_key_for_order(order: ShopOrder) -> str:
+    """Derive the payment status key from the order status key.
 
     This project uses server-rendered order pages and seller dashboards that
     display payment state. To avoid the UI guessing, we keep a Transaction row
     synced to the order lifecycle.
 
-    Status mapping rules (case-insensitive, supports Arabic keywords):
+    Status mapping rules:
     - Delivered / Completed -> Success
-    - Cancelled/Canceled -> Cancelled
-    - Returned/Refunded -> Refunded
+    - Cancelled -> Cancelled
+    - Returned / Refunded -> Refunded
     - Otherwise -> Pending
     """
 
-    label = str(getattr(getattr(order, 'order_status', None), 'status', '') or '').strip().lower()
-    if not label:
-        return 'Pending'
+    order_key = order_statuses.key_for_id(getattr(order, 'order_status_id', None))
+    return _PAYMENT_KEY_BY_ORDER_KEY.get(order_key, payment_keys.PENDING)
 
-    cancelled_markers = {'cancelled', 'canceled', 'cancel', 'ملغي', 'ملغى', 'إلغاء', 'الغاء'}
-    refunded_markers = {'refunded', 'refund', 'returned', 'return', 'مرتجع', 'مرتجعات', 'استرجاع', 'ارجاع', 'إرجاع'}
-    success_markers = {'delivered', 'deliver', 'completed', 'complete', 'success', 'تم التسليم', 'تم التوصيل'}
+@receiver(post_save, sender=ShopOrder)
+def enqueue_order_payment_sync(sender, instance, created, **kwargs):
+    """Queue the order's Transaction create/sync in the order's transaction.
 
-    if any(m in label for m in cancelled_markers):
-        return 'Cancelled'
-    if any(m in label for m in refunded_markers):
-        return 'Refunded'
-    if any(m in label for m in success_markers):
-        return 'Success'
-    return 'Pending'
+    Runs for new orders and when ``order_status_id`` changed since the order
+    was loaded; saves that touch other fields cost no extra queries.
+    """
 
-@receiver(post_save, sender=ShopOrder)
-def create_order_transaction(sender, instance, created, **kwargs):
-    """Create a finance transaction for newly created orders."""
-    if created:
-        desired = _desired_payment_status_name_for_order(instance)
-        status, _ = PaymentStatus.objects.get_or_create(status=desired)
-        
-        # إنشاء المعاملة المالية أوتوماتيكياً
-        Transaction.objects.create(
-            order=instance,
-            amount=instance.order_total,
-            payment_status=status
-        )
+    if created or instance.has_changed('order_status_id'):
+        outbox.enqueue(outbox.PAYMENT_SYNC, {'order_id': instance.id})
 
 
-@receiver(post_save, sender=ShopOrder)
-def sync_order_transaction_payment_status(sender, instance, created, **kwargs):
-    """Keep Transaction.payment_status synced to the order lifecycle."""
+@outbox.handler(outbox.PAYMENT_SYNC)
+def sync_order_payment(payload: dict) -> None:
+    """Create the order's Transaction or move it to the status its order implies.
 
-    desired = _desired_payment_status_name_for_order(instance)
-    desired_status, _ = PaymentStatus.objects.get_or_create(status=desired)
+    Reads the order as it is now, so replays and out-of-order messages converge.
+    """
 
-    tx = Transaction.objects.filter(order=instance).select_related('payment_status').first()
-    if not tx:
+    order = ShopOrder.objects.filter(id=payload['order_id']).first()
+    if order is None:
         return
+    status = payment_statuses.get(_desired_payment_status_key_for_order(order))
 
-    if tx.payment_status_id != desired_status.id:
-        tx.payment_status = desired_status
-        tx.save(update_fields=['payment_status'])
\ No newline at end of file
+    # إنشاء المعاملة المالية أوتوماتيكياً
+    tx, created = Transaction.objects.get_or_create(
+        order=order,
+        defaults={'amount': order.order_total, 'payment_status': status},
+    )
+    if not created and tx.payment_status_id != status.id:
+        tx.payment_status = status
+        tx.save(update_fields=['payment_status'])
@@ -0,0 +1,381 @@
+"""Canonical status keys and a process-local status registry.
+
+``OrderStatus.status`` is a free-form, admin-editable label (English or
+Arabic). Business rules (transitions, aggregation, payment sync) work on a
+small set of canonical keys stored in ``OrderStatus.key``. The label -> key
+normalization below only runs when a status row is saved or backfilled,
+never on the request path.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+logger = logging.getLogger(__name__)
+
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+SHIPPED = 'shipped'
+DELIVERED = 'delivered'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+RETURNED = 'returned'
+REFUNDED = 'refunded'
+
+# Label used when a status row has to be created for a key.
+ORDER_STATUS_LABELS: dict[str, str] = {
+    PENDING: 'Pending',
+    PROCESSING: 'Processing',
+    SHIPPED: 'Shipped',
+    DELIVERED: 'Delivered',
+    COMPLETED: 'Completed',
+    CANCELLED: 'Cancelled',
+    RETURNED: 'Returned',
+    REFUNDED: 'Refunded',
+}
+
+ORDER_STATUS_KEY_CHOICES = [(k, v) for k, v in ORDER_STATUS_LABELS.items()]
+
+
+def normalize_order_status_key(label: str) -> str | None:
+    """Normalize an OrderStatus label into a canonical key.
+
+    Returns None when the label is unknown; we only enforce transitions
+    when both current and target statuses are recognized.
+    """
+
+    s = str(label or '').strip().lower()
+    if not s:
+        return None
+
+    # Arabic + English markers
+    pending = {'pending', 'new', 'placed', 'قيد', 'انتظار', 'قيد الانتظار', 'جديد'}
+    processing = {'processing', 'preparing', 'confirmed', 'تجهيز', 'قيد التجهيز', 'تم التأكيد', 'مؤكد'}
+    shipped = {'shipped', 'shipping', 'in transit', 'تم الشحن', 'تم ارسال', 'تم الإرسال', 'قيد الشحن'}
+    delivered = {'delivered', 'تم التسليم', 'تم التوصيل'}
+    completed = {'completed', 'complete', 'done', 'مكتمل', 'تم'}
+    cancelled = {'cancelled', 'canceled', 'cancel', 'ملغي', 'ملغى', 'إلغاء', 'الغاء'}
+    refunded = {'refunded', 'refund', 'تم الاسترجاع', 'استرجاع'}
+    returned = {'returned', 'return', 'مرتجع', 'ارجاع', 'إرجاع'}
+
+    if any(m in s for m in cancelled):
+        return CANCELLED
+    if any(m in s for m in refunded):
+        return REFUNDED
+    if any(m in s for m in returned):
+        return RETURNED
+    if any(m in s for m in delivered):
+        return DELIVERED
+    if any(m in s for m in shipped):
+        return SHIPPED
+    if any(m in s for m in processing):
+        return PROCESSING
+    if any(m in s for m in pending):
+        return PENDING
+    if any(m in s for m in completed):
+        return COMPLETED
+    return None
+
+
+# Allowed lifecycle transitions between canonical keys.
+ALLOWED_TRANSITIONS: dict[str, set[str]] = {
+    PENDING: {PROCESSING, SHIPPED, CANCELLED},
+    PROCESSING: {SHIPPED, CANCELLED},
+    SHIPPED: {DELIVERED, RETURNED},
+    DELIVERED: {COMPLETED, RETURNED, REFUNDED},
+    COMPLETED: {RETURNED, REFUNDED},
+    CANCELLED: set(),
+    RETURNED: set(),
+    REFUNDED: set(),
+}
+
+
+def transition_allowed(cur: str | None, nxt: str | None) -> bool:
+    """Check a lifecycle transition between two canonical status keys.
+
+    Transitions are only enforced when both keys are recognized.
+    """
+    if cur is None or nxt is None:
+        return True
+    if cur == nxt:
+        return True
+    return nxt in ALLOWED_TRANSITIONS.get(cur, set())
+
+
+def restores_stock(prev_key: str | None, next_key: str | None, *, shipped: bool) -> bool:
+    """Whether moving goods from ``prev_key`` to ``next_key`` puts them back in stock.
+
+    - Cancelled before anything shipped: restore.
+    - Returned after shipping: restore.
+    """
+    if next_key == CANCELLED:
+        return prev_key in {PENDING, PROCESSING} and not shipped
+    if next_key == RETURNED:
+        return prev_key in {SHIPPED, DELIVERED, COMPLETED}
+    return False
+
+
+class StatusRegistry:
+    """Process-local cache of a status lookup table.
+
+    Maps ``id -> (label, key)`` and ``key -> id`` for a model with ``status``
+    and ``key`` columns. The table is loaded with a single query on first use,
+    so lookups on the request path cost no queries. It is reloaded:
+
+    - when a row is saved or deleted in this process;
+    - when another process (worker, Celery) changed a row: every save bumps a
+      shared version in the Django cache after commit, which each process
+      checks at most every ``STATUS_REGISTRY_CHECK_SECONDS``;
+    - after ``STATUS_REGISTRY_TTL`` seconds regardless.
+
+    Rows created by ``get`` inside a transaction are not cached until it
+    commits, and unknown ids trigger at most one reload per second.
+    """
+
+    UNKNOWN_RELOAD_SECONDS = 1.0
+
+    def __init__(self, model_label: str, default_labels: dict[str, str]):
+        self.model_label = model_label
+        self.default_labels = default_labels
+        self._lock = threading.Lock()
+        self._rows: dict[int, tuple[str, str | None]] | None = None
+        self._by_key: dict[str, int] | None = None
+        self._version = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        # Outermost atomic block of a transaction that created a row (per thread).
+        self._local = threading.local()
+
+        for signal in (post_save, post_delete):
+            signal.connect(
+                self._on_change,
+                sender=model_label,
+                weak=False,
+                dispatch_uid=f'status_registry:{model_label}',
+            )
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def _version_key(self) -> str:
+        return f'status_registry:{self.model_label}:version'
+
+    def invalidate(self) -> None:
+        """Drop the cached table; the next lookup reloads it."""
+        self._local.block = None
+        self._drop()
+
+    def _drop(self) -> None:
+        with self._lock:
+            self._rows = None
+            self._by_key = None
+
+    def _bump_version(self) -> None:
+        try:
+            cache.incr(self._version_key)
+        except ValueError:
+            cache.set(self._version_key, time.time_ns(), None)
+        except Exception:
+            # The TTL still bounds how stale other processes get.
+            logger.exception('Could not bump the %s registry version', self.model_label)
+
+    def _shared_version(self):
+        try:
+            return cache.get(self._version_key)
+        except Exception:
+            logger.exception('Could not read the %s registry version', self.model_label)
+            return self._version
+
+    def _on_change(self, sender, **kwargs):
+        self._drop()
+        transaction.on_commit(self._bump_version)
+
+    def _uncommitted(self) -> bool:
+        """Whether this thread is inside a transaction that created a row via ``get``."""
+        block = getattr(self._local, 'block', None)
+        if block is None:
+            return False
+        if block in transaction.get_connection().atomic_blocks:
+            return True
+        # Committed or rolled back: reload from what is really there.
+        self.invalidate()
+        return False
+
+    def _fresh(self) -> bool:
+        now = time.monotonic()
+        if now - self._loaded_at > int(getattr(settings, 'STATUS_REGISTRY_TTL', 300)):
+            return False
+        if now - self._checked_at < int(getattr(settings, 'STATUS_REGISTRY_CHECK_SECONDS', 5)):
+            return True
+        self._checked_at = now
+        return self._shared_version() == self._version
+
+    def _query(self):
+        rows: dict[int, tuple[str, str | None]] = {}
+        by_key: dict[str, int] = {}
+        for pk, label, key in self.model.objects.order_by('id').values_list('id', 'status', 'key'):
+            rows[pk] = (label, key or None)
+            # Several labels may share a key (e.g. English + Arabic); prefer the
+            # default label, otherwise the oldest row.
+            if key and (key not in by_key or label == self.default_labels.get(key)):
+                by_key[key] = pk
+        return rows, by_key
+
+    def _load(self):
+        if self._uncommitted():
+            # May include rows that roll back: never cache them.
+            return self._query()
+        with self._lock:
+            if self._rows is not None and self._fresh():
+                return self._rows, self._by_key
+
+        version = self._shared_version()
+        rows, by_key = self._query()
+        with self._lock:
+            self._rows, self._by_key = rows, by_key
+            self._version = version
+            self._loaded_at = self._checked_at = time.monotonic()
+        return rows, by_key
+
+    def _row(self, pk):
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return None, None
+        rows, _ = self._load()
+        if pk not in rows and time.monotonic() - self._loaded_at > self.UNKNOWN_RELOAD_SECONDS:
+            # Possibly created by another process since we loaded.
+            self._drop()
+            rows, _ = self._load()
+        return pk, rows.get(pk)
+
+    def _instance(self, pk, label, key):
+        obj = self.model(id=pk, status=label, key=key or '')
+        obj._state.adding = False
+        return obj
+
+    def key_for_id(self, pk) -> str | None:
+        """Return the canonical key for a status id (None if unknown)."""
+        if pk is None:
+            return None
+        _pk, row = self._row(pk)
+        return row[1] if row else None
+
+    def by_id(self, pk):
+        """Return the status instance for ``pk`` (None if unknown)."""
+        if pk is None:
+            return None
+        pk, row = self._row(pk)
+        if row is None:
+            return None
+        return self._instance(pk, *row)
+
+    def get(self, key: str):
+        """Return the status instance for ``key``, creating the default row if missing."""
+        rows, by_key = self._load()
+        pk = by_key.get(key)
+        if pk is not None:
+            return self._instance(pk, *rows[pk])
+
+        obj, created = self.model.objects.get_or_create(
+            status=self.default_labels[key],
+            defaults={'key': key},
+        )
+        blocks = transaction.get_connection().atomic_blocks
+        if created and blocks and getattr(self._local, 'block', None) is None:
+            self._local.block = blocks[0]
+        return obj
+
+
+order_statuses = StatusRegistry('orders.OrderStatus', ORDER_STATUS_LABELS)
+
+
+# --- Per-order line status histogram ---------------------------------------
+#
+# ShopOrder.line_status_counts stores ``{status_key: line_count}``. Lines with
+# no (or an unrecognized) status count as pending, matching aggregation.
+
+def shift_status_count(counts: dict | None, prev_key: str | None, next_key: str | None, n: int = 1) -> dict:
+    """Return a copy of ``counts`` with ``n`` lines moved from ``prev_key`` to ``next_key``."""
+    out = {k: int(v) for k, v in (counts or {}).items() if int(v or 0) > 0}
+    prev_key = prev_key or PENDING
+    next_key = next_key or PENDING
+    if prev_key == next_key:
+        return out
+    remaining = out.get(prev_key, 0) - n
+    if remaining > 0:
+        out[prev_key] = remaining
+    else:
+        out.pop(prev_key, None)
+    out[next_key] = out.get(next_key, 0) + n
+    return out
+
+
+def aggregate_status_key(counts: dict | None) -> str | None:
+    """Derive the overall order status key from a line status histogram.
+
+    Priority (predictable + supports partial states):
+    1) All-cancelled => Cancelled
+    2) Any-refunded => Refunded
+    3) Any-returned => Returned
+    4) All-delivered/completed => Delivered
+    5) Any-shipped/delivered => Shipped (covers partial-delivered)
+    6) Any-processing => Processing
+    7) Otherwise => Pending
+
+    Returns None for an order without lines.
+    """
+
+    counts = counts or {}
+    total = sum(int(v or 0) for v in counts.values())
+    if total <= 0:
+        return None
+
+    def n(*keys):
+        return sum(int(counts.get(k) or 0) for k in keys)
+
+    if n(CANCELLED) == total:
+        return CANCELLED
+    if n(REFUNDED):
+        return REFUNDED
+    if n(RETURNED):
+        return RETURNED
+    if n(DELIVERED, COMPLETED) == total:
+        return DELIVERED
+    if n(SHIPPED, DELIVERED, COMPLETED):
+        return SHIPPED
+    if n(PROCESSING):
+        return PROCESSING
+    return PENDING
+
+
+def count_line_statuses(order_ids) -> dict[int, dict[str, int]]:
+    """Rebuild line status histograms for ``order_ids`` with one grouped query."""
+    from django.db.models import Count
+
+    from .models import OrderLine
+
+    out: dict[int, dict[str, int]] = {int(oid): {} for oid in order_ids}
+    rows = (
+        OrderLine.objects.filter(order_id__in=list(out))
+        .values_list('order_id', 'line_status_id')
+        .annotate(n=Count('id'))
+        .order_by()
+    )
+    for order_id, status_id, n in rows:
+        key = order_statuses.key_for_id(status_id) or PENDING
+        bucket = out[order_id]
+        bucket[key] = bucket.get(key, 0) + int(n)
+    return out
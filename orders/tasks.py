@@ -0,0 +1,71 @@
+"""Celery tasks for orders."""
+
+from __future__ import annotations
+
+import datetime as dt
+import tempfile
+
+from celery import shared_task
+from django.core.files import File
+from django.utils import timezone
+
+from .exports import export_filename, export_lines_queryset, iter_export
+from .models import OrderExport
+from .queries import OrderFilters
+
+
+def export_filters(params: dict) -> OrderFilters:
+    """Rebuild OrderFilters from ``OrderExport.params``."""
+
+    def day(value):
+        return dt.date.fromisoformat(value) if value else None
+
+    return OrderFilters(
+        status_id=params.get('status_id'),
+        date_from=day(params.get('date_from')),
+        date_to=day(params.get('date_to')),
+    )
+
+
+@shared_task
+def build_order_export(export_id: int) -> None:
+    """Write an OrderExport to storage (MEDIA_ROOT) without holding it in memory.
+
+    Rows are streamed into a temporary file, which the storage backend then
+    copies in chunks.
+    """
+
+    export = OrderExport.objects.filter(id=export_id, status=OrderExport.PENDING).first()
+    if export is None:
+        return
+    OrderExport.objects.filter(id=export.id).update(status=OrderExport.RUNNING)
+
+    try:
+        qs = export_lines_queryset(export.seller, export_filters(export.params))
+        rows = 0
+        with tempfile.TemporaryFile(mode='w+b') as fh:
+            for chunk in iter_export(qs, export.file_format):
+                fh.write(chunk.encode('utf-8'))
+                rows += 1
+            fh.seek(0)
+            export.file.save(f'{export.id}-{export_filename(export.file_format, export.created_at)}', File(fh), save=False)
+    except Exception as exc:
+        export.status = OrderExport.FAILED
+        export.error = str(exc)[:2000]
+        export.finished_at = timezone.now()
+        export.save(update_fields=['status', 'error', 'finished_at'])
+        raise
+
+    export.status = OrderExport.DONE
+    # CSV has a header line; NDJSON does not.
+    export.row_count = rows - 1 if export.file_format == 'csv' else rows
+    export.finished_at = timezone.now()
+    export.save(update_fields=['file', 'status', 'row_count', 'finished_at'])
+
+
+@shared_task(ignore_result=True)
+def process_outbox() -> int:
+    """Drain due outbox messages (queued after commits and run by beat)."""
+    from .outbox import drain_outbox
+
+    return drain_outbox()
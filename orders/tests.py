@@ -1,20 +1,43 @@
 """Orders app tests."""
 
-from datetime import date
+import asyncio
+import csv
+import json
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import product
 
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.test import APIClient
 
-from accounts.models import Country, Address, UserAddress, PaymentType, UserPaymentMethod
+from accounts.models import Country, Address, UserAddress, PaymentType, UserPaymentMethod, SellerProfile
 from cart.models import ShoppingCart, ShoppingCartItem
-from orders.models import OrderStatus, ShopOrder
+from finance.models import PaymentStatus
+from finance.statuses import payment_statuses
+from orders.models import OrderSeller, OrderStatus, OutboxMessage, ShopOrder
+from orders.outbox import drain_outbox, enqueue
+from orders.queries import OrderFilters, customer_orders_queryset, local_date_range, order_lines_queryset, with_read_relations
+from orders.realtime import order_event_stream, reset_layer
+from orders.sellers import seller_orders_queryset
+from orders.statuses import aggregate_status_key, order_statuses, shift_status_count
 from products.models import ProductCategory, Product, ProductItem
 
 
-@override_settings(ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'])
-class OrderCheckoutSmokeTests(TestCase):
-	"""Checkout smoke test covering minimal COD checkout prerequisites."""
+class CheckoutFixtureMixin:
+	"""A customer with a COD payment method, a seller and one SKU in stock.
+
+	Shared by the app tests that need placed orders (orders, invoices,
+	finance, products).
+	"""
 
 	@classmethod
 	def setUpTestData(cls):
@@ -74,6 +97,25 @@ class OrderCheckoutSmokeTests(TestCase):
 			price='10.00',
 		)
 
+	def setUp(self):
+		# Registries are process-local; TestCase rollbacks do not fire signals.
+		order_statuses.invalidate()
+		payment_statuses.invalidate()
+
+	def _place_order(self, client):
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=self.item, defaults={'qty': 1})
+		res = client.post('/api/orders/', data={}, format='json')
+		self.assertEqual(res.status_code, 201)
+		# Run the queued side effects (Transaction) like the worker would.
+		drain_outbox()
+		return res.data['id']
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'])
+class OrderCheckoutSmokeTests(CheckoutFixtureMixin, TestCase):
+	"""Checkout smoke test covering minimal COD checkout prerequisites."""
+
 	def test_create_order_cod_returns_201_and_clears_cart(self):
 		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
 		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=self.item, defaults={'qty': 2})
@@ -146,6 +188,37 @@ class OrderCheckoutSmokeTests(TestCase):
 		self.item.refresh_from_db()
 		self.assertEqual(self.item.qty_in_stock, 100)
 
+	def test_cancel_order_skips_lines_already_restocked(self):
+		item2 = ProductItem.objects.create(product=self.product, sku='TEST-SKU-RESTOCK', qty_in_stock=10, price='5.00')
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=self.item, defaults={'qty': 3})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=item2, defaults={'qty': 2})
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		res = client.post('/api/orders/', data={}, format='json')
+		self.assertEqual(res.status_code, 201)
+		order = ShopOrder.objects.get(id=res.data.get('id'))
+
+		cancelled, _ = OrderStatus.objects.get_or_create(status='Cancelled')
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		res = seller_client.patch(
+			f'/api/orders/{order.id}/set-line-status/',
+			data={'line_id': order.lines.get(product_item=item2).id, 'line_status': cancelled.id},
+			format='json',
+		)
+		self.assertEqual(res.status_code, 200)
+		item2.refresh_from_db()
+		self.assertEqual(item2.qty_in_stock, 10)
+
+		res = seller_client.patch(f'/api/orders/{order.id}/set-status/', data={'order_status': cancelled.id}, format='json')
+		self.assertEqual(res.status_code, 200)
+		self.item.refresh_from_db()
+		item2.refresh_from_db()
+		self.assertEqual(self.item.qty_in_stock, 100)
+		self.assertEqual(item2.qty_in_stock, 10)
+
 	def test_multi_vendor_order_status_update_is_forbidden(self):
 		User = get_user_model()
 		other_seller = User.objects.create_user(
@@ -427,3 +500,698 @@ class OrderCheckoutSmokeTests(TestCase):
 		order.refresh_from_db()
 		# Other line still pending => overall should be Shipped (partial delivered)
 		self.assertEqual(order.order_status.status, 'Shipped')
+
+	def test_line_status_counts_follow_line_updates_and_can_be_rebuilt(self):
+		processing, _ = OrderStatus.objects.get_or_create(status='Processing')
+
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=self.item, defaults={'qty': 1})
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		res = client.post('/api/orders/', data={}, format='json')
+		self.assertEqual(res.status_code, 201)
+		order = ShopOrder.objects.get(id=res.data.get('id'))
+		self.assertEqual(order.line_status_counts, {'pending': 1})
+
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		line = order.lines.get()
+		res2 = seller_client.patch(
+			f'/api/orders/{order.id}/set-line-status/',
+			data={'line_id': line.id, 'line_status': processing.id},
+			format='json',
+		)
+		self.assertEqual(res2.status_code, 200)
+		order.refresh_from_db()
+		self.assertEqual(order.line_status_counts, {'processing': 1})
+
+		# Corrupt the counters, then let the checker rebuild them.
+		ShopOrder.objects.filter(id=order.id).update(line_status_counts={'cancelled': 5})
+		out = StringIO()
+		call_command('rebuild_order_status_counts', stdout=out)
+		self.assertIn('1 rebuilt', out.getvalue())
+		order.refresh_from_db()
+		self.assertEqual(order.line_status_counts, {'processing': 1})
+
+	def test_checkout_writes_order_seller_links(self):
+		User = get_user_model()
+		other_seller = User.objects.create_user(
+			username='test_seller_7',
+			email='test_seller7@example.com',
+			password='12345678',
+			user_type='seller',
+		)
+		product2 = Product.objects.create(
+			seller=other_seller,
+			category=self.category,
+			name='OtherProduct6',
+			description='Test',
+		)
+		item2 = ProductItem.objects.create(
+			product=product2,
+			sku='TEST-SKU-7',
+			qty_in_stock=50,
+			price='5.00',
+		)
+
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=self.item, defaults={'qty': 3})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=item2, defaults={'qty': 1})
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		res = client.post('/api/orders/', data={}, format='json')
+		self.assertEqual(res.status_code, 201)
+		order = ShopOrder.objects.get(id=res.data.get('id'))
+
+		links = {l.seller_id: l for l in OrderSeller.objects.filter(order=order)}
+		self.assertEqual(set(links), {self.seller.id, other_seller.id})
+		self.assertEqual(links[self.seller.id].line_count, 1)
+		self.assertEqual(links[self.seller.id].seller_subtotal, Decimal('30.00'))
+		self.assertEqual(links[self.seller.id].order_date, order.order_date)
+
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=other_seller)
+		res2 = seller_client.get('/api/orders/seller-orders/', format='json')
+		self.assertEqual(res2.status_code, 200)
+		results = res2.data.get('results')
+		self.assertEqual([o['id'] for o in results], [order.id])
+		self.assertTrue(results[0]['is_multi_vendor'])
+		self.assertEqual(results[0]['other_sellers_lines_count'], 1)
+		self.assertEqual(results[0]['total_lines_count'], 2)
+
+	def test_order_lines_keep_checkout_snapshot(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_id = self._place_order(client)
+		line = ShopOrder.objects.get(id=order_id).lines.get()
+		self.assertEqual((line.sku, line.seller_id), ('TEST-SKU-1', self.seller.id))
+
+		# Renaming or deleting the product does not change order history.
+		product = self.item.product
+		original_name = product.name
+		product.name = 'Renamed'
+		product.save(update_fields=['name'])
+		self.item.delete()
+		self.assertNotIn('products_', str(order_lines_queryset().query))
+
+		res = client.get(f'/api/orders/{order_id}/')
+		self.assertEqual(res.status_code, 200)
+		(row,) = res.data['lines']
+		self.assertEqual((row['product_name'], row['sku'], row['seller_username']), (original_name, 'TEST-SKU-1', self.seller.username))
+
+	def test_order_keeps_shipping_address_snapshot(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_id = self._place_order(client)
+
+		Address.objects.filter(id=self.address.id).update(city='Giza', address_line1='Moved')
+		res = client.get(f'/api/orders/{order_id}/')
+		details = res.data['shipping_address_details']
+		self.assertEqual((details['city'], details['address_line1'], details['country_name']), ('Cairo', 'Test Street', 'Egypt'))
+
+		Address.objects.filter(id=self.address.id).delete()
+		res = client.get('/api/orders/my-orders/')
+		self.assertEqual(res.data['results'][0]['shipping_address_details']['city'], 'Cairo')
+
+	def test_order_save_skips_payment_sync_unless_status_changed(self):
+		from finance.models import Transaction
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_id = self._place_order(client)
+
+		order = ShopOrder.objects.get(id=order_id)
+		self.assertFalse(order.has_changed('order_status_id'))
+		order.tracking_number = 'TRK-1'
+		with self.assertNumQueries(1):
+			order.save(update_fields=['tracking_number'])
+
+		order.order_status = order_statuses.get('cancelled')
+		self.assertTrue(order.has_changed('order_status_id'))
+		order.save(update_fields=['order_status'])
+		self.assertFalse(order.has_changed('order_status_id'))
+		drain_outbox()
+		tx = Transaction.objects.get(order_id=order_id)
+		self.assertEqual(payment_statuses.key_for_id(tx.payment_status_id), 'cancelled')
+
+	def test_order_side_effects_run_from_outbox(self):
+		from finance.models import Transaction
+		from invoices.models import Invoice
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		ShoppingCartItem.objects.get_or_create(cart=cart, product_item=self.item, defaults={'qty': 1})
+		order_id = client.post('/api/orders/', data={}, format='json').data['id']
+
+		# Checkout only records the side effect; the worker applies it.
+		self.assertFalse(Transaction.objects.filter(order_id=order_id).exists())
+		self.assertEqual(list(OutboxMessage.objects.values_list('topic', 'status')), [('payment.sync', 'pending')])
+		self.assertEqual(drain_outbox(), 1)
+		self.assertEqual(payment_statuses.key_for_id(Transaction.objects.get(order_id=order_id).payment_status_id), 'pending')
+
+		# Delivery -> payment success -> invoice + stock adjustment, drained in one run.
+		order = ShopOrder.objects.get(id=order_id)
+		order.order_status = OrderStatus.objects.create(status='Delivered')
+		order.save(update_fields=['order_status'])
+		self.assertEqual(drain_outbox(), 3)
+		self.assertEqual(Invoice.objects.filter(order_id=order_id).count(), 1)
+		self.assertEqual(drain_outbox(), 0)
+		self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.DONE).exists())
+
+		# Failures are retried with backoff, then parked as failed.
+		message = enqueue('unknown.topic', {})
+		with override_settings(OUTBOX_MAX_ATTEMPTS=2):
+			drain_outbox()
+			message.refresh_from_db()
+			self.assertEqual((message.status, message.attempts), (OutboxMessage.PENDING, 1))
+			self.assertGreater(message.available_at, timezone.now())
+			self.assertEqual(drain_outbox(), 0)
+			OutboxMessage.objects.filter(id=message.id).update(available_at=timezone.now())
+			drain_outbox()
+		message.refresh_from_db()
+		self.assertEqual(message.status, OutboxMessage.FAILED)
+		self.assertIn('unknown.topic', message.last_error)
+
+	def test_delivery_stock_adjustment_uses_fixed_queries(self):
+		from finance.models import Transaction
+		from finance.signals import adjust_order_stock
+
+		items = [self.item] + [
+			ProductItem.objects.create(product=self.product, sku=f'TEST-SKU-{n}', qty_in_stock=50, price='3.00')
+			for n in range(3, 8)
+		]
+		cart, _ = ShoppingCart.objects.get_or_create(user=self.customer, defaults={'session_id': None})
+		for it in items:
+			ShoppingCartItem.objects.create(cart=cart, product_item=it, qty=2)
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_id = client.post('/api/orders/', data={}, format='json').data['id']
+		drain_outbox()
+		before = dict(ProductItem.objects.filter(id__in=[it.id for it in items]).values_list('id', 'qty_in_stock'))
+
+		# Saves that keep the payment status do not touch stock (no extra queries).
+		tx = Transaction.objects.get(order_id=order_id)
+		with self.assertNumQueries(1):
+			tx.save(update_fields=['amount'])
+
+		order = ShopOrder.objects.get(id=order_id)
+		order.order_status = OrderStatus.objects.create(status='Delivered')
+		order.save(update_fields=['order_status'])
+		drain_outbox()
+		after = dict(ProductItem.objects.filter(id__in=before).values_list('id', 'qty_in_stock'))
+		self.assertEqual(after, {sku_id: qty - 2 for sku_id, qty in before.items()})
+
+		# Lines + ledger INSERT + one stock UPDATE, whatever the line count.
+		with self.assertNumQueries(3):
+			adjust_order_stock({'order_id': order_id, 'restore': True})
+		self.assertEqual(dict(ProductItem.objects.filter(id__in=before).values_list('id', 'qty_in_stock')), before)
+
+	def test_failing_batch_message_does_not_hold_back_the_others(self):
+		from invoices.models import Invoice
+		from orders import outbox
+		from orders.models import OutboxMessage
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		order_id = self._place_order(client)
+		drain_outbox()
+		bad = enqueue(outbox.INVOICE_CREATE, {})
+		gone = enqueue(outbox.INVOICE_CREATE, {'order_id': order_id + 1000})
+		good = enqueue(outbox.INVOICE_CREATE, {'order_id': order_id})
+		drain_outbox()
+
+		# Only the malformed message is charged; a deleted order is skipped.
+		statuses = dict(OutboxMessage.objects.filter(id__in=[bad.id, gone.id, good.id]).values_list('id', 'status'))
+		self.assertEqual(statuses, {bad.id: OutboxMessage.PENDING, gone.id: OutboxMessage.DONE, good.id: OutboxMessage.DONE})
+		self.assertEqual(OutboxMessage.objects.get(id=bad.id).attempts, 1)
+		self.assertTrue(Invoice.objects.filter(order_id=order_id).exists())
+		self.assertFalse(Invoice.objects.filter(order_id=order_id + 1000).exists())
+
+	def _count_list_queries(self, client, url, expected_orders):
+		with CaptureQueriesContext(connection) as ctx:
+			res = client.get(url, format='json')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(len(res.data['results']), expected_orders)
+		return len(ctx.captured_queries)
+
+	def test_order_lists_use_fixed_query_count_per_page(self):
+		SellerProfile.objects.create(user=self.seller, store_name='Test Store')
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+
+		self._place_order(client)
+		customer_one = self._count_list_queries(client, '/api/orders/my-orders/', 1)
+		seller_one = self._count_list_queries(seller_client, '/api/orders/seller-orders/', 1)
+
+		for _ in range(4):
+			self._place_order(client)
+		customer_many = self._count_list_queries(client, '/api/orders/my-orders/', 5)
+		seller_many = self._count_list_queries(seller_client, '/api/orders/seller-orders/', 5)
+
+		# count + orders (with joined relations) + lines (with joined relations)
+		self.assertEqual(customer_one, 3)
+		self.assertEqual(customer_many, 3)
+		self.assertEqual(seller_one, 3)
+		self.assertEqual(seller_many, 3)
+
+		res = seller_client.get('/api/orders/seller-orders/', format='json')
+		self.assertEqual(res.data['results'][0]['lines'][0]['seller_name'], 'Test Store')
+		self.assertEqual(res.data['results'][0]['payment_status'], 'Pending')
+
+	def test_summary_view_returns_flat_rows_without_lines(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		for _ in range(3):
+			self._place_order(client)
+
+		with self.assertNumQueries(2):
+			res = client.get('/api/orders/my-orders/?view=summary', format='json')
+		self.assertEqual(res.status_code, 200)
+		row = res.data['results'][0]
+		self.assertNotIn('lines', row)
+		self.assertEqual(row['status_display'], 'Pending')
+		self.assertEqual(row['payment_status'], 'Pending')
+		self.assertEqual(row['order_total'], '10.00')
+		self.assertEqual(row['line_count'], 1)
+		self.assertEqual(row['seller_count'], 1)
+
+		with self.assertNumQueries(2):
+			res2 = seller_client.get('/api/orders/seller-orders/?view=summary', format='json')
+		self.assertEqual(res2.status_code, 200)
+		self.assertEqual(len(res2.data['results']), 3)
+		row = res2.data['results'][0]
+		self.assertTrue(row['can_update_status'])
+		self.assertFalse(row['is_multi_vendor'])
+		self.assertEqual(row['other_sellers_lines_count'], 0)
+
+	def _bulk(self, client, items):
+		with CaptureQueriesContext(connection) as ctx:
+			res = client.post('/api/orders/bulk-status/', data={'items': items}, format='json')
+		self.assertEqual(res.status_code, 200)
+		return res.data, len(ctx.captured_queries)
+
+	def test_bulk_status_applies_items_in_fixed_queries(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		shipped = OrderStatus.objects.create(status='Shipped')
+		cancelled = OrderStatus.objects.create(status='Cancelled')
+		order_ids = [self._place_order(client) for _ in range(6)]
+		self.item.refresh_from_db()
+		stock_after_checkout = self.item.qty_in_stock
+
+		data, one = self._bulk(seller_client, [
+			{'order_id': order_ids[0], 'status': shipped.id, 'shipping_carrier': 'Aramex', 'tracking_number': 'T-1'},
+		])
+		self.assertEqual(data['updated'], 1)
+		data, many = self._bulk(seller_client, [
+			{'order_id': oid, 'status': shipped.id, 'tracking_number': f'T-{oid}'} for oid in order_ids[1:4]
+		])
+		self.assertEqual(data['updated'], 3)
+		self.assertEqual(one, many)
+
+		order = ShopOrder.objects.get(id=order_ids[0])
+		self.assertEqual(order.order_status_id, shipped.id)
+		self.assertEqual((order.shipping_carrier, order.tracking_number), ('Aramex', 'T-1'))
+		self.assertIsNotNone(order.shipped_at)
+		self.assertEqual(order.line_status_counts, {'shipped': 1})
+		self.assertTrue(order.lines.get().line_shipped_at)
+
+		# Line item cancel restocks; shipped -> cancelled is rejected; unknown ids fail alone.
+		line_id = ShopOrder.objects.get(id=order_ids[4]).lines.get().id
+		data, _ = self._bulk(seller_client, [
+			{'line_id': line_id, 'status': cancelled.id},
+			{'order_id': order_ids[0], 'status': cancelled.id},
+			{'order_id': 999999, 'status': shipped.id},
+			{'status': shipped.id},
+		])
+		self.assertEqual([r['ok'] for r in data['results']], [True, False, False, False])
+		self.assertEqual(data['results'][1]['detail'], 'Invalid status transition.')
+		order = ShopOrder.objects.get(id=order_ids[4])
+		self.assertEqual(order.order_status_id, cancelled.id)
+		self.assertEqual(order.line_status_counts, {'cancelled': 1})
+		drain_outbox()
+		self.assertEqual(order.transaction.payment_status.key, 'cancelled')
+		self.item.refresh_from_db()
+		self.assertEqual(self.item.qty_in_stock, stock_after_checkout + 1)
+
+		# Customers and other sellers cannot use it.
+		res = client.post('/api/orders/bulk-status/', data={'items': []}, format='json')
+		self.assertEqual(res.status_code, 403)
+		other = get_user_model().objects.create_user(username='other_bulk', password='12345678', user_type='seller')
+		other_client = APIClient()
+		other_client.force_authenticate(user=other)
+		data, _ = self._bulk(other_client, [{'order_id': order_ids[5], 'status': shipped.id}])
+		self.assertEqual(data['results'][0], {'index': 0, 'ok': False, 'detail': 'Order not found.'})
+
+	def test_seller_export_streams_csv_and_ndjson(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		order_ids = [self._place_order(client) for _ in range(3)]
+
+		res = seller_client.get('/api/orders/export/')
+		self.assertEqual(res.status_code, 200)
+		self.assertTrue(res.streaming)
+		self.assertIn('attachment;', res['Content-Disposition'])
+		rows = list(csv.reader(b''.join(res.streaming_content).decode('utf-8-sig').splitlines()))
+		self.assertEqual(rows[0][:3], ['order_id', 'order_date', 'order_status'])
+		self.assertEqual(len(rows), 4)
+		by_header = dict(zip(rows[0], rows[1]))
+		self.assertEqual(int(by_header['order_id']), order_ids[0])
+		self.assertEqual(by_header['sku'], 'TEST-SKU-1')
+		self.assertEqual(by_header['ship_city'], 'Cairo')
+		self.assertEqual(by_header['payment_status'], 'Pending')
+
+		res = seller_client.get('/api/orders/export/?output=ndjson&date_to=2000-01-01')
+		self.assertEqual(b''.join(res.streaming_content), b'')
+		res = seller_client.get('/api/orders/export/?output=ndjson')
+		lines = [json.loads(ln) for ln in b''.join(res.streaming_content).decode('utf-8').splitlines()]
+		self.assertEqual([ln['order_id'] for ln in lines], order_ids)
+		self.assertEqual(lines[0]['price'], '10.00')
+
+		self.assertEqual(client.get('/api/orders/export/').status_code, 403)
+
+	def test_large_export_runs_as_background_job(self):
+		from orders.exports import export_exceeds
+		from orders.tasks import build_order_export
+
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		for _ in range(3):
+			self._place_order(client)
+		streamed = b''.join(seller_client.get('/api/orders/export/').streaming_content)
+		# The size probe reads at most limit + 1 ids: exactly the limit still streams.
+		self.assertFalse(export_exceeds(self.seller, None, 3))
+		self.assertTrue(export_exceeds(self.seller, None, 2))
+
+		with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, ORDER_EXPORT_SYNC_MAX_ROWS=2):
+			with self.captureOnCommitCallbacks() as callbacks:
+				res = seller_client.get('/api/orders/export/')
+			self.assertEqual(res.status_code, 202)
+			self.assertEqual(len(callbacks), 1)
+			self.assertEqual(res.data['status'], 'pending')
+			self.assertIsNone(res.data['download_url'])
+
+			# Run the job inline (the on_commit callback would enqueue it).
+			build_order_export(res.data['id'])
+			detail = seller_client.get(f"/api/orders/exports/{res.data['id']}/")
+			self.assertEqual(detail.data['status'], 'done')
+			self.assertEqual(detail.data['row_count'], 3)
+			self.assertIsNotNone(detail.data['download_url'])
+
+			download = seller_client.get(f"/api/orders/exports/{res.data['id']}/download/")
+			self.assertEqual(download.status_code, 200)
+			self.assertEqual(b''.join(download.streaming_content), streamed)
+			download.close()
+
+			# Jobs are private to whoever requested them.
+			self.assertEqual(client.get(f"/api/orders/exports/{res.data['id']}/").status_code, 404)
+
+	def test_archived_orders_leave_live_lists_and_stay_readable(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		shipped = OrderStatus.objects.create(status='Shipped')
+		delivered = OrderStatus.objects.create(status='Delivered')
+		old_id, recent_id, open_id = (self._place_order(client) for _ in range(3))
+		for oid in (old_id, recent_id):
+			for status in (shipped, delivered):
+				res = seller_client.patch(f'/api/orders/{oid}/set-status/', data={'order_status': status.id}, format='json')
+				self.assertEqual(res.status_code, 200)
+		ShopOrder.objects.filter(id__in=[old_id, open_id]).update(order_date=timezone.now() - timedelta(days=400))
+		OrderSeller.objects.filter(order_id__in=[old_id, open_id]).update(order_date=timezone.now() - timedelta(days=400))
+
+		out = StringIO()
+		call_command('archive_orders', '--dry-run', stdout=out)
+		self.assertIn('1 orders', out.getvalue())
+		call_command('archive_orders', '--batch-size', '1', stdout=out)
+		self.assertIn('Archived 1 orders (1 lines, 1 seller links)', out.getvalue())
+
+		old = ShopOrder.objects.get(id=old_id)
+		self.assertIsNotNone(old.archived_at)
+		self.assertFalse(old.lines.exists())
+		self.assertEqual(old.archived_lines.get().product_item_id, self.item.id)
+
+		# Live lists skip it; ?archived=1 and the detail endpoint read it from the archive.
+		live = client.get('/api/orders/my-orders/')
+		self.assertEqual(sorted(o['id'] for o in live.data['results']), sorted([recent_id, open_id]))
+		archived = client.get('/api/orders/my-orders/?archived=1')
+		self.assertEqual([o['id'] for o in archived.data['results']], [old_id])
+		self.assertEqual(archived.data['results'][0]['lines'][0]['sku'], 'TEST-SKU-1')
+		seller_live = seller_client.get('/api/orders/seller-orders/?view=summary')
+		self.assertNotIn(old_id, [o['id'] for o in seller_live.data['results']])
+		seller_archived = seller_client.get('/api/orders/seller-orders/?archived=1&view=summary')
+		self.assertEqual([(o['id'], o['seller_count']) for o in seller_archived.data['results']], [(old_id, 1)])
+		detail = seller_client.get(f'/api/orders/{old_id}/')
+		self.assertEqual(detail.status_code, 200)
+		self.assertEqual(len(detail.data['lines']), 1)
+
+		# Archived orders are read-only, but still exported.
+		res = seller_client.patch(f'/api/orders/{old_id}/set-status/', data={'order_status': delivered.id}, format='json')
+		self.assertEqual(res.status_code, 404)
+		exported = seller_client.get('/api/orders/export/?output=ndjson')
+		client_rows = [json.loads(ln) for ln in b''.join(exported.streaming_content).decode('utf-8').splitlines()]
+		self.assertEqual([r['order_id'] for r in client_rows], [old_id, recent_id, open_id])
+
+	def test_status_changes_append_order_events_read_incrementally(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		shipped = OrderStatus.objects.create(status='Shipped')
+		order_id = self._place_order(client)
+
+		res = client.get(f'/api/orders/{order_id}/events/')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual([e['type'] for e in res.data['events']], ['placed'])
+		after = res.data['last_event_id']
+
+		line_id = ShopOrder.objects.get(id=order_id).lines.get().id
+		res = seller_client.patch(
+			f'/api/orders/{order_id}/set-line-status/', data={'line_id': line_id, 'line_status': shipped.id}, format='json',
+		)
+		self.assertEqual(res.status_code, 200)
+		data, _ = self._bulk(seller_client, [{'order_id': order_id, 'status': shipped.id, 'tracking_number': 'T-9'}])
+		self.assertEqual(data['updated'], 1)
+
+		# Only events after the cursor come back; a no-op status write adds nothing.
+		res = client.get(f'/api/orders/{order_id}/events/?after={after}')
+		events = res.data['events']
+		self.assertEqual([e['type'] for e in events], ['line_status', 'order_status', 'tracking'])
+		self.assertEqual((events[0]['line_id'], events[0]['status_key']), (line_id, 'shipped'))
+		self.assertEqual(events[2]['data']['tracking_number'], 'T-9')
+		self.assertEqual(res.data['last_event_id'], events[-1]['id'])
+		res = client.get(f'/api/orders/{order_id}/events/?after={res.data["last_event_id"]}')
+		self.assertEqual(res.data['events'], [])
+		res = client.get(f'/api/orders/{order_id}/events/?limit=1')
+		self.assertTrue(res.data['has_more'])
+
+		other = get_user_model().objects.create_user(username='other_events', password='12345678', user_type='customer')
+		other_client = APIClient()
+		other_client.force_authenticate(user=other)
+		self.assertEqual(other_client.get(f'/api/orders/{order_id}/events/').status_code, 404)
+
+	@override_settings(ORDER_EVENTS_LAYER='memory')
+	def test_committed_events_are_streamed_to_customer_and_sellers(self):
+		reset_layer()
+		self.addCleanup(reset_layer)
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		shipped = OrderStatus.objects.create(status='Shipped')
+		order_id = self._place_order(client)
+		line_id = ShopOrder.objects.get(id=order_id).lines.get().id
+
+		def ship_line():
+			with self.captureOnCommitCallbacks(execute=True):
+				res = seller_client.patch(
+					f'/api/orders/{order_id}/set-line-status/', data={'line_id': line_id, 'line_status': shipped.id}, format='json',
+				)
+			self.assertEqual(res.status_code, 200)
+
+		def parse(chunk):
+			fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+			return fields['event'], json.loads(fields['data'])
+
+		async def collect():
+			customer = order_event_stream(self.customer.id, order_id)
+			seller = order_event_stream(self.seller.id)
+			unrelated = order_event_stream(self.customer.id, order_id + 1000, heartbeat=0.05)
+			for stream in (customer, seller, unrelated):
+				self.assertEqual(await anext(stream), 'retry: 5000\n\n')
+			await sync_to_async(ship_line)()
+			received = []
+			for stream in (customer, customer, seller):
+				received.append(parse(await asyncio.wait_for(anext(stream), 1)))
+			self.assertEqual(await asyncio.wait_for(anext(unrelated), 1), ': ping\n\n')
+			for stream in (customer, seller, unrelated):
+				await stream.aclose()
+			return received
+
+		received = async_to_sync(collect)()
+		self.assertEqual([(name, ev['type']) for name, ev in received], [
+			('order', 'line_status'), ('order', 'order_status'), ('order', 'line_status'),
+		])
+		self.assertEqual((received[0][1]['order_id'], received[0][1]['status_key']), (order_id, 'shipped'))
+
+		# Anonymous clients are rejected; sync (WSGI) requests are pointed at the ASGI app.
+		res = async_to_sync(self.async_client.get)('/api/orders/stream/')
+		self.assertEqual(res.status_code, 401)
+		self.client.force_login(self.customer)
+		self.assertEqual(self.client.get('/api/orders/stream/').status_code, 503)
+
+
+class StatusRegistryTests(TestCase):
+	"""Canonical status keys and the process-local registries."""
+
+	def setUp(self):
+		order_statuses.invalidate()
+		payment_statuses.invalidate()
+
+	def test_key_is_derived_from_label_on_save(self):
+		shipped = OrderStatus.objects.create(status='تم الشحن')
+		self.assertEqual(shipped.key, 'shipped')
+		paid = PaymentStatus.objects.create(status='Success')
+		self.assertEqual(paid.key, 'success')
+
+	def test_registry_lookups_are_cached_and_invalidated(self):
+		pending = OrderStatus.objects.create(status='Pending')
+		self.assertEqual(order_statuses.key_for_id(pending.id), 'pending')
+
+		with self.assertNumQueries(0):
+			self.assertEqual(order_statuses.key_for_id(pending.id), 'pending')
+			self.assertEqual(order_statuses.get('pending').id, pending.id)
+
+		# Saving a row drops the cache so label/key edits are picked up.
+		pending.key = 'processing'
+		pending.save()
+		self.assertEqual(order_statuses.key_for_id(pending.id), 'processing')
+
+		# Other processes see edits through the shared version.
+		with self.captureOnCommitCallbacks(execute=True):
+			OrderStatus.objects.filter(id=pending.id).update(key='shipped')
+			order_statuses._bump_version()
+		order_statuses._checked_at = 0
+		self.assertEqual(order_statuses.key_for_id(pending.id), 'shipped')
+
+		# Unknown ids reload at most once per second.
+		with self.assertNumQueries(0):
+			self.assertIsNone(order_statuses.key_for_id(pending.id + 1000))
+			self.assertIsNone(order_statuses.key_for_id(pending.id + 1001))
+
+	def test_get_creates_missing_default_status(self):
+		cancelled = order_statuses.get('cancelled')
+		self.assertEqual(cancelled.status, 'Cancelled')
+		self.assertTrue(OrderStatus.objects.filter(id=cancelled.id, key='cancelled').exists())
+		# Created inside an open transaction: not cached until it commits.
+		with self.assertNumQueries(1):
+			self.assertEqual(order_statuses.get('cancelled').id, cancelled.id)
+
+	def test_aggregate_status_key_from_counts(self):
+		self.assertIsNone(aggregate_status_key({}))
+		self.assertEqual(aggregate_status_key({'cancelled': 2}), 'cancelled')
+		self.assertEqual(aggregate_status_key({'delivered': 1, 'pending': 1}), 'shipped')
+		self.assertEqual(aggregate_status_key({'delivered': 1, 'completed': 1}), 'delivered')
+		self.assertEqual(aggregate_status_key({'processing': 1, 'cancelled': 1}), 'processing')
+		self.assertEqual(shift_status_count({'pending': 2}, 'pending', 'shipped'), {'pending': 1, 'shipped': 1})
+
+
+class OrderFilterQueryPlanTests(TestCase):
+	"""Order list filters must stay on indexes (no sequential scans)."""
+
+	@classmethod
+	def setUpTestData(cls):
+		# Order saves create transactions through the (process-local) registries.
+		order_statuses.invalidate()
+		payment_statuses.invalidate()
+		User = get_user_model()
+		cls.customer = User.objects.create_user(username='plan_customer', password='12345678', user_type='customer')
+		other = User.objects.create_user(username='plan_other', password='12345678', user_type='customer')
+		cls.seller = User.objects.create_user(username='plan_seller', password='12345678', user_type='seller')
+		cls.pending = OrderStatus.objects.create(status='Pending')
+		cls.shipped = OrderStatus.objects.create(status='Shipped')
+
+		tz = timezone.get_default_timezone()
+		orders = []
+		for i in range(30):
+			order = ShopOrder.objects.create(
+				user=cls.customer if i % 3 else other,
+				order_total='10.00',
+				order_status=cls.shipped if i % 2 else cls.pending,
+			)
+			order.order_date = timezone.make_aware(datetime(2024, 1, 1) + timedelta(days=i, hours=12), tz)
+			orders.append(order)
+		ShopOrder.objects.bulk_update(orders, ['order_date'])
+		OrderSeller.objects.bulk_create([
+			OrderSeller(order=o, seller=cls.seller, line_count=1, seller_subtotal='10.00', order_date=o.order_date)
+			for o in orders[::2]
+		])
+
+	def _filter_combinations(self):
+		for order_id, status_id, date_from, date_to, archived in product(
+			(None, 1), (None, self.shipped.id), (None, date(2024, 1, 5)), (None, date(2024, 1, 20)), (False, True),
+		):
+			yield OrderFilters(order_id=order_id, status_id=status_id, date_from=date_from, date_to=date_to, archived=archived)
+
+	def _plan(self, qs):
+		if connection.vendor == 'postgresql':
+			with connection.cursor() as cursor:
+				# Tiny test tables are always cheaper to scan; make the planner prove an index exists.
+				cursor.execute('SET LOCAL enable_seqscan = off')
+		return qs.explain()
+
+	def _assert_index_only_plan(self, qs, filters):
+		plan = self._plan(qs)
+		if connection.vendor == 'postgresql':
+			self.assertNotIn('Seq Scan', plan, f'{filters}:\n{plan}')
+		elif connection.vendor == 'sqlite':
+			# "SEARCH ... USING INDEX" is an index lookup; "SCAN <table>" reads every row.
+			scans = [ln for ln in plan.splitlines() if ' SCAN ' in f' {ln} ' and 'CONSTANT ROW' not in ln]
+			self.assertEqual(scans, [], f'{filters}:\n{plan}')
+			if filters.order_id is None and (filters.date_from or filters.date_to):
+				self.assertIn('order_date', plan, f'date range not on the index for {filters}:\n{plan}')
+		else:
+			self.skipTest(f'No plan check for {connection.vendor}.')
+
+	def test_customer_filters_use_indexes(self):
+		for filters in self._filter_combinations():
+			with self.subTest(filters=filters):
+				self._assert_index_only_plan(with_read_relations(customer_orders_queryset(self.customer, filters)), filters)
+
+	def test_seller_filters_use_indexes(self):
+		for filters in self._filter_combinations():
+			with self.subTest(filters=filters):
+				qs = with_read_relations(seller_orders_queryset(self.seller, filters))
+				self._assert_index_only_plan(qs, filters)
+
+	def test_date_range_is_half_open_in_time_zone(self):
+		start, end = local_date_range(date(2024, 1, 5), date(2024, 1, 5))
+		self.assertEqual(end - start, timedelta(days=1))
+		self.assertEqual(start.tzinfo, timezone.get_default_timezone())
+
+		# Orders fall on Jan 1..30 at noon local time; both ends are inclusive days.
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		res = client.get('/api/orders/my-orders/?view=summary&date_from=2024-01-05&date_to=2024-01-10')
+		self.assertEqual(res.status_code, 200)
+		days = sorted(timezone.localtime(parse_datetime(r['order_date'])).day for r in res.data['results'])
+		self.assertEqual(days, [d for d in range(5, 11) if (d - 1) % 3])
+
+		# Impossible dates are ignored rather than failing the request.
+		res = client.get('/api/orders/my-orders/?date_from=2024-02-30')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(res.data['count'], 20)
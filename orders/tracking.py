@@ -0,0 +1,49 @@
+"""Loaded-value tracking for models whose signals only care about a few fields."""
+
+from django.db import models
+
+
+class TrackedFieldsModel(models.Model):
+    """Remember the DB values of ``tracked_fields`` (attnames) as loaded.
+
+    Values are captured in ``from_db`` and again after each ``save()``, so
+    ``post_save`` receivers compare the new values with the previous ones
+    (``has_changed``) without another query. New instances and fields that
+    were not loaded (``only()``/``defer()``) count as changed.
+    """
+
+    tracked_fields: tuple[str, ...] = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._capture_tracked()
+        return instance
+
+    def _capture_tracked(self, only=None) -> None:
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, '_loaded_values', {})
+        for f in self.tracked_fields:
+            if f not in deferred and (only is None or f in only):
+                loaded[f] = getattr(self, f)
+        self._loaded_values = loaded
+
+    def loaded_value(self, field: str, default=None):
+        """Value of ``field`` when the instance was loaded / last saved."""
+        return getattr(self, '_loaded_values', {}).get(field, default)
+
+    def has_changed(self, field: str) -> bool:
+        loaded = getattr(self, '_loaded_values', {})
+        return field not in loaded or loaded[field] != getattr(self, field)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._capture_tracked()
+        else:
+            # Fields left out of update_fields keep their pending change.
+            self._capture_tracked({self._meta.get_field(name).attname for name in update_fields})
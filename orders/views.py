@@ -5,134 +5,63 @@ Includes checkout creation, seller status updates, and list endpoints.
 
 from rest_framework import viewsets, permissions, filters
 from rest_framework.response import Response
-from .models import ShopOrder
-from .serializers import ShopOrderSerializer
+from .bulk_status import BulkStatusError, apply_bulk_status, parse_items
+from .events import line_status_event, order_change_events, order_snapshot, placed_event, record_events
+from .models import OrderSeller, ShopOrder, address_snapshot
+from .queries import (
+    OrderFilters, customer_orders_queryset, drop_stale_lines, summary_values, with_read_relations,
+)
+from .sellers import line_snapshots, seller_links_for_lines, seller_orders_queryset
+from .serializers import ShopOrderSerializer, order_summary_rows
+from .statuses import (
+    CANCELLED, DELIVERED, PENDING, RETURNED, SHIPPED,
+    aggregate_status_key, count_line_statuses, order_statuses, restores_stock, shift_status_count,
+    transition_allowed,
+)
+from cart.storage import promote_guest_cart, set_guest_cookie
+from products.inventory import movement, record_movements
+from products.models import InventoryMovement
 from products.views import StandardResultsSetPagination # هنستعمل نفس الترقيم
 
-from django.utils.dateparse import parse_date
 from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
 
 
-def _normalize_order_status_key(label: str) -> str | None:
-    """Normalize OrderStatus.status into a canonical key.
+def _lock_order(order: ShopOrder) -> None:
+    """Lock the order row before any of its lines.
 
-    Returns None when the label is unknown; we only enforce transitions
-    when both current and target labels are recognized.
+    Every status path (``set_status``, ``set_line_status``, ``bulk_status``)
+    takes the order row first and its lines second, so concurrent updates of
+    the same order queue up instead of deadlocking.
     """
+    list(ShopOrder.objects.select_for_update().filter(pk=order.pk).values_list('pk', flat=True))
 
-    s = str(label or '').strip().lower()
-    if not s:
-        return None
-
-    # Arabic + English markers
-    pending = {'pending', 'new', 'placed', 'قيد', 'انتظار', 'قيد الانتظار', 'جديد'}
-    processing = {'processing', 'preparing', 'confirmed', 'تجهيز', 'قيد التجهيز', 'تم التأكيد', 'مؤكد'}
-    shipped = {'shipped', 'shipping', 'in transit', 'تم الشحن', 'تم ارسال', 'تم الإرسال', 'قيد الشحن'}
-    delivered = {'delivered', 'تم التسليم', 'تم التوصيل'}
-    completed = {'completed', 'complete', 'done', 'مكتمل', 'تم'}
-    cancelled = {'cancelled', 'canceled', 'cancel', 'ملغي', 'ملغى', 'إلغاء', 'الغاء'}
-    refunded = {'refunded', 'refund', 'تم الاسترجاع', 'استرجاع'}
-    returned = {'returned', 'return', 'مرتجع', 'ارجاع', 'إرجاع'}
-
-    if any(m in s for m in cancelled):
-        return 'cancelled'
-    if any(m in s for m in refunded):
-        return 'refunded'
-    if any(m in s for m in returned):
-        return 'returned'
-    if any(m in s for m in delivered):
-        return 'delivered'
-    if any(m in s for m in shipped):
-        return 'shipped'
-    if any(m in s for m in processing):
-        return 'processing'
-    if any(m in s for m in pending):
-        return 'pending'
-    if any(m in s for m in completed):
-        return 'completed'
-    return None
-
-
-_ALLOWED_TRANSITIONS: dict[str, set[str]] = {
-    'pending': {'processing', 'shipped', 'cancelled'},
-    'processing': {'shipped', 'cancelled'},
-    'shipped': {'delivered', 'returned'},
-    'delivered': {'completed', 'returned', 'refunded'},
-    'completed': {'returned', 'refunded'},
-    'cancelled': set(),
-    'returned': set(),
-    'refunded': set(),
-}
-
-
-def _transition_allowed(current_label: str, next_label: str) -> bool:
-    cur = _normalize_order_status_key(current_label)
-    nxt = _normalize_order_status_key(next_label)
-    if cur is None or nxt is None:
-        return True
-    if cur == nxt:
-        return True
-    return nxt in _ALLOWED_TRANSITIONS.get(cur, set())
-
-
-def _ensure_status(name: str):
-    from .models import OrderStatus
-    obj, _ = OrderStatus.objects.get_or_create(status=name)
-    return obj
-
-
-def _recompute_order_status_from_lines(order: ShopOrder) -> None:
-    """Derive order.order_status from line_status values.
-
-    This keeps the global order state meaningful for customers, while allowing
-    per-seller fulfillment for mixed-vendor orders.
-    """
-
-    lines = list(order.lines.select_related('line_status').all())
-    if not lines:
-        return
-
-    keys = []
-    for ln in lines:
-        keys.append(_normalize_order_status_key(getattr(getattr(ln, 'line_status', None), 'status', '') or '') or 'pending')
-
-    # Aggregate rules (predictable + supports partial states)
-    # Priority:
-    # 1) All-cancelled => Cancelled
-    # 2) Any-refunded => Refunded
-    # 3) Any-returned => Returned
-    # 4) All-delivered/completed => Delivered
-    # 5) Any-shipped/delivered => Shipped (covers partial-delivered)
-    # 6) Any-processing => Processing
-    # 7) Otherwise => Pending
-
-    if all(k == 'cancelled' for k in keys):
-        order.order_status = _ensure_status('Cancelled')
-        return
-
-    if any(k == 'refunded' for k in keys):
-        order.order_status = _ensure_status('Refunded')
-        return
-
-    if any(k == 'returned' for k in keys):
-        order.order_status = _ensure_status('Returned')
-        return
-
-    if all(k in {'delivered', 'completed'} for k in keys):
-        order.order_status = _ensure_status('Delivered')
-        return
 
-    if any(k in {'shipped', 'delivered', 'completed'} for k in keys):
-        order.order_status = _ensure_status('Shipped')
-        return
+def _apply_line_transition(order: ShopOrder, prev_key: str | None, next_key: str | None) -> None:
+    """Move one line between status buckets and derive order.order_status.
 
-    if any(k == 'processing' for k in keys):
-        order.order_status = _ensure_status('Processing')
-        return
+    The order row is locked and its ``line_status_counts`` re-read so that
+    concurrent line updates on the same order cannot lose deltas. This keeps
+    the global order state meaningful for customers, while allowing
+    per-seller fulfillment for mixed-vendor orders.
+    """
 
-    order.order_status = _ensure_status('Pending')
+    counts = (
+        ShopOrder.objects.select_for_update()
+        .values_list('line_status_counts', flat=True)
+        .get(pk=order.pk)
+    )
+    if not counts:
+        # Legacy order without counters: rebuild once (the line is already saved).
+        counts = count_line_statuses([order.pk])[order.pk]
+    else:
+        counts = shift_status_count(counts, prev_key, next_key)
+
+    order.line_status_counts = counts
+    agg = aggregate_status_key(counts)
+    if agg is not None:
+        order.order_status = order_statuses.get(agg)
 
 class OrderViewSet(viewsets.ModelViewSet):
     """Order API endpoints for customers and sellers.
@@ -148,30 +77,47 @@ class OrderViewSet(viewsets.ModelViewSet):
     ordering_fields = ['order_date', 'order_total']
     ordering = ['-order_date']
 
-    def get_queryset(self):
+    def get_queryset(self, filters: OrderFilters | None = None):
         """Base queryset for the authenticated user.
 
         - Sellers: orders that contain any SKU belonging to the seller.
         - Customers: their own orders.
+
+        ``filters`` narrows either list with index-friendly lookups. Without
+        ``filters.archived`` only live orders are returned, so archived orders
+        are read-only (status actions cannot find them).
         """
         user = self.request.user
+        archived = bool(filters and filters.archived)
         if user.is_authenticated and getattr(user, 'user_type', None) == 'seller':
-            # Seller can see orders that contain any of their product items.
-            # Use relational filtering to avoid N+1 loops.
-            return (
-                ShopOrder.objects.filter(lines__product_item__product__seller=user)
-                .select_related('order_status', 'user', 'payment_method', 'shipping_address')
-                .prefetch_related('lines__product_item__product__seller')
-                .distinct()
-                .order_by('-order_date')
-            )
+            # Seller can see orders that contain any of their product items,
+            # resolved through the (seller, order_date) indexed link table.
+            return with_read_relations(seller_orders_queryset(user, filters), archived=archived)
 
         # Default: customer sees their own orders
-        return (
-            ShopOrder.objects.filter(user=user)
-            .select_related('order_status', 'payment_method', 'shipping_address')
-            .prefetch_related('lines__product_item__product__seller')
-        )
+        return with_read_relations(customer_orders_queryset(user, filters), archived=archived)
+
+    def _list_orders(self, request, orders, archived: bool = False):
+        """Paginate a filtered order list.
+
+        ``?view=summary`` returns a flat projection (ids, dates, totals,
+        status, payment status, line/seller counts) built with ``.values()``
+        and no serializer; clients load full details per order on demand.
+        """
+        if (request.query_params.get('view') or '').strip().lower() == 'summary':
+            seller_id = request.user.id if getattr(request.user, 'user_type', None) == 'seller' else None
+            rows = summary_values(orders, archived=archived)
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(order_summary_rows(page, seller_id=seller_id))
+            return Response(order_summary_rows(rows, seller_id=seller_id))
+
+        page = self.paginate_queryset(orders)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(orders, many=True)
+        return Response(serializer.data)
 
     # Seller-specific endpoint: all orders containing their products
     from rest_framework.decorators import action
@@ -183,66 +129,23 @@ class OrderViewSet(viewsets.ModelViewSet):
         if getattr(user, 'user_type', None) == 'seller':
             return Response({'detail': 'Not authorized.'}, status=403)
 
-        orders = self.get_queryset().order_by('-order_date')
-
-        q = (request.query_params.get('q') or '').strip()
-        if q.isdigit():
-            orders = orders.filter(id=int(q))
-
-        status_id = request.query_params.get('status')
-        if status_id:
-            orders = orders.filter(order_status_id=status_id)
-
-        date_from = parse_date(request.query_params.get('date_from') or '')
-        if date_from:
-            orders = orders.filter(order_date__date__gte=date_from)
-
-        date_to = parse_date(request.query_params.get('date_to') or '')
-        if date_to:
-            orders = orders.filter(order_date__date__lte=date_to)
-
-        page = self.paginate_queryset(orders)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        filters = OrderFilters.from_params(request.query_params)
+        return self._list_orders(request, self.get_queryset(filters), archived=filters.archived)
 
     @action(detail=False, methods=['get'], url_path='seller-orders')
     def seller_orders(self, request):
         """Seller-only: list orders that include any of the seller's SKUs.
 
-        Supports optional filters: `status`, `q` (order id), `date_from`, `date_to`.
+        Supports optional filters: `status`, `q` (order id), `date_from`, `date_to`,
+        `archived=1` for archived orders, and `view=summary` for a flat list projection.
         """
         user = request.user
         if not hasattr(user, 'user_type') or user.user_type != 'seller':
             return Response({'detail': 'Not authorized.'}, status=403)
 
-        orders = self.get_queryset()
-
-        # Optional query params
-        status_id = request.query_params.get('status')
-        if status_id:
-            orders = orders.filter(order_status_id=status_id)
-
-        q = (request.query_params.get('q') or '').strip()
-        if q.isdigit():
-            orders = orders.filter(id=int(q))
-
-        date_from = parse_date(request.query_params.get('date_from') or '')
-        if date_from:
-            orders = orders.filter(order_date__date__gte=date_from)
-
-        date_to = parse_date(request.query_params.get('date_to') or '')
-        if date_to:
-            orders = orders.filter(order_date__date__lte=date_to)
-
-        page = self.paginate_queryset(orders)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        # Optional query params: status, q, date_from, date_to, archived
+        filters = OrderFilters.from_params(request.query_params)
+        return self._list_orders(request, self.get_queryset(filters), archived=filters.archived)
 
     @action(detail=False, methods=['get'], url_path='statuses')
     def statuses(self, request):
@@ -250,19 +153,27 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not request.user.is_authenticated:
             return Response({'detail': 'Not authenticated.'}, status=401)
         from .models import OrderStatus
-        statuses = OrderStatus.objects.order_by('id').values('id', 'status')
+        statuses = OrderStatus.objects.order_by('id').values('id', 'status', 'key')
         return Response(list(statuses))
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Drops the guest cart cookie once checkout promoted it.
+        return set_guest_cookie(request._request, response)
+
     def create(self, request, *args, **kwargs):
         user = request.user
         from cart.models import ShoppingCart
         from accounts.models import UserAddress, UserPaymentMethod
         from products.models import ProductItem
-        from .models import OrderStatus
 
         requested_address_id = request.data.get('shipping_address_id') or request.data.get('shipping_address')
         requested_payment_id = request.data.get('payment_method_id') or request.data.get('payment_method')
 
+        # Guest cart first: JWT logins never fire user_logged_in, so a cart
+        # built before logging in would otherwise be missed at checkout.
+        promote_guest_cart(request._request, user)
+
         # Make checkout atomic: lock cart, lock SKUs, validate stock, decrement stock.
         with transaction.atomic():
             cart = (
@@ -277,13 +188,13 @@ class OrderViewSet(viewsets.ModelViewSet):
             # Address: accept explicit id, else default, else first
             address = None
             if requested_address_id:
-                ua = UserAddress.objects.filter(user=user, address_id=requested_address_id).select_related('address').first()
+                ua = UserAddress.objects.filter(user=user, address_id=requested_address_id).select_related('address__country').first()
                 if not ua:
                     return Response({'detail': 'Invalid shipping address.'}, status=400)
                 address = ua.address
             else:
-                ua = UserAddress.objects.filter(user=user, is_default=True).select_related('address').first() or \
-                     UserAddress.objects.filter(user=user).select_related('address').first()
+                ua = UserAddress.objects.filter(user=user, is_default=True).select_related('address__country').first() or \
+                     UserAddress.objects.filter(user=user).select_related('address__country').first()
                 if ua:
                     address = ua.address
 
@@ -306,9 +217,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 return Response({'detail': 'No payment method found. Please add a payment method to your profile.'}, status=400)
 
             # Initial order status should represent fulfillment stage, not payment.
-            status_obj = OrderStatus.objects.filter(status__iexact='Pending').first() or OrderStatus.objects.first()
-            if not status_obj:
-                return Response({'detail': 'No order status found. Please contact support.'}, status=400)
+            status_obj = order_statuses.get(PENDING)
 
             cart_items = list(cart.items.select_related('product_item', 'product_item__product').all())
             sku_ids = [ci.product_item_id for ci in cart_items if ci.product_item_id]
@@ -357,22 +266,32 @@ class OrderViewSet(viewsets.ModelViewSet):
                 user=user,
                 payment_method=payment,
                 shipping_address=address,
+                shipping_address_snapshot=address_snapshot(address),
                 order_total=total,
                 order_status=status_obj,
+                line_status_counts={status_obj.key or PENDING: len(cart_items)},
             )
 
+            snapshots = line_snapshots(locked_skus)
+            order_lines = []
             for ci in cart_items:
                 sku = sku_by_id[ci.product_item_id]
                 qty = int(ci.qty)
-                order.lines.create(
+                order_lines.append(order.lines.create(
                     product_item=sku,
                     qty=qty,
                     price=sku.price,
                     line_status=status_obj,
-                )
-                # Decrement stock
-                sku.qty_in_stock = int(sku.qty_in_stock or 0) - qty
-                sku.save(update_fields=['qty_in_stock'])
+                    **snapshots[sku.id],
+                ))
+
+            # Decrement stock (SKUs are locked above): one ledger INSERT + one UPDATE.
+            record_movements(
+                movement(ln.product_item_id, -ln.qty, InventoryMovement.CHECKOUT, order.id, ln.id)
+                for ln in order_lines
+            )
+            OrderSeller.objects.bulk_create(seller_links_for_lines(order, order_lines))
+            record_events([placed_event(order, user)])
 
             # Clear cart
             cart.items.all().delete()
@@ -397,8 +316,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not line_id or not status_id:
             return Response({'detail': 'Missing line_id or line_status.'}, status=400)
 
-        from .models import OrderLine, OrderStatus
-        from products.models import ProductItem
+        from .models import OrderLine
 
         try:
             line_id_int = int(line_id)
@@ -406,67 +324,79 @@ class OrderViewSet(viewsets.ModelViewSet):
         except Exception:
             return Response({'detail': 'Invalid line_id or line_status.'}, status=400)
 
-        try:
-            new_status = OrderStatus.objects.get(id=status_id_int)
-        except OrderStatus.DoesNotExist:
+        new_status = order_statuses.by_id(status_id_int)
+        if new_status is None:
             return Response({'detail': 'Invalid status.'}, status=400)
 
         with transaction.atomic():
-            line = (
-                OrderLine.objects.select_for_update()
-                .select_related('product_item__product__seller', 'line_status', 'order')
-                .filter(order=order, id=line_id_int)
-                .first()
-            )
+            _lock_order(order)
+            line = OrderLine.objects.select_for_update().filter(order=order, id=line_id_int).first()
             if not line:
                 return Response({'detail': 'Line not found.'}, status=404)
 
-            if getattr(getattr(line.product_item, 'product', None), 'seller', None) != user:
+            if line.seller_id != user.id:
                 return Response({'detail': 'You do not have permission to update this line.'}, status=403)
 
-            current_label = str(getattr(getattr(line, 'line_status', None), 'status', '') or getattr(getattr(order, 'order_status', None), 'status', '') or '')
-            if not _transition_allowed(current_label, getattr(new_status, 'status', '')):
+            current_key = order_statuses.key_for_id(line.line_status_id or order.order_status_id)
+            next_key = new_status.key or None
+            if not transition_allowed(current_key, next_key):
                 return Response({'detail': 'Invalid status transition.'}, status=400)
 
-            prev_key = _normalize_order_status_key(current_label) or 'pending'
-            next_key = _normalize_order_status_key(getattr(new_status, 'status', '') or '')
+            prev_key = current_key or PENDING
 
-            should_restore_stock = False
-            if next_key == 'cancelled' and prev_key in {'pending', 'processing'} and not line.line_shipped_at and not line.line_delivered_at:
-                should_restore_stock = True
-            if next_key == 'returned' and prev_key in {'shipped', 'delivered', 'completed'}:
-                should_restore_stock = True
+            should_restore_stock = restores_stock(
+                prev_key, next_key, shipped=bool(line.line_shipped_at or line.line_delivered_at),
+            )
 
             if should_restore_stock:
-                sku = ProductItem.objects.select_for_update().filter(id=line.product_item_id).first()
-                if sku:
-                    try:
-                        qty = int(line.qty or 0)
-                    except Exception:
-                        qty = 0
-                    sku.qty_in_stock = int(sku.qty_in_stock or 0) + max(0, qty)
-                    sku.save(update_fields=['qty_in_stock'])
+                record_movements([
+                    movement(line.product_item_id, max(0, int(line.qty or 0)), InventoryMovement.RESTOCK, order.id, line.id),
+                ])
 
             # Update timestamps on the line
             now = timezone.now()
-            label = str(getattr(new_status, 'status', '') or '').strip().lower()
-            shipped_keywords = {'shipped', 'shipping', 'تم الشحن', 'تم ارسال', 'تم الإرسال'}
-            delivered_keywords = {'delivered', 'تم التسليم'}
-            if (label in shipped_keywords) and not line.line_shipped_at:
+            if next_key == SHIPPED and not line.line_shipped_at:
                 line.line_shipped_at = now
-            if (label in delivered_keywords) and not line.line_delivered_at:
+            if next_key == DELIVERED and not line.line_delivered_at:
                 line.line_delivered_at = now
 
+            line_prev_key = order_statuses.key_for_id(line.line_status_id)
+            line_changed = line.line_status_id != new_status.id
             line.line_status = new_status
             line.save(update_fields=['line_status', 'line_shipped_at', 'line_delivered_at'])
 
-            # Recompute overall order status based on all lines
-            _recompute_order_status_from_lines(order)
-            order.save(update_fields=['order_status'])
+            # Derive overall order status from the per-status line counters
+            before = order_snapshot(order)
+            _apply_line_transition(order, line_prev_key, next_key)
+            order.save(update_fields=['order_status', 'line_status_counts'])
+
+            events = [line_status_event(line, line.seller_id, user, now)] if line_changed else []
+            record_events(events + order_change_events(order, before, user, now))
 
+        drop_stale_lines(order)
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    def bulk_status(self, request):
+        """Seller-only: apply many order/line status updates in one request.
+
+        Payload: { items: [{ order_id | line_id, status, shipping_carrier?, tracking_number? }] }
+        Returns one compact result per item (see ``orders.bulk_status``).
+        """
+        user = request.user
+        if not hasattr(user, 'user_type') or user.user_type != 'seller':
+            return Response({'detail': 'Not authorized.'}, status=403)
+
+        try:
+            items = parse_items(request.data)
+        except BulkStatusError as exc:
+            return Response({'detail': str(exc)}, status=400)
+
+        results = apply_bulk_status(user, items)
+        updated = sum(1 for r in results if r['ok'])
+        return Response({'updated': updated, 'failed': len(results) - updated, 'results': results})
+
     # Seller can update order status if owns any product in the order
     @action(detail=True, methods=['patch'], url_path='set-status')
     def set_status(self, request, pk=None):
@@ -474,80 +404,66 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not hasattr(user, 'user_type') or user.user_type != 'seller':
             return Response({'detail': 'Not authorized.'}, status=403)
         order = self.get_object()
+        seller_ids = set(order.seller_links.values_list('seller_id', flat=True))
         # Must include at least one seller-owned line to access.
-        if not order.lines.filter(product_item__product__seller=user).exists():
+        if user.id not in seller_ids:
             return Response({'detail': 'You do not have permission to update this order.'}, status=403)
 
         # Multi-vendor safety: do not allow a seller to change the global order status
         # unless they own ALL lines in the order.
-        if order.lines.exclude(product_item__product__seller=user).exists():
+        if len(seller_ids) > 1:
             return Response({'detail': 'Multi-vendor order: you cannot update the overall status.'}, status=403)
         # Update status
         status_id = request.data.get('order_status')
         if not status_id:
             return Response({'detail': 'Missing order_status.'}, status=400)
-        from .models import OrderStatus
-        try:
-            new_status = OrderStatus.objects.get(id=status_id)
-        except OrderStatus.DoesNotExist:
+        new_status = order_statuses.by_id(status_id)
+        if new_status is None:
             return Response({'detail': 'Invalid status.'}, status=400)
-        # Enforce order status lifecycle transitions when recognizable.
-        if not _transition_allowed(getattr(order.order_status, 'status', ''), getattr(new_status, 'status', '')):
-            return Response({'detail': 'Invalid status transition.'}, status=400)
-
-        prev_status_label = str(getattr(order.order_status, 'status', '') or '')
-        next_status_label = str(getattr(new_status, 'status', '') or '')
-        prev_key = _normalize_order_status_key(prev_status_label)
-        next_key = _normalize_order_status_key(next_status_label)
-
-        # Optional inventory reconciliation.
-        # - Cancelled (before shipped): restore stock.
-        # - Returned: restore stock.
-        should_restore_stock = False
-        if next_key == 'cancelled' and prev_key in {'pending', 'processing'} and not order.shipped_at and not order.delivered_at:
-            should_restore_stock = True
-        if next_key == 'returned' and prev_key in {'shipped', 'delivered', 'completed'}:
-            should_restore_stock = True
 
+        next_key = new_status.key or None
         with transaction.atomic():
-            if should_restore_stock:
-                from products.models import ProductItem
-                # Lock SKUs and restore quantities.
-                lines = list(order.lines.select_related('product_item').all())
-                sku_ids = [l.product_item_id for l in lines]
-                skus = list(ProductItem.objects.select_for_update().filter(id__in=sku_ids))
-                sku_by_id = {s.id: s for s in skus}
-                for line in lines:
-                    sku = sku_by_id.get(line.product_item_id)
-                    if not sku:
-                        continue
-                    try:
-                        qty = int(line.qty or 0)
-                    except Exception:
-                        qty = 0
-                    sku.qty_in_stock = int(sku.qty_in_stock or 0) + max(0, qty)
-                    sku.save(update_fields=['qty_in_stock'])
+            # Decide under the lock: a concurrent update may have moved the
+            # order (or shipped it) since it was read above.
+            _lock_order(order)
+            order.refresh_from_db(fields=['order_status', 'shipped_at', 'delivered_at'])
+            prev_key = order_statuses.key_for_id(order.order_status_id)
+
+            # Enforce order status lifecycle transitions when recognizable.
+            if not transition_allowed(prev_key, next_key):
+                return Response({'detail': 'Invalid status transition.'}, status=400)
+
+            before = order_snapshot(order)
+            lines = list(order.lines.select_for_update().all())
+            # Optional inventory reconciliation.
+            # - Cancelled (before shipped): restore stock.
+            # - Returned: restore stock.
+            if restores_stock(prev_key, next_key, shipped=bool(order.shipped_at or order.delivered_at)):
+                # Restore quantities through the ledger (one INSERT + one UPDATE).
+                # Lines cancelled/returned on their own were already restocked.
+                record_movements(
+                    movement(ln.product_item_id, max(0, int(ln.qty or 0)), InventoryMovement.RESTOCK, order.id, ln.id)
+                    for ln in lines
+                    if order_statuses.key_for_id(ln.line_status_id) not in {CANCELLED, RETURNED}
+                )
 
             order.order_status = new_status
 
             # Keep per-line status in sync for single-vendor orders.
             try:
                 from .models import OrderLine
-                lines = list(order.lines.select_for_update().all())
-                label = str(getattr(new_status, 'status', '') or '').strip().lower()
                 now = timezone.now()
-                shipped_keywords = {'shipped', 'shipping', 'تم الشحن', 'تم ارسال', 'تم الإرسال'}
-                delivered_keywords = {'delivered', 'تم التسليم', 'تم التوصيل'}
 
                 for ln in lines:
                     ln.line_status = new_status
-                    if (label in shipped_keywords) and not getattr(ln, 'line_shipped_at', None):
+                    if next_key == SHIPPED and not getattr(ln, 'line_shipped_at', None):
                         ln.line_shipped_at = now
-                    if (label in delivered_keywords) and not getattr(ln, 'line_delivered_at', None):
+                    if next_key == DELIVERED and not getattr(ln, 'line_delivered_at', None):
                         ln.line_delivered_at = now
 
                 if lines:
                     OrderLine.objects.bulk_update(lines, ['line_status', 'line_shipped_at', 'line_delivered_at'])
+                    order.line_status_counts = {next_key or PENDING: len(lines)}
             except Exception:
                 # Do not block status update on best-effort sync.
                 pass
@@ -560,16 +476,15 @@ class OrderViewSet(viewsets.ModelViewSet):
             if tracking is not None:
                 order.tracking_number = str(tracking).strip() or None
 
-            # Best-effort milestone timestamps based on status label
-            label = str(getattr(new_status, 'status', '') or '').strip().lower()
+            # Best-effort milestone timestamps based on the status key
             now = timezone.now()
-            shipped_keywords = {'shipped', 'shipping', 'تم الشحن', 'تم ارسال', 'تم الإرسال'}
-            delivered_keywords = {'delivered', 'تم التسليم', 'تم التوصيل'}
-            if (label in shipped_keywords) and not order.shipped_at:
+            if next_key == SHIPPED and not order.shipped_at:
                 order.shipped_at = now
-            if (label in delivered_keywords) and not order.delivered_at:
+            if next_key == DELIVERED and not order.delivered_at:
                 order.delivered_at = now
 
             order.save()
+            record_events(order_change_events(order, before, user, now))
+        drop_stale_lines(order)
         serializer = self.get_serializer(order)
         return Response(serializer.data)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Order export endpoints (CSV / NDJSON) for sellers and finance staff."""
+
+from django.db import transaction
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .exports import (
+    CONTENT_TYPES, export_exceeds, export_filename, export_lines_queryset, export_sync_max_rows, iter_export,
+)
+from .models import OrderExport
+from .queries import OrderFilters
+
+
+def _export_scope(request):
+    """Return ``(allowed, seller)`` for the requesting user.
+
+    Sellers export their own lines. Staff (finance) export every seller, or
+    one seller with ``?seller=<id>``.
+    """
+    user = request.user
+    if getattr(user, 'user_type', None) == 'seller':
+        return True, user
+    if user.is_staff:
+        seller_id = str(request.query_params.get('seller') or '').strip()
+        if seller_id.isdigit():
+            from django.contrib.auth import get_user_model
+            return True, get_user_model().objects.filter(id=int(seller_id), user_type='seller').first()
+        return True, None
+    return False, None
+
+
+def _export_payload(request, export: OrderExport) -> dict:
+    data = {
+        'id': export.id,
+        'status': export.status,
+        'file_format': export.file_format,
+        'row_count': export.row_count,
+        'created_at': export.created_at,
+        'finished_at': export.finished_at,
+        'status_url': request.build_absolute_uri(reverse('order_export_detail', args=[export.id])),
+        'download_url': None,
+    }
+    if export.status == OrderExport.DONE and export.file:
+        data['download_url'] = request.build_absolute_uri(reverse('order_export_download', args=[export.id]))
+    if export.status == OrderExport.FAILED:
+        data['error'] = export.error
+    return data
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_export(request):
+    """Export order lines as CSV (default) or NDJSON.
+
+    Query params: ``output`` (csv|ndjson), ``status``, ``date_from``,
+    ``date_to`` and, for staff, ``seller``. Up to ORDER_EXPORT_SYNC_MAX_ROWS
+    rows are streamed in the response; larger exports (or ``?background=1``)
+    return 202 with a job to poll.
+    """
+    allowed, seller = _export_scope(request)
+    if not allowed:
+        return Response({'detail': 'Not authorized.'}, status=403)
+    if seller is None and request.query_params.get('seller'):
+        return Response({'detail': 'Seller not found.'}, status=404)
+
+    file_format = (request.query_params.get('output') or 'csv').strip().lower()
+    if file_format not in CONTENT_TYPES:
+        return Response({'detail': 'Unsupported output; use csv or ndjson.'}, status=400)
+
+    # Order id search does not apply to exports.
+    filters = OrderFilters.from_params(request.query_params)
+    filters = OrderFilters(status_id=filters.status_id, date_from=filters.date_from, date_to=filters.date_to)
+    background = str(request.query_params.get('background') or '').lower() in {'1', 'true', 'yes'}
+    if background or export_exceeds(seller, filters, export_sync_max_rows()):
+        from .tasks import build_order_export
+
+        export = OrderExport.objects.create(
+            requested_by=request.user,
+            seller=seller,
+            file_format=file_format,
+            params={
+                'status_id': filters.status_id,
+                'date_from': filters.date_from.isoformat() if filters.date_from else None,
+                'date_to': filters.date_to.isoformat() if filters.date_to else None,
+            },
+        )
+        transaction.on_commit(lambda: build_order_export.delay(export.id))
+        return Response(_export_payload(request, export), status=202)
+
+    response = StreamingHttpResponse(iter_export(export_lines_queryset(seller, filters), file_format), content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(file_format)}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_export_detail(request, export_id: int):
+    """Status of a background export requested by the current user."""
+    export = get_object_or_404(OrderExport, id=export_id, requested_by=request.user)
+    return Response(_export_payload(request, export))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_export_download(request, export_id: int):
+    """Download a finished background export (owner only)."""
+    export = get_object_or_404(OrderExport, id=export_id, requested_by=request.user, status=OrderExport.DONE)
+    if not export.file:
+        return Response({'detail': 'Export file is missing.'}, status=404)
+    return FileResponse(
+        export.file.open('rb'),
+        as_attachment=True,
+        filename=export.file.name.rsplit('/', 1)[-1],
+        content_type=CONTENT_TYPES.get(export.file_format),
+    )
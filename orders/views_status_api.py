@@ -4,37 +4,77 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import OrderStatus, ShopOrder
+from .events import MAX_EVENTS_PAGE, event_rows, events_queryset
+from .models import OrderStatus
+from .queries import OrderFilters, customer_orders_queryset, with_read_relations
+from .sellers import seller_orders_queryset
 from .serializers import ShopOrderSerializer
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def order_status_list(request):
     """Return all order statuses for client-side dropdowns."""
-    statuses = OrderStatus.objects.all().values('id', 'status')
+    statuses = OrderStatus.objects.all().values('id', 'status', 'key')
     return Response(list(statuses))
 
 
+def _is_seller(user) -> bool:
+    return user.is_authenticated and getattr(user, 'user_type', None) == 'seller'
+
+
+def _scoped_orders(user, filters: OrderFilters):
+    if _is_seller(user):
+        return seller_orders_queryset(user, filters)
+    return customer_orders_queryset(user, filters)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def order_detail_view(request, order_id: int):
-    """Return a single order by id with seller/customer scoping."""
+    """Return a single (live or archived) order by id with seller/customer scoping."""
     user = request.user
 
-    if user.is_authenticated and getattr(user, 'user_type', None) == 'seller':
-        qs = (
-            ShopOrder.objects.filter(lines__product_item__product__seller=user)
-            .select_related('order_status', 'user', 'payment_method', 'shipping_address')
-            .prefetch_related('lines__product_item__product__seller')
-            .distinct()
-        )
-    else:
-        qs = (
-            ShopOrder.objects.filter(user=user)
-            .select_related('order_status', 'payment_method', 'shipping_address')
-            .prefetch_related('lines__product_item__product__seller')
-        )
-
-    order = get_object_or_404(qs, id=order_id)
+    def scoped(filters):
+        return with_read_relations(_scoped_orders(user, filters), archived=filters.archived)
+
+    # Live orders first; archived ones are read from the archive tables on demand.
+    order = scoped(OrderFilters()).filter(id=order_id).first()
+    if order is None:
+        order = get_object_or_404(scoped(OrderFilters(archived=True)), id=order_id)
     serializer = ShopOrderSerializer(order, context={'request': request})
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_events_view(request, order_id: int):
+    """Return an order's events newer than ``?after=<event_id>`` (oldest first).
+
+    Pass the returned ``last_event_id`` as ``after`` on the next call to read
+    only what changed. ``limit`` caps the page (default/max 500);
+    ``has_more`` tells whether to call again right away.
+    """
+    user = request.user
+    visible = any(
+        _scoped_orders(user, OrderFilters(archived=archived)).filter(id=order_id).exists()
+        for archived in (False, True)
+    )
+    if not visible:
+        return Response({'detail': 'Not found.'}, status=404)
+
+    try:
+        after = max(0, int(request.query_params.get('after') or 0))
+        limit = min(MAX_EVENTS_PAGE, max(1, int(request.query_params.get('limit') or MAX_EVENTS_PAGE)))
+    except (TypeError, ValueError):
+        return Response({'detail': 'after and limit must be integers.'}, status=400)
+
+    qs = events_queryset(order_id, after=after, seller=user if _is_seller(user) else None)
+    events = event_rows(qs[:limit + 1])
+    has_more = len(events) > limit
+    events = events[:limit]
+    return Response({
+        'order_id': order_id,
+        'events': events,
+        'last_event_id': events[-1]['id'] if events else after,
+        'has_more': has_more,
+    })
@@ -0,0 +1,54 @@
+"""Server-sent events stream of order updates (served by ``core.asgi``)."""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .realtime import order_event_stream
+
+
+def _jwt_user(request):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError):
+        return None
+    return result[0] if result else None
+
+
+async def _stream_user(request):
+    """Session user (browsers' EventSource) or a Bearer token (other clients)."""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    return await sync_to_async(_jwt_user)(request)
+
+
+@require_GET
+async def order_stream_view(request):
+    """Push order/line status changes to the customer and involved sellers.
+
+    ``?order=<id>`` limits the stream to one order. Events are only pushed,
+    never replayed; on (re)connect clients read ``/api/orders/<id>/events/``
+    from their last event id.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A sync worker would be held for the whole connection.
+        return JsonResponse({'detail': 'Live updates are served by the ASGI app.'}, status=503)
+
+    user = await _stream_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    order_id = str(request.GET.get('order') or '').strip()
+    response = StreamingHttpResponse(
+        order_event_stream(user.id, int(order_id) if order_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Tell Nginx not to buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -4,7 +4,7 @@ import csv
 from django.contrib import admin
 from django.utils.html import format_html
 from django.http import HttpResponse
-from .models import (ProductCategory, Product, ProductItem, 
+from .models import (ProductCategory, Product, ProductItem, InventoryMovement,
                      Variation, VariationOption, ProductConfiguration)
 
 # 1. عرض الـ Items داخل صفحة المنتج نفسه لسهولة الإضافة
@@ -91,6 +91,25 @@ class ProductItemAdmin(admin.ModelAdmin):
     colored_stock.short_description = 'الكمية المتاحة'
     colored_stock.admin_order_field = 'qty_in_stock'
 
+# 4. سجل حركات المخزن (للقراءة فقط)
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin):
+    """Read-only view of the append-only inventory ledger."""
+
+    list_display = ('id', 'product_item', 'delta', 'reason', 'order_id', 'line_id', 'created_at')
+    list_filter = ('reason',)
+    search_fields = ('product_item__sku', '=order_id')
+    list_select_related = ('product_item__product',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 # تسجيل باقي الموديلات بشكل بسيط
 admin.site.register(VariationOption)
 admin.site.register(ProductConfiguration)
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""Inventory ledger writes: ``InventoryMovement`` rows + the cached projection.
+
+Order flows (checkout, cancel/return restocks, delivery confirmation) build
+unsaved movements with ``movement`` and write them with ``record_movements``:
+one INSERT for the ledger rows and one set-based UPDATE that moves each
+``ProductItem.qty_in_stock`` by its summed delta. Both run in the caller's
+transaction, so the projection never diverges from the ledger.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .models import InventoryMovement, ProductItem
+
+
+def movement(product_item_id, delta: int, reason: str, order_id=None, line_id=None, now=None) -> InventoryMovement | None:
+    """Unsaved movement, or None when there is nothing to move (no SKU / zero qty)."""
+    delta = int(delta or 0)
+    if product_item_id is None or not delta:
+        return None
+    row = InventoryMovement(product_item_id=product_item_id, delta=delta, reason=reason, order_id=order_id, line_id=line_id)
+    if now is not None:
+        row.created_at = now
+    return row
+
+
+def record_movements(movements) -> list[InventoryMovement]:
+    """Write movements and apply them to ``qty_in_stock`` (no-op when empty)."""
+    movements = [m for m in movements if m is not None]
+    if not movements:
+        return []
+
+    created = InventoryMovement.objects.bulk_create(movements)
+    totals: dict[int, int] = defaultdict(int)
+    for m in movements:
+        totals[m.product_item_id] += m.delta
+    delta = Case(
+        *[When(id=sku_id, then=Value(qty)) for sku_id, qty in totals.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    ProductItem.objects.filter(id__in=list(totals)).update(qty_in_stock=F('qty_in_stock') + delta)
+    return created
+
+
+def ledger_totals(sku_ids) -> dict[int, int]:
+    """``{sku_id: sum(delta)}`` for ``sku_ids`` (SKUs without movements are omitted)."""
+    return dict(
+        InventoryMovement.objects.filter(product_item_id__in=list(sku_ids))
+        .order_by()
+        .values('product_item_id')
+        .annotate(total=Sum('delta'))
+        .values_list('product_item_id', 'total')
+    )
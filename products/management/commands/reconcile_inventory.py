@@ -0,0 +1,86 @@
+"""Recompute ``ProductItem.qty_in_stock`` from the inventory ledger and report drift.
+
+``qty_in_stock`` is a cached projection of ``InventoryMovement`` (the sum of
+an SKU's deltas). In chunks of SKUs, the ledger is summed and compared with
+the projection; drifted SKUs are listed and reset to the ledger total. With
+``--keep-stock`` the current stock is kept instead and the drift is written
+to the ledger as a ``reconcile`` movement (e.g. after a bulk import that
+bypassed the ledger).
+
+Usage:
+  python manage.py reconcile_inventory
+  python manage.py reconcile_inventory --dry-run
+  python manage.py reconcile_inventory --keep-stock --batch-size 500
+"""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from products.inventory import ledger_totals
+from products.models import InventoryMovement, ProductItem
+
+
+class Command(BaseCommand):
+    help = 'Recompute SKU stock from the inventory ledger and report drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='SKUs per transaction (default: 1000).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift; do not change anything.')
+        parser.add_argument('--keep-stock', action='store_true', help='Keep current stock and record the drift as ledger movements.')
+        parser.add_argument('--show', type=int, default=20, help='Drifted SKUs to list (default: 20).')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, int(options['batch_size']))
+        dry_run = options['dry_run']
+        keep_stock = options['keep_stock']
+        show = max(0, int(options['show']))
+
+        checked = drifted = net_drift = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    ProductItem.objects.filter(id__gt=last_id)
+                    .select_for_update()
+                    .order_by('id')
+                    .values_list('id', 'sku', 'qty_in_stock')[:batch_size]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                totals = ledger_totals(sku_id for sku_id, _, _ in rows)
+
+                drift = {}
+                for sku_id, sku, stock in rows:
+                    ledger = totals.get(sku_id, 0)
+                    if stock != ledger:
+                        drift[sku_id] = (stock, ledger)
+                        if drifted < show:
+                            self.stdout.write(f'SKU {sku} (#{sku_id}): stock {stock}, ledger {ledger} (drift {stock - ledger:+d})')
+                        drifted += 1
+                        net_drift += stock - ledger
+                checked += len(rows)
+
+                if drift and not dry_run:
+                    if keep_stock:
+                        InventoryMovement.objects.bulk_create([
+                            InventoryMovement(product_item_id=sku_id, delta=stock - ledger, reason=InventoryMovement.RECONCILE)
+                            for sku_id, (stock, ledger) in drift.items()
+                        ])
+                    else:
+                        ProductItem.objects.filter(id__in=list(drift)).update(qty_in_stock=Case(
+                            *[When(id=sku_id, then=Value(ledger)) for sku_id, (_, ledger) in drift.items()],
+                            output_field=IntegerField(),
+                        ))
+
+        summary = f'Checked {checked} SKUs; {drifted} drifted (net {net_drift:+d}).'
+        if drifted and dry_run:
+            self.stdout.write(self.style.WARNING(summary + ' Dry run: nothing changed.'))
+        elif drifted:
+            action = 'recorded in the ledger' if keep_stock else 'reset to the ledger'
+            self.stdout.write(self.style.SUCCESS(f'{summary} Stock {action}.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.11 on 2026-10-19 07:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_opening_balances(apps, schema_editor):
+    ProductItem = apps.get_model('products', 'ProductItem')
+    InventoryMovement = apps.get_model('products', 'InventoryMovement')
+
+    last_id = 0
+    while True:
+        rows = list(
+            ProductItem.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'qty_in_stock')[:1000]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        InventoryMovement.objects.bulk_create([
+            InventoryMovement(product_item_id=item_id, delta=qty, reason='opening')
+            for item_id, qty in rows
+            if qty
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_postgres_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('adjustment', 'Manual adjustment'), ('checkout', 'Checkout'), ('restock', 'Restock (cancel/return)'), ('delivery', 'Delivery confirmed'), ('delivery_reversal', 'Delivery reversed'), ('reconcile', 'Reconciliation')], max_length=20)),
+                ('order_id', models.BigIntegerField(blank=True, null=True)),
+                ('line_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='products.productitem')),
+            ],
+            options={
+                'verbose_name': 'Inventory Movement',
+                'verbose_name_plural': 'Inventory Movements',
+                'indexes': [models.Index(fields=['product_item', 'id'], name='products_in_product_9e79b1_idx'), models.Index(fields=['order_id'], name='products_in_order_i_4a727f_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_opening_balances, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 """Database models for the product catalog and variations."""
 
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings # لاستدعاء موديل المستخدم بأمان
+from django.utils import timezone
 
 # 1. جداول التصنيفات
 class ProductCategory(models.Model):
@@ -85,6 +86,32 @@ class ProductItem(models.Model):
     def __str__(self):
         return f"{self.product.name} - SKU: {self.sku}"
 
+    def save(self, *args, **kwargs):
+        """Save; a changed ``qty_in_stock`` also writes its ledger row.
+
+        Creating an SKU records an opening balance, later edits (seller API,
+        admin) an adjustment, so ``qty_in_stock`` stays the sum of its
+        ``InventoryMovement`` rows. Order flows go through
+        ``products.inventory.record_movements`` instead.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'qty_in_stock' not in update_fields:
+            return super().save(*args, **kwargs)
+
+        adding = self._state.adding
+        with transaction.atomic():
+            previous = 0
+            if not adding:
+                previous = ProductItem.objects.select_for_update().filter(pk=self.pk).values_list('qty_in_stock', flat=True).first() or 0
+            super().save(*args, **kwargs)
+            delta = int(self.qty_in_stock or 0) - previous
+            if delta:
+                InventoryMovement.objects.create(
+                    product_item=self,
+                    delta=delta,
+                    reason=InventoryMovement.OPENING if adding else InventoryMovement.ADJUSTMENT,
+                )
+
 # 5. ربط الاختيارات بالقطع (Configuration)
 class ProductConfiguration(models.Model):
     """Assigns a variation option to a specific SKU (ProductItem)."""
@@ -95,4 +122,51 @@ class ProductConfiguration(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['product_item', 'variation_option']),
-        ]
\ No newline at end of file
+        ]
+
+
+class InventoryMovement(models.Model):
+    """Append-only stock ledger; ``ProductItem.qty_in_stock`` is its running sum.
+
+    Every stock change (checkout, restocks, delivery confirmation, manual
+    edits) is written here in the same transaction as the projection
+    update (see ``products.inventory``). ``reconcile_inventory`` recomputes
+    the projection from the ledger and reports drift.
+    """
+
+    OPENING = 'opening'
+    ADJUSTMENT = 'adjustment'
+    CHECKOUT = 'checkout'
+    RESTOCK = 'restock'
+    DELIVERY = 'delivery'
+    DELIVERY_REVERSAL = 'delivery_reversal'
+    RECONCILE = 'reconcile'
+    REASON_CHOICES = [
+        (OPENING, 'Opening balance'),
+        (ADJUSTMENT, 'Manual adjustment'),
+        (CHECKOUT, 'Checkout'),
+        (RESTOCK, 'Restock (cancel/return)'),
+        (DELIVERY, 'Delivery confirmed'),
+        (DELIVERY_REVERSAL, 'Delivery reversed'),
+        (RECONCILE, 'Reconciliation'),
+    ]
+
+    product_item = models.ForeignKey(ProductItem, on_delete=models.CASCADE, related_name='movements')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    # Plain ids, not FKs: products does not depend on orders, and lines can
+    # move to ArchivedOrderLine (same id).
+    order_id = models.BigIntegerField(null=True, blank=True)
+    line_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Inventory Movement"
+        verbose_name_plural = "Inventory Movements"
+        indexes = [
+            models.Index(fields=['product_item', 'id']),
+            models.Index(fields=['order_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.reason} {self.delta:+d} SKU #{self.product_item_id}"
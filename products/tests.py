@@ -1,5 +1,51 @@
 """Products app tests."""
 
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from orders.models import OrderStatus, ShopOrder
+from orders.tests import CheckoutFixtureMixin
+from products.models import InventoryMovement, ProductItem
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost', '127.0.0.1'])
+class InventoryLedgerTests(CheckoutFixtureMixin, TestCase):
+	"""Every stock change is an InventoryMovement; reconcile_inventory repairs drift."""
+
+	def test_stock_changes_go_through_inventory_ledger(self):
+		client = APIClient()
+		client.force_authenticate(user=self.customer)
+		seller_client = APIClient()
+		seller_client.force_authenticate(user=self.seller)
+		order_id = self._place_order(client)
+		line_id = ShopOrder.objects.get(id=order_id).lines.get().id
+		cancelled = OrderStatus.objects.create(status='Cancelled')
+		res = seller_client.patch(f'/api/orders/{order_id}/set-status/', data={'order_status': cancelled.id}, format='json')
+		self.assertEqual(res.status_code, 200)
+
+		moves = list(InventoryMovement.objects.filter(product_item=self.item).order_by('id').values_list('reason', 'delta', 'order_id', 'line_id'))
+		self.assertEqual(moves, [
+			('opening', 100, None, None), ('checkout', -1, order_id, line_id), ('restock', 1, order_id, line_id),
+		])
+		self.item.refresh_from_db()
+		self.assertEqual(self.item.qty_in_stock, 100)
+
+		# Manual edits are ledgered too; writes that bypass it show up as drift.
+		self.item.qty_in_stock = 90
+		self.item.save()
+		self.assertEqual(InventoryMovement.objects.filter(product_item=self.item).aggregate(s=Sum('delta'))['s'], 90)
+		ProductItem.objects.filter(id=self.item.id).update(qty_in_stock=85)
+
+		out = StringIO()
+		call_command('reconcile_inventory', '--dry-run', stdout=out)
+		self.assertIn('drift -5', out.getvalue())
+		call_command('reconcile_inventory', '--keep-stock', stdout=StringIO())
+		self.assertEqual(InventoryMovement.objects.filter(product_item=self.item).latest('id').delta, -5)
+		ProductItem.objects.filter(id=self.item.id).update(qty_in_stock=70)
+		call_command('reconcile_inventory', stdout=StringIO())
+		self.item.refresh_from_db()
+		self.assertEqual(self.item.qty_in_stock, 85)